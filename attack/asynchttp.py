@@ -0,0 +1,272 @@
+import asyncio
+import time
+from http import HTTPStatus
+
+# Optional faster event loop; the standard asyncio loop works without it
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+MAX_HEADER_BYTES = 64 * 1024
+# Only wait for the socket to drain once this much response data is queued
+WRITE_BUFFER_HIGH_WATER = 256 * 1024
+
+_REASONS = {status.value: status.phrase for status in HTTPStatus}
+
+
+class HttpRequest:
+    """A parsed HTTP/1.x request as seen by a local server app"""
+
+    __slots__ = ("method", "target", "path", "query", "version", "headers", "lower_headers", "body", "client_ip")
+
+    def __init__(self, method, target, version, headers, body, client_ip):
+        self.method = method
+        self.target = target
+        self.path, _, self.query = target.partition("?")
+        self.version = version
+        self.headers = headers
+        self.lower_headers = {name.lower(): value for name, value in headers.items()}
+        self.body = body
+        self.client_ip = client_ip
+
+    def header(self, name, default=None):
+        return self.lower_headers.get(name.lower(), default)
+
+    @property
+    def keep_alive(self):
+        connection = self.lower_headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_head(head):
+    """Split a raw header block into (start line parts, headers dict)"""
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) != 3:
+        raise BadRequest(400, f"Malformed start line: {lines[0][:100]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, separator, value = line.partition(":")
+        if not separator:
+            raise BadRequest(400, f"Malformed header line: {line[:100]!r}")
+        headers[name.strip()] = value.strip()
+    return parts, headers
+
+
+async def read_request(reader, client_ip):
+    """
+    Read one request from a keep-alive connection
+
+    Returns:
+        HttpRequest, or None when the client closed the connection cleanly
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise BadRequest(400, "Connection closed mid-request")
+    except asyncio.LimitOverrunError:
+        raise BadRequest(431, "Request header block too large")
+
+    (method, target, version), headers = parse_head(head[:-4])
+    lower = {name.lower(): value for name, value in headers.items()}
+    if "chunked" in lower.get("transfer-encoding", "").lower():
+        raise BadRequest(411, "Chunked request bodies are not supported")
+    try:
+        length = int(lower.get("content-length", "0") or 0)
+    except ValueError:
+        raise BadRequest(400, "Invalid Content-Length")
+    body = await reader.readexactly(length) if length else b""
+    return HttpRequest(method, target, version, headers, body, client_ip)
+
+
+def encode_response(status, headers, body, keep_alive=True):
+    """Serialize a response; Content-Length and Connection are always set here"""
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}"]
+    for name, value in headers.items():
+        if name.lower() not in ("content-length", "connection", "transfer-encoding"):
+            lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def serve(app, host, port, backlog=4096):
+    """
+    Run an HTTP/1.1 keep-alive server until cancelled
+
+    Args:
+        app: Coroutine function taking an HttpRequest and returning (status, headers, body bytes)
+        host: Interface to bind
+        port: Port to bind
+        backlog: Listen backlog
+    """
+    async def handle_connection(reader, writer):
+        peer = writer.get_extra_info("peername")
+        client_ip = peer[0] if peer else ""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, client_ip)
+                except BadRequest as e:
+                    writer.write(encode_response(e.status, {"Content-Type": "text/plain"}, str(e).encode(), False))
+                    break
+                if request is None:
+                    break
+                status, headers, body = await app(request)
+                keep_alive = request.keep_alive
+                writer.write(encode_response(status, headers, body, keep_alive))
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+                    await writer.drain()
+                if not keep_alive:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle_connection, host, port, backlog=backlog, limit=MAX_HEADER_BYTES)
+    async with server:
+        await server.serve_forever()
+
+
+def run(main):
+    """Run a coroutine on uvloop when it is installed, otherwise on the default loop"""
+    if HAS_UVLOOP:
+        return uvloop.run(main)
+    return asyncio.run(main)
+
+
+class HttpResponse:
+    """Status, headers and body of a response read by ClientPool"""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+async def read_response(reader):
+    """Read one response, handling Content-Length, chunked and close-delimited bodies"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    (version, status, _), headers = parse_head(head[:-4])
+    lower = {name.lower(): value for name, value in headers.items()}
+
+    if "chunked" in lower.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in lower:
+        length = int(lower["content-length"])
+        body = await reader.readexactly(length) if length else b""
+    else:
+        body = await reader.read()
+        lower["connection"] = "close"
+
+    keep_alive = lower.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+    return HttpResponse(int(status), headers, body), keep_alive
+
+
+class ClientPool:
+    """
+    Keep-alive HTTP/1.1 connections to one upstream host, reused across
+    requests. At most `size` connections are open at once; callers wait
+    for a free one beyond that.
+    """
+
+    def __init__(self, host, port, size=100, ssl=None, server_hostname=None):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.server_hostname = server_hostname
+        self.host_header = host if port in (80, 443) else f"{host}:{port}"
+        self._idle = []
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self.connections_opened = 0
+        self.handshake_seconds = 0.0
+
+    async def _connect(self):
+        start = time.perf_counter()
+        connection = await asyncio.open_connection(self.host, self.port, ssl=self.ssl, limit=MAX_HEADER_BYTES,
+                                                   server_hostname=self.server_hostname if self.ssl else None)
+        self.connections_opened += 1
+        self.handshake_seconds += time.perf_counter() - start
+        return connection
+
+    async def warm_up(self, connections=None):
+        """Open connections (up to the pool size) ahead of use; returns how many were opened"""
+        count = min(connections or self.size, self.size) - len(self._idle)
+        opened = await asyncio.gather(*(self._connect() for _ in range(count)))
+        self._idle.extend(opened)
+        return len(opened)
+
+    def encode_request(self, method, target, headers, body, keep_alive=True):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host_header}"]
+        for name, value in headers.items():
+            if name.lower() not in ("host", "content-length", "connection", "transfer-encoding"):
+                lines.append(f"{name}: {value}")
+        if body or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body)}")
+        if not keep_alive:
+            lines.append("Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    async def request(self, method, target, headers=None, body=b"", keep_alive=True):
+        """
+        Send a request on an idle (or new) connection and return the
+        HttpResponse; with keep_alive=False the connection is closed after
+        the response instead of returned to the pool
+        """
+        payload = self.encode_request(method, target, headers or {}, body, keep_alive)
+        async with self._slots:
+            # A pooled connection may have been closed by the server while
+            # idle; retry once on a fresh connection in that case
+            for attempt in range(2):
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                try:
+                    writer.write(payload)
+                    response, reusable = await read_response(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    # Cancelled or failed mid-response: the connection state is unknown
+                    writer.close()
+                    raise
+                if keep_alive and reusable:
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+                return response
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
@@ -0,0 +1,224 @@
+import bisect
+import math
+from collections import namedtuple
+
+# One request of a behaviour model. Behaviour models are generators that
+# yield a Request for each request (and are sent back its status, or None
+# if it failed), a number of seconds to pause, or a str to report; they are
+# run in real time, on a virtual clock, or compiled into a trace (bot_trace.py).
+Request = namedtuple("Request", "label method path data headers timeout", defaults=(None, None, 5))
+
+# Fallback user agents if the fake_useragent package isn't installed
+FALLBACK_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59"
+]
+
+# API-specific paths for the product reviews system, as GET states
+API_GETS = [
+    ("GET", ""),  # Main endpoint
+    ("GET", "?product_id=prod1234"),
+    ("GET", "?product_id=test"),
+    ("GET", "?product_id=xyz123"),
+]
+
+# Review submitted by bots' POST requests; {i} is the request's index
+REVIEW_PAYLOAD = {
+    "product_id": "prod{i:04d}",
+    "review": "This is review {i} from bot simulation",
+    "username": "bot_user_{i:04d}"
+}
+
+# Bot behaviour models as data. Each bot is a Markov chain over `states`
+# (method, path template): the first request's state is drawn from `start`,
+# each later one from the row of `transitions` for the previous state (if
+# there are no transitions, every request is drawn from `start`). Between
+# requests a bot pauses for a `pause` ("uniform", low, high) or
+# ("exponential", mean) number of seconds. Header values may use
+# {user_agent}, drawn once per bot from `user_agents` ("browsers" for
+# browser user agents), or per request with `rotate_user_agent`. Paths may
+# use {i} (the request's index) and {cycle} (the index modulo `cycle`).
+BEHAVIORS = {
+    "simple": {
+        # Rapid requests with fixed patterns
+        "label": "Simple Bot",
+        "description": "simple bot",
+        "states": API_GETS + [("POST", "")],
+        "start": [0.125, 0.125, 0.125, 0.125, 0.5],
+        "pause": ("uniform", 0.05, 0.2),
+        "headers": {"User-Agent": "Python-urllib/3.8", "Accept": "*/*"},
+        "payload": REVIEW_PAYLOAD,
+        "timeout": 5,
+    },
+    "browser": {
+        # Browser-like timing and headers; 30% of the time it revisits the
+        # path it was on rather than picking one afresh, and half its
+        # requests are POSTs
+        "label": "Browser Bot",
+        "description": "browser-like bot",
+        "states": API_GETS + [("POST", "")],
+        "start": [0.125, 0.125, 0.125, 0.125, 0.5],
+        "transitions": [
+            [0.2375, 0.0875, 0.0875, 0.0875, 0.5],
+            [0.0875, 0.2375, 0.0875, 0.0875, 0.5],
+            [0.0875, 0.0875, 0.2375, 0.0875, 0.5],
+            [0.0875, 0.0875, 0.0875, 0.2375, 0.5],
+            [0.125, 0.125, 0.125, 0.125, 0.5],
+        ],
+        "pause": ("uniform", 0.5, 2),
+        "headers": {
+            "User-Agent": "{user_agent}",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.5",
+            "Accept-Encoding": "gzip, deflate, br",
+            "Connection": "keep-alive"
+        },
+        "user_agents": "browsers",
+        "payload": REVIEW_PAYLOAD,
+        "timeout": 10,
+    },
+    "rotating": {
+        # A new user agent on every request
+        "label": "Rotating UA Bot",
+        "description": "rotating user agent bot",
+        "states": API_GETS + [("POST", "")],
+        "start": [0.125, 0.125, 0.125, 0.125, 0.5],
+        "pause": ("uniform", 0.2, 1),
+        "headers": {
+            "User-Agent": "{user_agent}",
+            "Accept": "application/json, text/plain, */*",
+            "Content-Type": "application/json"
+        },
+        "user_agents": "browsers",
+        "rotate_user_agent": True,
+        "payload": REVIEW_PAYLOAD,
+        "timeout": 5,
+    },
+    "scraper": {
+        # Mostly GETs, going through product IDs sequentially
+        "label": "Scraper Bot",
+        "description": "scraper bot",
+        "states": [("GET", "?product_id=prod{cycle:04d}"), ("POST", "")],
+        "start": [0.8, 0.2],
+        "cycle": 100,
+        "pause": ("uniform", 0.1, 0.5),
+        "headers": {
+            "User-Agent": "{user_agent}",
+            "Accept": "application/json, text/plain, */*",
+            "Accept-Encoding": "gzip, deflate",
+        },
+        "user_agents": [f"WebScraper/1.0 (Custom Scraper; Python/{version})" for version in ("3.6", "3.7", "3.8", "3.9")],
+        "payload": REVIEW_PAYLOAD,
+        "timeout": 5,
+    },
+    "flood": {
+        # POSTs with minimal pauses
+        "label": "Flood Bot",
+        "description": "flood bot",
+        "states": [("POST", "")],
+        "start": [1.0],
+        "pause": ("uniform", 0.01, 0.05),
+        "headers": {"User-Agent": "Python-urllib/3.8", "Accept": "*/*"},
+        "payload": REVIEW_PAYLOAD,
+        "timeout": 3,
+    },
+}
+
+
+def _cumulative(weights):
+    """Running totals of weights scaled to end at exactly 1.0, for sampling by bisection"""
+    total = float(sum(weights))
+    if total <= 0:
+        raise ValueError("Behaviour model weights must add up to more than zero")
+    running = 0.0
+    cumulative = []
+    for weight in weights:
+        running += weight
+        cumulative.append(running / total)
+    cumulative[-1] = 1.0
+    return cumulative
+
+
+class BehaviorModel:
+    """
+    A behaviour model from BEHAVIORS compiled for sampling: cumulative
+    probability tables that a uniform draw in [0, 1) is bisected into, so
+    the same tables serve one draw at a time (bot_simulator) and NumPy
+    arrays of draws (bot_trace.py)
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.label = spec["label"]
+        self.description = spec["description"]
+        self.states = [tuple(state) for state in spec["states"]]
+        self.start = _cumulative(spec["start"])
+        self.transitions = [_cumulative(row) for row in spec["transitions"]] if spec.get("transitions") else None
+        if self.transitions is not None and len(self.transitions) != len(self.states):
+            raise ValueError(f"Behaviour model {name}: one transition row is needed per state")
+        self.pause_distribution = tuple(spec["pause"])
+        self.timeout = spec.get("timeout", 5)
+        self.cycle = spec.get("cycle")
+        self.payload = spec.get("payload")
+        self.header_template = spec.get("headers") or {}
+        self.user_agents = spec.get("user_agents")
+        self.rotate_user_agent = spec.get("rotate_user_agent", False)
+        self._headers = {}
+
+    def first_state(self, u):
+        return bisect.bisect_right(self.start, u)
+
+    def next_state(self, state, u):
+        return bisect.bisect_right(self.transitions[state] if self.transitions else self.start, u)
+
+    def pause(self, u):
+        """Seconds to pause for a uniform draw u"""
+        kind, *params = self.pause_distribution
+        if kind == "uniform":
+            low, high = params
+            return low + (high - low) * u
+        if kind == "exponential":
+            return -params[0] * math.log(1.0 - u)
+        raise ValueError(f"Unknown pause distribution {kind}")
+
+    def headers(self, user_agent=None):
+        """Headers for a user agent; one shared dict per user agent"""
+        try:
+            return self._headers[user_agent]
+        except KeyError:
+            headers = {name: value.format(user_agent=user_agent) for name, value in self.header_template.items()}
+            return self._headers.setdefault(user_agent, headers)
+
+    def request(self, state, i, num_requests, headers):
+        """The Request for request i (of num_requests) of a bot in `state`"""
+        method, path = self.states[state]
+        path = path.format(i=i, cycle=i % self.cycle if self.cycle else i)
+        data = None
+        if method == "POST" and self.payload:
+            data = {name: value.format(i=i) for name, value in self.payload.items()}
+        return Request(f"{self.label} {method} {i+1}/{num_requests}", method, path, data, headers, self.timeout)
+
+
+MODELS = {name: BehaviorModel(name, spec) for name, spec in BEHAVIORS.items()}
+
+
+def bot_population(bot_types, bots_per_type=1, weights=None):
+    """
+    Key and type of every bot instance of a botnet, interleaved by type
+
+    Args:
+        bots_per_type: Instances of each type, scaled by the type's weight
+        weights: Bot type -> weight (default 1); a type gets round(bots_per_type * weight) instances
+
+    Returns:
+        list of (key, bot type); keys seed each instance's random choices
+    """
+    counts = [(n, bot_type, round(bots_per_type * (weights or {}).get(bot_type, 1.0)))
+              for n, bot_type in enumerate(bot_types)]
+    return [(f"{n}:{bot_type}:{i}", bot_type)
+            for i in range(max((count for _, _, count in counts), default=0))
+            for n, bot_type, count in counts if i < count]
@@ -0,0 +1,51 @@
+import argparse
+import statistics
+import time
+
+from local_lambda import load_handler, load_template, make_event
+
+
+def post_throughput(mode, num_requests, template):
+    """
+    Send POSTs one after another through a single container, as Lambda does
+
+    Args:
+        mode: HANDLER_MODE to load the handler in (vulnerable or hardened)
+        num_requests: Number of POST invocations
+        template: Parsed wafcf.yaml
+
+    Returns:
+        (requests_per_second, latencies_ms)
+    """
+    # The fork of the real shell is what this measures; the product IDs sent are benign
+    handler = load_handler("UnprotectedLambdaFunction", template=template, environment={"HANDLER_MODE": mode},
+                           log=lambda *args, **kwargs: None, real_shell=True)
+    events = [
+        make_event("POST", body={"product_id": f"prod{i:04d}", "review": f"bench review {i}", "username": "bench"})
+        for i in range(num_requests)
+    ]
+
+    latencies = []
+    start = time.perf_counter()
+    for event in events:
+        request_start = time.perf_counter()
+        response = handler.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - request_start) * 1000)
+        if response["statusCode"] != 200:
+            raise RuntimeError(f"{mode} handler returned {response['statusCode']}: {response['body']}")
+    duration = time.perf_counter() - start
+    return num_requests / duration, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark POST throughput with the shell product check vs. the in-process check")
+    parser.add_argument("--requests", type=int, default=2000, help="POST invocations per mode")
+
+    args = parser.parse_args()
+    template = load_template()
+
+    print(f"{'mode':>12} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for mode in ("vulnerable", "hardened"):
+        rate, latencies = post_throughput(mode, args.requests, template)
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        print(f"{mode:>12} {rate:>10.0f} {quantiles[49]:>10.3f} {quantiles[98]:>10.3f}")
@@ -0,0 +1,103 @@
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from local_dynamodb import LocalTable
+
+
+def seed_table(table, num_reviews, num_products):
+    """
+    Fill a local table with flood-style reviews spread across product IDs
+
+    Args:
+        table: LocalTable to fill
+        num_reviews: Number of reviews to write
+        num_products: Number of distinct product IDs
+    """
+    for i in range(num_reviews):
+        table.put_item(
+            Item={
+                "review_id": str(uuid.uuid4()),
+                "product_id": f"prod{i % num_products:04d}",
+                "username": "attacker",
+                "review_text": f"flood attack {i}",
+                "environment": "unprotected"
+            }
+        )
+
+
+def read_with_scan(table, product_id):
+    """Old read path: filtered scan over the whole table, following LastEvaluatedKey"""
+    scan_args = {"FilterExpression": Attr("product_id").eq(product_id), "ReturnConsumedCapacity": "TOTAL"}
+    reviews = []
+    units = 0.0
+    while True:
+        response = table.scan(**scan_args)
+        reviews.extend(response["Items"])
+        units += response["ConsumedCapacity"]["CapacityUnits"]
+        if "LastEvaluatedKey" not in response:
+            return reviews, units
+        scan_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def read_with_query(table, product_id):
+    """New read path: query on the product_id index, following LastEvaluatedKey"""
+    query_args = {
+        "IndexName": "ProductIdIndex",
+        "KeyConditionExpression": Key("product_id").eq(product_id),
+        "ReturnConsumedCapacity": "TOTAL"
+    }
+    reviews = []
+    units = 0.0
+    while True:
+        response = table.query(**query_args)
+        reviews.extend(response["Items"])
+        units += response["ConsumedCapacity"]["CapacityUnits"]
+        if "LastEvaluatedKey" not in response:
+            return reviews, units
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def measure(read_fn, table, product_ids):
+    """Run read_fn for each product ID and collect latency and read units"""
+    latencies = []
+    units = []
+    found = []
+    for product_id in product_ids:
+        start = time.perf_counter()
+        reviews, consumed = read_fn(table, product_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+        units.append(consumed)
+        found.append(len(reviews))
+    return latencies, units, found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scan vs. index query reads against a local DynamoDB stand-in")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Numbers of seeded reviews")
+    parser.add_argument("--products", type=int, default=100, help="Number of distinct product IDs")
+    parser.add_argument("--lookups", type=int, default=10, help="Lookups per read path and table size")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the product IDs looked up")
+
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'reviews':>10} {'path':>6} {'p50 ms':>10} {'max ms':>10} {'RCU/lookup':>12} {'items/lookup':>13}")
+    for size in args.sizes:
+        table = LocalTable()
+        seed_table(table, size, args.products)
+        product_ids = [f"prod{random.randrange(args.products):04d}" for _ in range(args.lookups)]
+
+        for name, read_fn in (("scan", read_with_scan), ("query", read_with_query)):
+            latencies, units, found = measure(read_fn, table, product_ids)
+            print(f"{size:>10} {name:>6} {statistics.median(latencies):>10.2f} {max(latencies):>10.2f} "
+                  f"{statistics.mean(units):>12.1f} {statistics.mean(found):>13.1f}")
+
+        # The original handler made a single scan call and ignored LastEvaluatedKey
+        first_page = table.scan(FilterExpression=Attr("product_id").eq(product_ids[0]))
+        print(f"{size:>10} single scan call returned {first_page['Count']} reviews for {product_ids[0]}"
+              f"{' (truncated)' if 'LastEvaluatedKey' in first_page else ''}")
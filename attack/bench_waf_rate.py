@@ -0,0 +1,54 @@
+import argparse
+import random
+import resource
+import statistics
+import time
+
+from asynchttp import HttpRequest
+from webacl import compile_web_acl, load_web_acl_definition
+
+
+def client_ip(n):
+    return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the rate-based rule emulator's per-request cost with many tracked keys")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Client IPs tracked before measuring")
+    parser.add_argument("--requests", type=int, default=100_000, help="Requests to evaluate while measuring")
+    parser.add_argument("--new-key-ratio", type=float, default=0.1, help="Fraction of measured requests from unseen IPs (forces evictions)")
+
+    args = parser.parse_args()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    acl = compile_web_acl(load_web_acl_definition(), rules=["RateBasedRule"], strict=True, max_keys=args.keys)
+    limiter = acl.rate_limiters()["RateBasedRule"]
+    start = time.perf_counter()
+    for n in range(args.keys):
+        acl.evaluate(HttpRequest("GET", "/reviews?product_id=prod0001", "HTTP/1.1", {}, b"", client_ip(n)))
+    fill_seconds = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    requests = []
+    for i in range(args.requests):
+        if random.random() < args.new_key_ratio:
+            ip = client_ip(args.keys + i)
+        else:
+            ip = client_ip(random.randrange(args.keys))
+        requests.append(HttpRequest("POST", "/reviews", "HTTP/1.1", {}, b"", ip))
+
+    timings = []
+    blocked = 0
+    clock = time.perf_counter
+    for request in requests:
+        start = clock()
+        blocked += acl.evaluate(request)[0] == "Block"
+        timings.append(clock() - start)
+
+    quantiles = statistics.quantiles(timings, n=1000, method="inclusive")
+    total = sum(timings)
+    print(f"Tracked keys: {len(limiter)} (filled in {fill_seconds:.1f}s, ~{(rss_after - rss_before) / 1024:.0f} MB RSS)")
+    print(f"Evaluated {args.requests} requests: {blocked} blocked, {limiter.evictions} evictions")
+    print(f"Per request (us): mean {total / args.requests * 1e6:.2f}, p50 {quantiles[499] * 1e6:.2f}, "
+          f"p99 {quantiles[989] * 1e6:.2f}, p99.9 {quantiles[998] * 1e6:.2f}, max {max(timings) * 1e6:.2f}")
+    print(f"Rule evaluation CPU at 10k req/s: {total / args.requests * 10_000 * 100:.2f}% of one core")
@@ -4,8 +4,30 @@ import time
 import threading
 import random
 import argparse
+import hashlib
+import heapq
+import itertools
 import json
+import queue
+from urllib.parse import urlsplit
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
+from behaviors import FALLBACK_USER_AGENTS, MODELS, Request, bot_population
+from bot_trace import iter_requests, read_header as read_trace_header
+from stats import PerThread, RunStats, print_comparison
+from reporter import NORMAL, Reporter, add_arguments as add_report_arguments
+from recorder import NOT_MEASURED, Recorder
+from scheduler import EventScheduler
+from workers import GRACE_SECONDS, RunControl, SubmissionWindow, run_name, run_workers, split
+
+try:
+    from asynchttp import HttpRequest
+    from local_api import ReviewsService
+    from local_waf import ACTION_STATUS, BLOCK_BODY
+    from webacl import compile_web_acl, load_web_acl_definition
+    HAS_EMULATOR = True
+except ImportError:
+    HAS_EMULATOR = False
 
 try:
     from fake_useragent import UserAgent
@@ -15,433 +37,902 @@ except ImportError:
     print("Warning: fake_useragent package not installed. Using fallback user agents.")
     print("Install with: pip install fake-useragent")
 
-# Fallback user agents if the package isn't installed
-FALLBACK_USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 Edg/91.0.864.59"
-]
+# Open-loop requests handed to the sender pool ahead of the ones in flight, per sender thread
+SUBMIT_AHEAD = 2
+
+_MASK64 = (1 << 64) - 1
+
+class BotRandom:
+    """
+    Seedable random number generator (splitmix64) with the random.Random
+    methods the behaviour models use. Its state is one int rather than
+    random.Random's 2.5 KB, which adds up over tens of thousands of bots.
+    """
+    __slots__ = ("state",)
+    
+    def __init__(self, seed=None):
+        if seed is None:
+            self.state = random.getrandbits(64)
+        else:
+            self.state = int.from_bytes(hashlib.blake2b(str(seed).encode("utf-8"), digest_size=8).digest(), "little")
+    
+    def _next(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+    
+    def random(self):
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+    
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+    
+    def randint(self, a, b):
+        return a + self._next() % (b - a + 1)
+    
+    def choice(self, seq):
+        return seq[self._next() % len(seq)]
+
+class Bot:
+    """
+    One bot instance: its behaviour model and the session state it keeps
+    between requests. Slotted, and bots that send the same headers share
+    one dict (see behaviors.BehaviorModel.headers), so tens of thousands
+    of bots stay small.
+    """
+    __slots__ = ("key", "bot_type", "rng", "headers", "cookies", "state", "actions")
+    
+    def __init__(self, key, bot_type, rng, headers):
+        self.key = key
+        self.bot_type = bot_type
+        self.rng = rng
+        self.headers = headers
+        self.cookies = None
+        # Markov state of the bot's behaviour model (see behaviors.BEHAVIORS)
+        self.state = None
+        # Behaviour model generator (see Request)
+        self.actions = None
+
+class SimulationRun:
+    """
+    What the bot or human threads of one simulation report into: per-thread
+    RunStats (so counting takes no lock), the progress reporter, and an
+    optional per-request recorder
+    """
+    
+    def __init__(self, reporter, recorder=None):
+        self.results = PerThread(RunStats)
+        self.reporter = reporter
+        self.recorder = recorder
+
+def execute_request(run, source, label, target, send):
+    """
+    Send one request, count and time it, and hand its outcome to the reporter
+    
+    Args:
+        run: SimulationRun of the running simulation
+        source: Bot type (or "human") the request is recorded under
+        label: Start of the printed line (e.g. "Simple Bot GET 3/20")
+        target: What the request went to, for the printed line
+        send: Callable that sends the request and returns the response
+    
+    Returns:
+        The response, or None if the request failed
+    """
+    run_stats = run.results.get()
+    sent_at = time.time()
+    start = time.perf_counter()
+    try:
+        response = send()
+    except Exception as e:
+        latency = time.perf_counter() - start
+        outcome = run_stats.record_exception(e)
+        run.reporter.record(outcome, f"{label}: {target} - Error: {str(e)}")
+        response, status, size = None, 0, 0
+    else:
+        latency = time.perf_counter() - start
+        run_stats.latency.record(latency)
+        outcome = run_stats.record_status(response.status_code)
+        run.reporter.record(outcome, f"{label}: {target} - Status: {response.status_code}")
+        status, size = response.status_code, len(response.content)
+    if run.recorder is not None:
+        run.recorder.record(sent_at, latency, status, outcome, size, run.recorder.source_id(source))
+    return response
+
+def drive(run, source, actions, target_url, sender, control, window=None):
+    """
+    Run a behaviour model in real time on the calling thread: send its
+    requests, sleep through its pauses, and give up once the run stops
+    
+    Args:
+        run: SimulationRun of the running simulation
+        source: Bot type (or "human") the requests are recorded under
+        actions: Behaviour model generator (see Request)
+        target_url: URL each Request's path is appended to
+        sender: requests.Session to send with, or the requests module for a new connection per request
+        control: RunControl of the run
+        window: SubmissionWindow to send through open-loop: each request goes at the time the
+            pauses before it add up to, without waiting for earlier responses (the model is sent
+            None instead of their statuses). By default requests are sent on the calling thread
+            and each pause starts when the response arrives.
+    """
+    result = None
+    due = time.perf_counter()
+    while True:
+        try:
+            action = actions.send(result)
+        except StopIteration:
+            return
+        result = None
+        if isinstance(action, Request):
+            if control.stopped():
+                return
+            url = f"{target_url}{action.path}"
+            send = (lambda url=url, action=action: sender.request(action.method, url, json=action.data,
+                                                                  headers=action.headers, timeout=action.timeout))
+            if window is not None:
+                window.submit(execute_request, run, source, action.label, url, send)
+                continue
+            response = execute_request(run, source, action.label, url, send)
+            result = response.status_code if response is not None else None
+        elif isinstance(action, str):
+            run.reporter.message(action)
+        elif window is not None:
+            due += action
+            if control.wait_until(due) is None:
+                return
+        elif control.wait(action):
+            return
 
-# Global counters
-success_counter = 0
-failure_counter = 0
-lock = threading.Lock()
+class BotPopulation:
+    """
+    Runs any number of bots in real time on one scheduler thread and a
+    pool of `concurrency` sender threads shared by all of them. A bot in a
+    pause is only an entry in a heap of wake-up times, not a sleeping
+    thread; when it is due, the scheduler hands it to the pool, where a
+    sender steps its behaviour model, sends its request, and steps it on
+    to its next pause. Each request costs one heap push and pop and two
+    queue hand-offs, with no per-bot polling, however many bots there are.
+    
+    Open-loop, the scheduler steps the bots itself and only the requests
+    go to the pool: a bot's requests are sent at the times its pauses add
+    up to from the start, without waiting for the responses to earlier
+    ones, so the send times are the same whatever the target (as an A/B
+    run needs). Its behaviour model is sent None instead of each status.
+    
+    Args:
+        run: SimulationRun to report into
+        target_url: URL each Request's path is appended to
+        concurrency: Sender threads, i.e. requests in flight at once
+        open_loop: Send on a schedule that does not depend on the responses
+    """
+    
+    def __init__(self, run, target_url, concurrency=100, open_loop=False):
+        self.run = run
+        self.target_url = target_url
+        self.concurrency = concurrency
+        self.open_loop = open_loop
+        self.bots = []
+        # One session per sender thread, shared by the bots it sends for
+        self.sessions = PerThread(requests.Session)
+        # (wake-up time, bot) handed back by senders, or (None, bot) when a bot is done
+        self._returned = queue.SimpleQueue()
+        self.control = None
+    
+    def add(self, bot):
+        self.bots.append(bot)
+    
+    def run_all(self, control=None):
+        """
+        Start every bot at once and block until all have finished, or until
+        `control` (a RunControl) stops the run: then no bot sends another
+        request, and requests in flight get its grace period to finish
+        
+        Returns:
+            Number of requests still in flight when the run gave up on them
+        """
+        control = self.control = control or RunControl()
+        if self.open_loop:
+            return self._run_open_loop(control)
+        returned = self._returned
+        order = itertools.count()
+        due = []
+        active = len(self.bots)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, active)))
+        # Each bot is handed over at most once at a time, so the window never fills; it tracks what is in flight
+        window = SubmissionWindow(executor, max(1, active))
+        try:
+            for bot in self.bots:
+                window.submit(self._wake, bot)
+            while active and not control.stopped():
+                now = time.perf_counter()
+                while due and due[0][0] <= now:
+                    window.submit(self._wake, heapq.heappop(due)[2])
+                timeout = due[0][0] - now if due else None
+                remaining = control.remaining()
+                if remaining is not None and (timeout is None or remaining < timeout):
+                    timeout = remaining
+                try:
+                    wake_at, bot = returned.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                if wake_at is None:
+                    active -= 1
+                else:
+                    heapq.heappush(due, (wake_at, next(order), bot))
+        except KeyboardInterrupt:
+            control.stop("interrupted")
+        unfinished = control.drain(window)
+        executor.shutdown(wait=False)
+        return unfinished
+    
+    def _run_open_loop(self, control):
+        order = itertools.count()
+        start = time.perf_counter()
+        due = [(start, next(order), bot) for bot in self.bots]
+        executor = ThreadPoolExecutor(max_workers=max(1, self.concurrency))
+        # While every sender is busy, submit() blocks and the requests that follow go late, not early
+        window = SubmissionWindow(executor, max(1, self.concurrency) * SUBMIT_AHEAD)
+        try:
+            while due:
+                due_at, _, bot = due[0]
+                if control.wait_until(due_at) is None:
+                    break
+                heapq.heappop(due)
+                pause = self._advance(bot, lambda action: window.submit(self._send, bot, action))
+                if pause is not None:
+                    heapq.heappush(due, (due_at + pause, next(order), bot))
+        except KeyboardInterrupt:
+            control.stop("interrupted")
+        unfinished = control.drain(window)
+        executor.shutdown(wait=False)
+        return unfinished
+    
+    def _wake(self, bot):
+        wake_at = None
+        try:
+            pause = self._advance(bot)
+            if pause is not None:
+                wake_at = time.perf_counter() + pause
+        finally:
+            self._returned.put((wake_at, bot))
+    
+    def _advance(self, bot, submit=None):
+        """
+        Step a bot to its next pause; returns the pause, or None once it is
+        done. Each request is sent and its status sent back to the bot, or
+        with `submit`, handed to it and the bot sent None.
+        """
+        result = None
+        while True:
+            try:
+                action = bot.actions.send(result)
+            except StopIteration:
+                return None
+            result = None
+            if isinstance(action, Request):
+                if self.control.stopped():
+                    return None
+                if submit is not None:
+                    submit(action)
+                else:
+                    result = self._send(bot, action)
+            elif isinstance(action, str):
+                self.run.reporter.message(action)
+            else:
+                return action
+    
+    def _send(self, bot, action):
+        url = f"{self.target_url}{action.path}"
+        # Rotating bots open a new connection per request, like separate clients would
+        sender = requests if bot.bot_type == "rotating" else self.sessions.get()
+        response = execute_request(self.run, bot.bot_type, action.label, url,
+                                   lambda: sender.request(action.method, url, json=action.data, headers=action.headers,
+                                                          cookies=bot.cookies, timeout=action.timeout))
+        if response is None:
+            return None
+        if response.cookies:
+            # Sessions are shared by bots, so each bot keeps its own cookies rather than the session's jar
+            bot.cookies = dict(bot.cookies or {}, **response.cookies.get_dict())
+            if sender is not requests:
+                sender.cookies.clear()
+        return response.status_code
 
 class BotSimulator:
-    def __init__(self, target_url):
+    def __init__(self, target_url, seed=None):
         self.target_url = target_url
-        self.ua_generator = UserAgent() if HAS_FAKE_UA else None
-        self.session = requests.Session()
+        # With a seed, every bot makes the same choices and waits on every run
+        # (fake_useragent cannot be seeded, so the fallback user agents are used)
+        self.seed = seed
+        self.ua_generator = UserAgent() if HAS_FAKE_UA and seed is None else None
+        # SimulationRun of the running botnet simulation
+        self.run = None
         
-        # API-specific paths for the product reviews system
-        self.api_paths = [
-            "",  # Main endpoint
-            "?product_id=prod1234",
-            "?product_id=test",
-            "?product_id=xyz123"
-        ]
-    
-    def get_random_user_agent(self):
+        # Bot type -> behaviour model (see behaviors.BEHAVIORS)
+        self.behaviors = MODELS
+    
+    def make_bot(self, key, bot_type, num_requests):
+        """A bot instance running bot_type's behaviour model, with its own random number generator seeded from key"""
+        rng = BotRandom(None if self.seed is None else f"{self.seed}:{key}")
+        model = self.behaviors[bot_type]
+        headers = None if model.rotate_user_agent else model.headers(self.pick_user_agent(model, rng))
+        bot = Bot(key, bot_type, rng, headers)
+        bot.actions = self.model_behavior(bot, model, num_requests)
+        return bot
+    
+    def get_random_user_agent(self, rng):
         """Get a random user agent string"""
-        if HAS_FAKE_UA:
+        if self.ua_generator:
             return self.ua_generator.random
         else:
-            return random.choice(FALLBACK_USER_AGENTS)
+            return rng.choice(FALLBACK_USER_AGENTS)
     
-    def generate_bot_session(self, bot_type):
-        """Create a session with characteristics of the specified bot type"""
-        s = requests.Session()
-        
-        if bot_type == "simple":
-            # Simple bot with fixed user agent
-            s.headers.update({
-                "User-Agent": "Python-urllib/3.8",
-                "Accept": "*/*"
-            })
-        
-        elif bot_type == "browser":
-            # Bot trying to look like a browser
-            s.headers.update({
-                "User-Agent": self.get_random_user_agent(),
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.5",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive"
-            })
-        
-        elif bot_type == "scraper":
-            # Typical scraper bot
-            s.headers.update({
-                "User-Agent": f"WebScraper/1.0 (Custom Scraper; Python/{random.choice(['3.6', '3.7', '3.8', '3.9'])})",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Encoding": "gzip, deflate",
-            })
-            
-        elif bot_type == "rotating":
-            # Bot that rotates user agents
-            pass  # We'll rotate user agents on each request
-            
-        return s
+    def pick_user_agent(self, model, rng):
+        """A user agent from the model's list, or None if its headers do not use one"""
+        if model.user_agents is None:
+            return None
+        if model.user_agents == "browsers":
+            return self.get_random_user_agent(rng)
+        return rng.choice(model.user_agents)
     
-    def generate_review_data(self, index=None):
-        """Generate random review data for POST requests"""
-        if index is None:
-            index = random.randint(1000, 9999)
-            
-        return {
-            "product_id": f"prod{index:04d}",
-            "review": f"This is review {index} from bot simulation",
-            "username": f"bot_user_{index:04d}"
-        }
-    
-    def simple_bot_behavior(self, num_requests, delay_range=(0.05, 0.2)):
-        """Execute simple bot behavior - rapid requests with fixed patterns"""
-        global success_counter, failure_counter
-        session = self.generate_bot_session("simple")
+    def model_behavior(self, bot, model, num_requests):
+        """Walk the bot through num_requests steps of its behaviour model"""
+        rng = bot.rng
         
-        print(f"Starting simple bot simulation with {num_requests} requests")
+        yield f"Starting {model.description} simulation with {num_requests} requests"
+        bot.state = model.first_state(rng.random())
         for i in range(num_requests):
-            # Randomly choose between GET and POST
-            method = random.choice(["GET", "POST"])
+            headers = bot.headers
+            if model.rotate_user_agent:
+                # Fresh headers with a new user agent for each request
+                headers = model.headers(self.pick_user_agent(model, rng))
             
-            if method == "GET":
-                path = random.choice(self.api_paths)
-                url = f"{self.target_url}{path}"
-                
-                try:
-                    response = session.get(url, timeout=5)
-                    print(f"Simple Bot GET {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Simple Bot GET {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
+            status = yield model.request(bot.state, i, num_requests, headers)
+            if model.rotate_user_agent and status is not None:
+                yield f"  User-Agent: {headers['User-Agent'][:50]}..."
             
-            else:  # POST
-                url = self.target_url
-                data = self.generate_review_data(i)
-                
-                try:
-                    response = session.post(url, json=data, timeout=5)
-                    print(f"Simple Bot POST {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Simple Bot POST {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-                    
-            time.sleep(random.uniform(*delay_range))
-    
-    def browser_bot_behavior(self, num_requests, delay_range=(0.5, 2)):
-        """Execute browser-like bot behavior with more realistic timing"""
-        global success_counter, failure_counter
-        session = self.generate_bot_session("browser")
+            yield model.pause(rng.random())
+            bot.state = model.next_state(bot.state, rng.random())
+    
+    def simulate_botnet(self, bot_types, requests_per_bot=20, report=True, reporter=None, recorder=None,
+                        bots_per_type=1, weights=None, concurrency=100, shard=None, control=None, open_loop=False):
+        """
+        Simulate multiple bots attacking simultaneously; returns the run's RunStats
         
-        print(f"Starting browser-like bot simulation with {num_requests} requests")
-        visited_paths = []
+        Args:
+            reporter: Running Reporter to send progress to (by default the botnet starts its own)
+            recorder: Recorder to write a record of every request to
+            bots_per_type, weights: Bot instances of each type (see bot_population)
+            concurrency: Requests the bots can have in flight at once
+            shard: (n, count) to run only every count-th bot instance, starting with the nth (for worker processes)
+            control: RunControl that stops the botnet early (at a deadline, or on Ctrl+C)
+            open_loop: Send each bot's requests at the times its pauses add up to, without waiting for responses
+        """
+        own_reporter = reporter is None
         
-        for i in range(num_requests):
-            # Sometimes revisit previous paths like a real user might
-            if visited_paths and random.random() < 0.3:
-                path = random.choice(visited_paths)
-            else:
-                path = random.choice(self.api_paths)
-                visited_paths.append(path)
-            
-            method = random.choice(["GET", "POST"])
-            
-            if method == "GET":
-                url = f"{self.target_url}{path}"
-                
-                try:
-                    response = session.get(url, timeout=10)
-                    print(f"Browser Bot GET {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Browser Bot GET {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-            
-            else:  # POST
-                url = self.target_url
-                data = self.generate_review_data(i)
-                
-                try:
-                    response = session.post(url, json=data, timeout=10)
-                    print(f"Browser Bot POST {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Browser Bot POST {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-                
-            time.sleep(random.uniform(*delay_range))
-    
-    def rotating_user_agent_bot(self, num_requests, delay_range=(0.2, 1)):
-        """Execute bot behavior that rotates user agents"""
-        global success_counter, failure_counter
-        print(f"Starting rotating user agent bot simulation with {num_requests} requests")
+        for bot_type in bot_types:
+            if bot_type not in self.behaviors:
+                print(f"Unknown bot type: {bot_type}")
+        population = bot_population([t for t in bot_types if t in self.behaviors], bots_per_type, weights)
+        if shard is not None:
+            population = population[shard[0]::shard[1]]
         
-        for i in range(num_requests):
-            # Create fresh headers with a new user agent for each request
-            headers = {
-                "User-Agent": self.get_random_user_agent(),
-                "Accept": "application/json, text/plain, */*",
-                "Content-Type": "application/json"
-            }
-            
-            method = random.choice(["GET", "POST"])
-            
-            if method == "GET":
-                path = random.choice(self.api_paths)
-                url = f"{self.target_url}{path}"
-                
-                try:
-                    response = requests.get(url, headers=headers, timeout=5)
-                    print(f"Rotating UA Bot GET {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    print(f"  User-Agent: {headers['User-Agent'][:50]}...")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Rotating UA Bot GET {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-            
-            else:  # POST
-                url = self.target_url
-                data = self.generate_review_data(i)
-                
-                try:
-                    response = requests.post(url, json=data, headers=headers, timeout=5)
-                    print(f"Rotating UA Bot POST {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    print(f"  User-Agent: {headers['User-Agent'][:50]}...")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Rotating UA Bot POST {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-                
-            time.sleep(random.uniform(*delay_range))
-    
-    def scraper_bot_behavior(self, num_requests, delay_range=(0.1, 0.5)):
-        """Execute scraper bot behavior that follows a systematic pattern"""
-        global success_counter, failure_counter
-        session = self.generate_bot_session("scraper")
+        print(f"Starting botnet simulation with {len(population)} bots of {len(bot_types)} bot types")
+        start_time = time.time()
         
-        print(f"Starting scraper bot simulation with {num_requests} requests")
+        self.run = SimulationRun(reporter or Reporter("Botnet", len(population) * requests_per_bot).start(), recorder)
+        bots = BotPopulation(self.run, self.target_url, concurrency, open_loop)
+        for key, bot_type in population:
+            bots.add(self.make_bot(key, bot_type, requests_per_bot))
+        for bot_type, count in Counter(bot_type for _, bot_type in population).items():
+            print(f"Starting {count} {bot_type} bot{'s' if count > 1 else ''}")
+        unfinished = bots.run_all(control)
+        if own_reporter:
+            self.run.reporter.stop()
         
-        # Use mostly GET requests, scraping is typically read-heavy
-        for i in range(num_requests):
-            # 80% chance of GET, 20% chance of POST for scrapers that also submit data
-            method = "GET" if random.random() < 0.8 else "POST"
-            
-            if method == "GET":
-                # Systematic approach - go through product IDs sequentially
-                path = f"?product_id=prod{i%100:04d}"
-                url = f"{self.target_url}{path}"
-                
-                try:
-                    response = session.get(url, timeout=5)
-                    print(f"Scraper Bot GET {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Scraper Bot GET {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-            
-            else:  # POST
-                url = self.target_url
-                data = self.generate_review_data(i)
-                
-                try:
-                    response = session.post(url, json=data, timeout=5)
-                    print(f"Scraper Bot POST {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Scraper Bot POST {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-                
-            time.sleep(random.uniform(*delay_range))
-    
-    def flood_bot_behavior(self, num_requests, delay_range=(0.01, 0.05)):
-        """Execute a flood attack with minimal delays between requests"""
-        global success_counter, failure_counter
-        session = self.generate_bot_session("simple")
+        stats = collect_stats(self.run.results, start_time, bots.control, unfinished)
+        if report:
+            print_report("Botnet", stats)
+        return stats
+
+def collect_stats(results, start_time, control=None, unfinished=0):
+    """Merge the per-thread RunStats of a run that started at start_time, noting if `control` stopped it early"""
+    stats = RunStats()
+    for thread_stats in results.values():
+        stats.merge(thread_stats)
+    stats.elapsed = time.time() - start_time
+    stats.requests = sum(stats.outcomes.values())
+    if control is not None:
+        stats.stopped = control.reason
+        stats.unfinished = unfinished
+    return stats
+
+def print_report(title, stats, latency=True):
+    """
+    Print a simulation's results, or several workers' results merged
+    
+    Args:
+        latency: Include the latency line (virtual runs do not measure latency)
+    """
+    total_requests = stats.requests
+    
+    print(f"\n{title} simulation complete")
+    if stats.workers > 1:
+        print(f"Worker processes: {stats.workers}")
+    print(f"Total time: {stats.elapsed:.2f} seconds")
+    stats.print_stopped()
+    print(f"Total requests: {total_requests}")
+    print(f"Successful requests: {stats.success}")
+    print(f"Blocked requests: {stats.outcomes['blocked']}")
+    print(f"Failed requests: {stats.errors}")
+    if total_requests > 0:
+        print(f"Success rate: {stats.success/total_requests*100:.2f}%")
+    stats.print_breakdown()
+    if stats.elapsed:
+        print(f"Requests per second: {total_requests/stats.elapsed:.2f}")
+    if latency:
+        print(f"Latency: {stats.latency.summary()}")
+
+def human_actions(user_id, requests_per_user, seed=None, ua=None):
+    """
+    A human user's behaviour model: view a few products, then post reviews,
+    with human-like pauses
+    
+    Args:
+        seed: Make the user's choices and pauses the same on every run
+        ua: fake_useragent UserAgent to pick the user agent from (otherwise a fallback user agent)
+    """
+    rng = random.Random(None if seed is None else f"{seed}:human:{user_id}")
+    user_agent = ua.random if ua else rng.choice(FALLBACK_USER_AGENTS)
+    
+    # Realistic headers
+    headers = {
+        "User-Agent": user_agent,
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "en-US,en;q=0.5",
+        "Content-Type": "application/json"
+    }
+    
+    # Generate some product IDs this user might be interested in
+    product_ids = [f"prod{rng.randint(1000, 9999):04d}" for _ in range(3)]
+    
+    # First action: view products (GET requests)
+    for i in range(min(5, requests_per_user)):
+        product_id = rng.choice(product_ids)
         
-        print(f"Starting flood bot simulation with {num_requests} requests")
+        yield Request(f"Human {user_id} - GET {i+1}/{requests_per_user}", "GET", f"?product_id={product_id}",
+                      headers=headers, timeout=10)
         
-        # Mostly POST requests for flood attack
-        for i in range(num_requests):
-            url = self.target_url
-            data = self.generate_review_data(i)
+        # Human-like pause
+        yield rng.uniform(2, 8)
+    
+    # Second action: submit a review (POST request) if we have remaining requests
+    if requests_per_user > 5:
+        for i in range(5, requests_per_user):
+            product_id = rng.choice(product_ids)
             
-            try:
-                response = session.post(url, json=data, timeout=3)
-                print(f"Flood Bot POST {i+1}/{num_requests}: {url} - Status: {response.status_code}")
-                with lock:
-                    success_counter += 1
-            except Exception as e:
-                print(f"Flood Bot POST {i+1}/{num_requests}: {url} - Error: {str(e)}")
-                with lock:
-                    failure_counter += 1
+            # Generate review data
+            review_data = {
+                "product_id": product_id,
+                "review": f"I really like this product! It's exactly what I needed. User {user_id} review.",
+                "username": f"User{user_id:03d}"
+            }
+            
+            yield Request(f"Human {user_id} - POST {i+1}/{requests_per_user}", "POST", "", review_data, headers,
+                          timeout=10)
             
-            time.sleep(random.uniform(*delay_range))
+            # Human-like pause
+            yield rng.uniform(5, 15)
     
-    def simulate_botnet(self, bot_types, requests_per_bot=20):
-        """Simulate multiple bots attacking simultaneously"""
-        global success_counter, failure_counter
-        success_counter = 0
-        failure_counter = 0
-        
-        print(f"Starting botnet simulation with {len(bot_types)} bot types")
-        start_time = time.time()
-        
-        bot_functions = {
-            "simple": self.simple_bot_behavior,
-            "browser": self.browser_bot_behavior,
-            "rotating": self.rotating_user_agent_bot,
-            "scraper": self.scraper_bot_behavior,
-            "flood": self.flood_bot_behavior
-        }
-        
-        threads = []
-        
-        for bot_type in bot_types:
-            if bot_type in bot_functions:
-                t = threading.Thread(
-                    target=bot_functions[bot_type], 
-                    args=(requests_per_bot,)
-                )
-                threads.append(t)
-                print(f"Starting {bot_type} bot thread")
-                t.start()
-            else:
-                print(f"Unknown bot type: {bot_type}")
-        
-        for t in threads:
-            t.join()
-        
-        elapsed_time = time.time() - start_time
-        total_requests = success_counter + failure_counter
-        
-        print("\nBotnet simulation complete")
-        print(f"Total time: {elapsed_time:.2f} seconds")
-        print(f"Total requests: {total_requests}")
-        print(f"Successful requests: {success_counter}")
-        print(f"Failed requests: {failure_counter}")
-        print(f"Success rate: {success_counter/total_requests*100:.2f}% if total_requests > 0 else 0")
-        print(f"Requests per second: {total_requests/elapsed_time:.2f}")
+    yield f"Human {user_id} session complete"
 
-def simulate_human_traffic(url, num_users=5, requests_per_user=10):
-    """Simulate legitimate human traffic patterns"""
-    global success_counter, failure_counter
-    success_counter = 0
-    failure_counter = 0
+def simulate_human_traffic(url, num_users=5, requests_per_user=10, report=True, reporter=None, recorder=None, seed=None,
+                           control=None, open_loop=False):
+    """
+    Simulate legitimate human traffic patterns; returns the run's RunStats
+    
+    Args:
+        reporter: Running Reporter to send progress to (by default the simulation starts its own)
+        recorder: Recorder to write a record of every request to
+        seed: Make every user's choices and pauses the same on every run
+        control: RunControl that stops the users early (at a deadline, or on Ctrl+C)
+        open_loop: Send each user's requests at the times their pauses add up to, without waiting for responses
+    """
+    own_reporter = reporter is None
+    control = control or RunControl()
     
     print(f"Starting human traffic simulation with {num_users} users making {requests_per_user} requests each")
     start_time = time.time()
+    if own_reporter:
+        reporter = Reporter("Human traffic", num_users * requests_per_user).start()
+    run = SimulationRun(reporter, recorder)
+    # Loading the user agent data is slow; one instance serves every session
+    ua = UserAgent() if HAS_FAKE_UA and seed is None else None
+    
+    # Open-loop, the sessions only keep time and their requests are sent from a pool of their own
+    senders = ThreadPoolExecutor(max_workers=num_users) if open_loop else None
+    send_window = SubmissionWindow(senders, num_users * SUBMIT_AHEAD) if open_loop else None
     
     def human_session(user_id):
-        # Create session with realistic headers
-        session = requests.Session()
-        ua = UserAgent() if HAS_FAKE_UA else None
-        user_agent = ua.random if HAS_FAKE_UA else random.choice(FALLBACK_USER_AGENTS)
-        
-        session.headers.update({
-            "User-Agent": user_agent,
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Content-Type": "application/json"
-        })
-        
-        # Generate some product IDs this user might be interested in
-        product_ids = [f"prod{random.randint(1000, 9999):04d}" for _ in range(3)]
-        
-        # First action: view products (GET requests)
-        for i in range(min(5, requests_per_user)):
-            product_id = random.choice(product_ids)
-            full_url = f"{url}?product_id={product_id}"
-            
+        drive(run, "human", human_actions(user_id, requests_per_user, seed, ua), url, requests.Session(), control,
+              send_window)
+    
+    # Launch human sessions in parallel
+    executor = ThreadPoolExecutor(max_workers=num_users)
+    window = SubmissionWindow(executor, num_users)
+    for user_id in range(1, num_users+1):
+        window.submit(human_session, user_id)
+    unfinished = control.drain(window)
+    executor.shutdown(wait=False)
+    if open_loop:
+        unfinished += control.drain(send_window)
+        senders.shutdown(wait=False)
+    if own_reporter:
+        reporter.stop()
+    
+    stats = collect_stats(run.results, start_time, control, unfinished)
+    if report:
+        print_report("Human traffic", stats)
+    return stats
+
+class VirtualSimulation:
+    """
+    Runs behaviour models on a virtual clock against the local WAF emulator
+    and reviews stand-in, called in-process instead of over HTTP. Every
+    bot and user is a generator whose next step waits in an EventScheduler:
+    a pause just schedules the step that follows it, and a request is
+    evaluated by the web ACL (whose rate-based rules read the same virtual
+    clock), handled by the stand-in if allowed, and answered `latency`
+    virtual seconds later. Pauses take no wall-clock time, so minutes of
+    traffic from thousands of users run in seconds, with the outcomes the
+    WAF would give for the same timing. The response time is modelled, not
+    measured, so no latency is recorded: it only sets when a model's next
+    step runs.
+    
+    Args:
+        events: EventScheduler the web ACL was compiled with as its clock
+        acl: webacl.WebAcl in front of the service, or None for an unprotected API
+        service: local_api.ReviewsService
+        path: Path requests are sent to (Request paths are appended to it)
+        latency: Modelled virtual seconds from a request to its response
+    """
+    
+    def __init__(self, events, acl, service, path="/reviews", latency=0.05):
+        self.events = events
+        self.acl = acl
+        self.service = service
+        self.path = path
+        self.latency = latency
+    
+    def add(self, run, source, actions, client_ip, start=0.0):
+        """Start a behaviour model (see Request) at virtual time `start`, sending from client_ip"""
+        self.events.at(start, self._step, run, source, actions, client_ip, None)
+    
+    def add_trace(self, run, trace_path, shared_ip=True):
+        """
+        Replay a trace file (see bot_trace.py) open-loop: every request at
+        its recorded offset, however earlier requests were answered. Records
+        are read as they fall due, so only one is scheduled at a time.
+        """
+        self._next_traced(run, iter_requests(trace_path), shared_ip)
+    
+    def _next_traced(self, run, traced, shared_ip):
+        for offset, bot, bot_type, request in traced:
+            self.events.at(offset, self._send_traced, run, traced, shared_ip, bot, bot_type, request)
+            return
+    
+    def _send_traced(self, run, traced, shared_ip, bot, bot_type, request):
+        self.send(run, bot_type, request, client_address(bot, shared_ip))
+        self._next_traced(run, traced, shared_ip)
+    
+    def _step(self, run, source, actions, client_ip, result):
+        while True:
             try:
-                response = session.get(full_url, timeout=10)
-                print(f"Human {user_id} - GET {i+1}/{requests_per_user}: product_id={product_id} - Status: {response.status_code}")
-                with lock:
-                    success_counter += 1
-            except Exception as e:
-                print(f"Human {user_id} - GET {i+1}/{requests_per_user}: product_id={product_id} - Error: {str(e)}")
-                with lock:
-                    failure_counter += 1
-                
-            # Human-like pause
-            time.sleep(random.uniform(2, 8))
+                action = actions.send(result)
+            except StopIteration:
+                return
+            result = None
+            if isinstance(action, Request):
+                status = self.send(run, source, action, client_ip)
+                self.events.after(self.latency, self._step, run, source, actions, client_ip, status)
+                return
+            if isinstance(action, str):
+                run.reporter.message(action)
+            else:
+                self.events.after(action, self._step, run, source, actions, client_ip, None)
+                return
+    
+    def send(self, run, source, action, client_ip):
+        """Put one request through the web ACL and the stand-in; returns the status"""
+        headers = dict(action.headers or {})
+        body = b""
+        if action.data is not None:
+            body = json.dumps(action.data).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        target = f"{self.path}{action.path}"
+        request = HttpRequest(action.method, target, "HTTP/1.1", headers, body, client_ip)
         
-        # Second action: submit a review (POST request) if we have remaining requests
-        if requests_per_user > 5:
-            for i in range(5, requests_per_user):
-                product_id = random.choice(product_ids)
-                
-                # Generate review data
-                review_data = {
-                    "product_id": product_id,
-                    "review": f"I really like this product! It's exactly what I needed. User {user_id} review.",
-                    "username": f"User{user_id:03d}"
-                }
-                
-                try:
-                    response = session.post(url, json=review_data, timeout=10)
-                    print(f"Human {user_id} - POST {i+1}/{requests_per_user}: product_id={product_id} - Status: {response.status_code}")
-                    with lock:
-                        success_counter += 1
-                except Exception as e:
-                    print(f"Human {user_id} - POST {i+1}/{requests_per_user}: product_id={product_id} - Error: {str(e)}")
-                    with lock:
-                        failure_counter += 1
-                
-                # Human-like pause
-                time.sleep(random.uniform(5, 15))
+        verdict = self.acl.evaluate(request)[0] if self.acl is not None else "Allow"
+        if verdict in ACTION_STATUS:
+            status, size = ACTION_STATUS[verdict], len(BLOCK_BODY)
+        else:
+            status, _, response_body = self.service.invoke(request)
+            size = len(response_body)
         
-        print(f"Human {user_id} session complete")
+        outcome = run.results.get().record_status(status)
+        run.reporter.record(outcome, f"{action.label}: {target} - Status: {status}")
+        if run.recorder is not None:
+            run.recorder.record(self.events.now, NOT_MEASURED, status, outcome, size, run.recorder.source_id(source))
+        return status
+
+def weight_argument(value):
+    """argparse type for TYPE=WEIGHT"""
+    bot_type, _, weight = value.partition("=")
+    try:
+        return bot_type, float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected TYPE=WEIGHT, got {value!r}")
+
+def client_address(n, shared):
+    """Client IP of the nth simulated bot or user: one address for all when shared, as from one load generator"""
+    if shared:
+        return "198.51.100.1"
+    return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+def run_virtual_simulation(mode, bot_types, bot_requests, humans, human_requests, path="/reviews", protected=False,
+                           shared_ip=True, latency=0.05, duration=None, seed=None, rate_limit=None,
+                           verbosity=NORMAL, log_path=None, report_interval=1.0, record_path=None, bots_per_type=1,
+                           bot_weights=None, trace_path=None):
+    """
+    Run one simulation mode on a virtual clock (see VirtualSimulation)
+    against the web ACL from wafcf.yaml and the reviews stand-in
     
-    # Launch human sessions in parallel
-    with ThreadPoolExecutor(max_workers=num_users) as executor:
-        for user_id in range(1, num_users+1):
-            executor.submit(human_session, user_id)
+    Args:
+        path: Path requests are sent to; the rate-based rule's scope-down statement matches on it
+        protected: Put the web ACL in front of the protected function, as in the protected API
+            (otherwise the unprotected function is called directly)
+        shared_ip: Send every bot's and user's requests from one client IP, as a single load generator
+            does (otherwise each gets its own, as a real botnet and real users would)
+        latency: Modelled virtual seconds from each request to its response (not reported as latency)
+        duration: Stop after this many virtual seconds
+        rate_limit: Override the rate-based rule's limit
+        bots_per_type, bot_weights: Bot instances of each type (see bot_population)
+        trace_path: Replay the bot requests of this trace file (see bot_trace.py) instead of running the bots
     
-    elapsed_time = time.time() - start_time
-    total_requests = success_counter + failure_counter
+    Returns:
+        dict of report title -> RunStats, with elapsed in virtual seconds
+    """
+    if mode == "flood" and "flood" not in bot_types:
+        bot_types.append("flood")
+    events = EventScheduler()
+    acl = None
+    if protected:
+        acl = compile_web_acl(load_web_acl_definition(), clock=events, rate_limit=rate_limit)
+        for name, reason in acl.skipped:
+            print(f"Skipping rule {name}: unsupported {reason}")
+    service = ReviewsService("ProtectedLambdaFunction" if protected else "UnprotectedLambdaFunction")
+    simulation = VirtualSimulation(events, acl, service, path, latency)
     
-    print("\nHuman traffic simulation complete")
-    print(f"Total time: {elapsed_time:.2f} seconds")
-    print(f"Total requests: {total_requests}")
-    print(f"Successful requests: {success_counter}")
-    print(f"Failed requests: {failure_counter}")
-    if total_requests > 0:
-        print(f"Success rate: {success_counter/total_requests*100:.2f}%")
-    print(f"Requests per second: {total_requests/elapsed_time:.2f}")
+    bot_sim = BotSimulator(path, seed)
+    for bot_type in bot_types:
+        if bot_type not in bot_sim.behaviors:
+            print(f"Unknown bot type: {bot_type}")
+    population = bot_population([t for t in bot_types if t in bot_sim.behaviors], bots_per_type, bot_weights)
+    trace = read_trace_header(trace_path)[0] if trace_path else None
+    expected = 0
+    if mode != "human":
+        expected += trace["records"] if trace else len(population) * bot_requests
+    if mode in ("human", "mixed"):
+        expected += humans * human_requests
+    recorder = None
+    if record_path:
+        recorder = Recorder(record_path, dict(tool="bot_simulator", virtual=True, path=path, protected=protected,
+                                              mode=mode, bot_types=bot_types, bot_requests=bot_requests,
+                                              bots_per_type=bots_per_type, bot_weights=bot_weights, trace=trace_path,
+                                              humans=humans, human_requests=human_requests, seed=seed,
+                                              modelled_latency=latency))
+    reporter = Reporter("Virtual", expected, verbosity, log_path, report_interval).start()
+    
+    runs = {}
+    clients = 0
+    if mode != "human":
+        runs["Botnet"] = SimulationRun(reporter, recorder)
+        if trace:
+            print(f"Replaying {trace['records']} requests of {trace['bots']} bots from {trace_path}")
+            simulation.add_trace(runs["Botnet"], trace_path, shared_ip)
+            clients += trace["bots"]
+        else:
+            for key, bot_type in population:
+                simulation.add(runs["Botnet"], bot_type, bot_sim.make_bot(key, bot_type, bot_requests).actions,
+                               client_address(clients, shared_ip))
+                clients += 1
+    if mode in ("human", "mixed") and humans:
+        runs["Human traffic"] = SimulationRun(reporter, recorder)
+        ua = UserAgent() if HAS_FAKE_UA and seed is None else None
+        for user_id in range(1, humans + 1):
+            simulation.add(runs["Human traffic"], "human", human_actions(user_id, human_requests, seed, ua),
+                           client_address(clients, shared_ip))
+            clients += 1
+    
+    print(f"Simulating {clients} clients on a virtual clock against {path} "
+          f"({'web ACL + protected function' if protected else 'unprotected function'})")
+    start = time.perf_counter()
+    events.run(until=duration)
+    wall = time.perf_counter() - start
+    reporter.stop()
+    if recorder is not None:
+        recorder.close()
+    
+    results = {}
+    for title, run in runs.items():
+        stats = collect_stats(run.results, 0.0)
+        stats.elapsed = events.now
+        results[title] = stats
+        print_report(title, stats, latency=False)
+    print(f"\nSimulated {events.now:.1f}s of traffic ({events.processed} events) in {wall:.2f}s")
+    print(f"Latency is not measured on the virtual clock; every response was modelled as taking {latency*1000:g} ms")
+    if len(events):
+        print(f"Stopped at the {duration}s duration limit with {len(events)} steps still scheduled")
+    if acl is not None:
+        print("Web ACL rule matches: " + ", ".join(f"{rule.name}: {rule.matches}" for rule in acl.rules))
+    return results
+
+def run_simulation(mode, target_url, bot_types, bot_requests, humans, human_requests, report=True, worker=None,
+                   verbosity=NORMAL, log_path=None, report_interval=1.0, record_path=None, seed=None, label="",
+                   workers=1, bots_per_type=1, bot_weights=None, bot_concurrency=100, bot_shard=None, duration=None,
+                   grace=GRACE_SECONDS, open_loop=False):
+    """
+    Run one simulation mode. At `duration` seconds or on Ctrl+C, bots and
+    users send no more requests; those in flight get `grace` seconds to
+    finish, and the results are those of the partial run.
+    
+    Args:
+        bots_per_type, bot_weights: Bot instances of each type (see bot_population)
+        bot_concurrency: Requests the bots can have in flight at once
+        bot_shard: (n, count) to run only every count-th bot instance, starting with the nth
+        worker, workers: This process's worker number, and the number of workers per target (in an A/B
+            run, A's workers are numbered first, then B's)
+        label: Target label of an A/B run ("A" or "B"), shown in progress lines and added to file names
+        seed: Make every bot's and user's choices and pauses the same on every run
+        verbosity: reporter.QUIET, NORMAL (a progress line every report_interval seconds) or VERBOSE (every request)
+        log_path: Write every request's result to this file (a worker writes to log_path.[<label>.]<worker>)
+        record_path: Write a fixed-width record of every request to this file (named as for log_path)
+        duration: Stop after this many seconds, or None to run every bot and user to the end
+        grace: Seconds requests in flight get to finish once the run stops
+        open_loop: Send every request at the time the pauses before it add up to, without waiting for
+            responses, so the schedule is the same whatever the target (A/B runs)
+    
+    Returns:
+        dict of report title -> RunStats
+    """
+    results = {}
+    if mode == "flood" and "flood" not in bot_types:
+        bot_types.append("flood")
+    expected = 0
+    if mode != "human":
+        population = bot_population(bot_types, bots_per_type, bot_weights)
+        expected += len(population[bot_shard[0]::bot_shard[1]] if bot_shard else population) * bot_requests
+    if mode in ("human", "mixed"):
+        expected += humans * human_requests
+    name, suffix = run_name(label, worker % workers if worker is not None else 0, workers)
+    if log_path and suffix:
+        log_path = f"{log_path}.{suffix}"
+    recorder = None
+    if record_path:
+        recorder = Recorder(f"{record_path}.{suffix}" if suffix else record_path,
+                            dict(tool="bot_simulator", url=target_url, mode=mode, bot_types=bot_types,
+                                 bot_requests=bot_requests, bots_per_type=bots_per_type, bot_weights=bot_weights,
+                                 humans=humans, human_requests=human_requests, seed=seed))
+    # One reporter for the whole run, so mixed mode shows bots and humans on one progress line
+    reporter = Reporter(name, expected, verbosity, log_path, report_interval).start()
+    control = RunControl(duration, grace)
+    
+    if mode in ("flood", "botnet"):
+        bot_sim = BotSimulator(target_url, seed)
+        results["Botnet"] = bot_sim.simulate_botnet(bot_types, bot_requests, False, reporter, recorder, bots_per_type,
+                                                    bot_weights, bot_concurrency, bot_shard, control, open_loop)
+    elif mode == "human":
+        if humans:
+            results["Human traffic"] = simulate_human_traffic(target_url, humans, human_requests, False, reporter, recorder,
+                                                              seed, control, open_loop)
+    elif mode == "mixed":
+        # Start human traffic in a separate thread
+        human_thread = threading.Thread(
+            target=lambda: results.update({"Human traffic": simulate_human_traffic(target_url, humans, human_requests,
+                                                                                   False, reporter, recorder, seed,
+                                                                                   control, open_loop)})
+        )
+        human_thread.daemon = True
+        if humans:
+            human_thread.start()
+        
+        # Start botnet simulation
+        bot_sim = BotSimulator(target_url, seed)
+        results["Botnet"] = bot_sim.simulate_botnet(bot_types, bot_requests, False, reporter, recorder, bots_per_type,
+                                                    bot_weights, bot_concurrency, bot_shard, control, open_loop)
+        
+        # Wait for human thread to complete
+        if humans:
+            try:
+                human_thread.join()
+            except KeyboardInterrupt:
+                control.stop("interrupted")
+                human_thread.join()
+    reporter.stop()
+    if recorder is not None:
+        recorder.close()
+    
+    # Reports follow the reporter's final progress line
+    if report:
+        for title, stats in results.items():
+            print_report(title, stats)
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Bot Network Simulation Tool for API Gateway")
     parser.add_argument("--url", help="Target URL (will use default endpoints if not provided)")
     parser.add_argument("--mode", required=True, choices=["botnet", "human", "mixed", "flood"], help="Simulation mode")
     parser.add_argument("--protected", action="store_true", help="Use protected API instead of unprotected")
+    parser.add_argument("--compare-url",
+                        help="A/B run: send the same generated traffic on the same schedule to this URL too, "
+                             "and print one comparison")
+    parser.add_argument("--ab", action="store_true",
+                        help="A/B run of the unprotected (A) against the protected (B) API; same as --compare-url with "
+                             "the protected API")
+    parser.add_argument("--seed", type=int, help="Seed for the bots' and users' random choices, to repeat a run exactly")
     parser.add_argument("--bot-types", nargs="+", default=["simple", "browser", "rotating", "scraper"], 
                         help="Types of bots to simulate")
     parser.add_argument("--bot-requests", type=int, default=20, help="Requests per bot")
+    parser.add_argument("--bots-per-type", type=int, default=1,
+                        help="Bot instances of each type, each with its own headers, cookies and random choices")
+    parser.add_argument("--bot-weights", nargs="+", type=weight_argument, metavar="TYPE=WEIGHT",
+                        help="Scale --bots-per-type for some bot types, e.g. flood=10 browser=0.5")
+    parser.add_argument("--bot-concurrency", type=int, default=100,
+                        help="Requests the bots can have in flight at once (sender threads shared by all bots)")
     parser.add_argument("--humans", type=int, default=3, help="Number of human users to simulate")
     parser.add_argument("--human-requests", type=int, default=10, help="Requests per human user")
-    parser.add_argument("--duration", type=int, default=60, help="Maximum duration in seconds")
+    parser.add_argument("--duration", type=int, default=60,
+                        help="Stop after this many seconds and report the partial run")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help="Seconds requests in flight get to finish once the run stops (at --duration or Ctrl+C)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the bot requests and human users (one per CPU core scales furthest)")
+    add_report_arguments(parser)
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record every request (time, latency, status, bytes, bot type) to FILE for recorder.py to analyse")
+    parser.add_argument("--virtual", action="store_true",
+                        help="Simulate on a virtual clock against the local WAF emulator and reviews stand-in, in-process: "
+                             "--duration seconds of traffic run in however long the requests take to evaluate")
+    parser.add_argument("--client-ips", choices=["shared", "per-client"], default="shared",
+                        help="--virtual: send from one client IP, as this tool does, or give every bot and user its own")
+    parser.add_argument("--virtual-latency", type=float, default=50.0,
+                        help="--virtual: modelled milliseconds from each request to its response; it delays each "
+                             "bot's and user's next step and is not reported as latency")
+    parser.add_argument("--rate-limit", type=int, help="--virtual: override the rate-based rule's limit")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="--virtual: replay the bot requests of a trace written by bot_trace.py instead of running bots")
     
     args = parser.parse_args()
+    bot_weights = dict(args.bot_weights or [])
+    
+    if args.trace and not args.virtual:
+        parser.error("--trace needs --virtual (replay.py sends a trace to a live target)")
+    if args.virtual:
+        if not HAS_EMULATOR:
+            print("Error: --virtual needs the local WAF emulator's dependencies: pip install pyyaml")
+            exit(1)
+        if args.compare_url or args.ab:
+            parser.error("--virtual runs against the local emulator; it cannot be combined with --compare-url or --ab")
+        # Only the path matters in-process; the web ACL's rate-based rule is scoped to paths starting /reviews
+        path = urlsplit(args.url).path if args.url else "/reviews"
+        print(f"Mode: {args.mode} (virtual clock, up to {args.duration}s)")
+        print(f"API Type: {'Protected' if args.protected else 'Unprotected'}")
+        run_virtual_simulation(args.mode, args.bot_types, args.bot_requests, args.humans, args.human_requests, path,
+                               args.protected, args.client_ips == "shared", args.virtual_latency / 1000, args.duration,
+                               args.seed, args.rate_limit, args.verbosity, args.log_file, args.report_interval,
+                               args.record, args.bots_per_type, bot_weights, args.trace)
+        exit(0)
     
     # Default API endpoints
     unprotected_api = "https://ej8w9qp45k.execute-api.us-east-1.amazonaws.com/demo/reviews"
@@ -452,50 +943,59 @@ if __name__ == "__main__":
         target_url = args.url
     else:
         target_url = protected_api if args.protected else unprotected_api
+    compare_url = args.compare_url
+    if args.ab:
+        target_url = args.url or unprotected_api
+        compare_url = compare_url or protected_api
     
     print(f"Starting API simulation against {target_url}")
     print(f"Mode: {args.mode}")
-    print(f"API Type: {'Protected' if args.protected else 'Unprotected'}")
-    print("Press Ctrl+C to abort\n")
-    
-    # Start a timer to limit total runtime
-    max_duration = args.duration
-    start_time = time.time()
+    if compare_url:
+        print(f"A/B run: the same traffic is sent to {compare_url} at the same time, on a schedule fixed in advance "
+              "(requests do not wait for the responses to earlier ones)")
+    else:
+        print(f"API Type: {'Protected' if args.protected else 'Unprotected'}")
+    print(f"Stopping after {args.duration}s; press Ctrl+C to stop early\n")
     
     try:
-        # Set up a timer to enforce maximum duration
-        timer = threading.Timer(max_duration, lambda: print(f"\nMaximum duration of {max_duration}s reached. Exiting...") or exit(0))
-        timer.daemon = True
-        timer.start()
-        
-        if args.mode == "flood" or (args.mode == "botnet" and "flood" in args.bot_types):
-            if "flood" not in args.bot_types:
-                args.bot_types.append("flood")
-            bot_sim = BotSimulator(target_url)
-            bot_sim.simulate_botnet(args.bot_types, args.bot_requests)
-        elif args.mode == "botnet":
-            bot_sim = BotSimulator(target_url)
-            bot_sim.simulate_botnet(args.bot_types, args.bot_requests)
-        elif args.mode == "human":
-            simulate_human_traffic(target_url, args.humans, args.human_requests)
-        elif args.mode == "mixed":
-            # Start human traffic in a separate thread
-            human_thread = threading.Thread(
-                target=simulate_human_traffic,
-                args=(target_url, args.humans, args.human_requests)
-            )
-            human_thread.daemon = True
-            human_thread.start()
-            
-            # Start botnet simulation
-            bot_sim = BotSimulator(target_url)
-            bot_sim.simulate_botnet(args.bot_types, args.bot_requests)
-            
-            # Wait for human thread to complete
-            human_thread.join()
-            
-        # Cancel the timer if we complete before the max duration
-        timer.cancel()
-            
+        if args.workers > 1 or compare_url:
+            # Each worker runs a share of the bot instances (or, with fewer bots than workers, every bot
+            # with a share of its requests), and a share of the humans.
+            # In an A/B run, worker n of A and worker n of B share a seed, so they generate the same traffic.
+            seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+            workers = max(1, args.workers)
+            bot_types = args.bot_types + (["flood"] if args.mode == "flood" and "flood" not in args.bot_types else [])
+            shard_bots = len(bot_population(bot_types, args.bots_per_type, bot_weights)) >= workers
+            bot_requests_split = [args.bot_requests] * workers if shard_bots else split(args.bot_requests, workers)
+            targets = [("A", target_url), ("B", compare_url)] if compare_url else [("", target_url)]
+            worker_kwargs = [dict(mode=args.mode, target_url=url, bot_types=list(args.bot_types),
+                                  bot_requests=bot_requests, humans=humans, human_requests=args.human_requests,
+                                  report=False, verbosity=args.verbosity, log_path=args.log_file,
+                                  report_interval=args.report_interval, record_path=args.record,
+                                  seed=f"{seed}:{n}", label=label, workers=workers, bots_per_type=args.bots_per_type,
+                                  bot_weights=bot_weights, bot_concurrency=args.bot_concurrency,
+                                  bot_shard=(n, workers) if shard_bots else None, duration=args.duration,
+                                  grace=args.grace, open_loop=bool(compare_url))
+                             for label, url in targets
+                             for n, (bot_requests, humans) in enumerate(zip(bot_requests_split,
+                                                                            split(args.humans, workers)))]
+            results = run_workers(run_simulation, worker_kwargs)
+            merged = {}
+            for n, worker_results in enumerate(results):
+                label = targets[n // workers][0]
+                for title, stats in worker_results.items():
+                    merged.setdefault(title, {}).setdefault(label, []).append(stats)
+            for title, by_target in merged.items():
+                if compare_url:
+                    print_comparison([(label, url, RunStats.merged(by_target.get(label, []))) for label, url in targets],
+                                     f"{title} A/B Comparison")
+                else:
+                    print_report(title, RunStats.merged(by_target[""]))
+        else:
+            run_simulation(args.mode, target_url, args.bot_types, args.bot_requests, args.humans, args.human_requests,
+                           verbosity=args.verbosity, log_path=args.log_file, report_interval=args.report_interval,
+                           record_path=args.record, seed=args.seed, bots_per_type=args.bots_per_type,
+                           bot_weights=bot_weights, bot_concurrency=args.bot_concurrency, duration=args.duration,
+                           grace=args.grace)
     except KeyboardInterrupt:
         print("\nSimulation aborted by user")
\ No newline at end of file
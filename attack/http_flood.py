@@ -1,85 +1,455 @@
-import requests
 import threading
 import time
 import argparse
 from concurrent.futures import ThreadPoolExecutor
-import json
+import asyncio
+import queue
+import ssl
+from urllib.parse import urlencode, urlsplit
+import asynchttp
+from scheduler import BurstScheduler
+from http_pool import PooledSession
+from stats import PerThread, RunStats, print_comparison
+from reporter import NORMAL, Reporter, add_arguments as add_report_arguments
+from recorder import Recorder
+from workers import GRACE_SECONDS, RunControl, SubmissionWindow, run_name, run_workers, split
 
-def http_flood(url, num_requests, concurrent_requests, burst_size, burst_delay, headers=None):
+# Requests handed to the thread pool ahead of the ones in flight, per concurrent sender
+SUBMIT_AHEAD = 2
+
+class ThreadResults:
+    """
+    One pool thread's RunStats, with a lock that is only contended when the
+    run's counters are merged: a request abandoned still running after the
+    grace period finds its thread closed when it ends and is not recorded
     """
-    Executes an HTTP flooding attack simulation against the specified URL
+    
+    def __init__(self):
+        self.stats = RunStats()
+        self.lock = threading.Lock()
+        self.closed = False
+
+class FloodRun:
+    """
+    One process's share of a flood: its settings, and what the sending
+    threads or tasks count into (RunStats, the burst schedule, the progress
+    reporter and an optional per-request recorder)
     
     Args:
-        url: Target endpoint URL
-        num_requests: Total number of requests to send
-        concurrent_requests: Number of concurrent requests
-        burst_size: Number of requests per burst
-        burst_delay: Delay in seconds between bursts
-        headers: Optional HTTP headers to include
+        url, num_requests, concurrent_requests, burst_size, burst_delay, headers, review_label, username,
+        warm_up, keep_alive, first_index, verbosity, log_path, report_interval, name, record_path,
+        duration, grace: As for run_flood
+        engine: Stored in the record file's header
+    """
+    
+    def __init__(self, url, num_requests, concurrent_requests, burst_size, burst_delay, headers=None,
+                 review_label="flood attack", username="attacker", warm_up=False, keep_alive=True, engine="thread",
+                 first_index=0, verbosity=NORMAL, log_path=None, report_interval=1.0, name="", record_path=None,
+                 duration=None, grace=GRACE_SECONDS):
+        self.url = url
+        self.concurrent_requests = concurrent_requests
+        self.headers = dict(headers or {})
+        self.review_label = review_label
+        self.username = username
+        self.warm_up = warm_up
+        self.keep_alive = keep_alive
+        self.first_index = first_index
+        self.duration = duration
+        self.grace = grace
+        self.stats = RunStats()
+        self.schedule = BurstScheduler(num_requests, burst_size, burst_delay)
+        # Request threads hand results to the reporter thread instead of printing
+        self.reporter = Reporter(name, num_requests, verbosity, log_path, report_interval)
+        self.recorder = None
+        if record_path:
+            self.recorder = Recorder(record_path, dict(tool="http_flood", url=url, requests=num_requests,
+                                                       concurrent=concurrent_requests, burst_size=burst_size,
+                                                       burst_delay=burst_delay, engine=engine, first_index=first_index))
+            self.source = self.recorder.source_id(name or "flood")
+        # Set by begin(), once connections are warmed up
+        self.start_time = None
+        self.control = None
+    
+    def begin(self, warm_connections):
+        """Start the clock, the run's RunControl and the progress reporter"""
+        if self.warm_up:
+            print(f"Warm-up: opened {warm_connections} connections\n")
+        self.start_time = time.time()
+        self.control = RunControl(self.duration, self.grace)
+        self.reporter.start()
+    
+    def review_data(self, i):
+        # Sent as form data
+        i += self.first_index
+        return {
+            "product_id": f"prod{i:04d}",  # Format as prod0001, prod0002, etc.
+            "review": f"{self.review_label} {i}",
+            "username": self.username
+        }
+    
+    def record_response(self, run_stats, i, status, text):
+        i += self.first_index
+        outcome = run_stats.record_status(status)
+        if outcome == "2xx":
+            self.reporter.record(outcome, f"Request {i}: Success")
+        elif outcome == "blocked":
+            self.reporter.record(outcome, f"Request {i}: Blocked - {status}")
+        else:
+            # Error pages can be large; the start says what went wrong
+            self.reporter.record(outcome, f"Request {i}: Failed - {status} - {text[:200]}")
+        return outcome
+    
+    def record_latency(self, run_stats, i, seconds):
+        run_stats.latency.record(seconds)
+        # Coordinated-omission corrected: measured from when the schedule meant to send it
+        run_stats.corrected_latency.record(self.schedule.since_intended(i))
+        return seconds
+    
+    def record_error(self, run_stats, i, e):
+        i += self.first_index
+        outcome = run_stats.record_exception(e)
+        self.reporter.record(outcome, f"Request {i}: Error - {str(e) or e.__class__.__name__}")
+        return outcome
+    
+    def record_request(self, sent_at, latency, status, outcome, size=0):
+        if self.recorder is not None:
+            self.recorder.record(sent_at, latency, status, outcome, size, self.source)
+    
+    def finish(self, connections, handshake_seconds, warm_connections):
+        """Stop the reporter and recorder and fill in the run's totals"""
+        stats = self.stats
+        stats.elapsed = time.time() - self.start_time
+        self.reporter.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        stats.requests = sum(stats.outcomes.values())
+        self.control.update(stats)
+        stats.connections = connections
+        stats.warm_connections = warm_connections
+        stats.handshake_seconds = handshake_seconds
+        return stats
+
+def run_threads(run):
     """
-    start_time = time.time()
-    success_count = 0
-    error_count = 0
+    Send a FloodRun from a thread pool through a shared requests session
+    
+    Returns:
+        (connections opened, seconds spent in handshakes, connections opened by the warm-up)
+    """
+    # One keep-alive connection per concurrent sender, shared by all requests
+    session = PooledSession(run.concurrent_requests)
+    headers = dict(run.headers)
+    if not run.keep_alive:
+        headers["Connection"] = "close"
+    warm_connections = session.warm_up(run.url) if run.warm_up else 0
+    connections_before, handshake_before = session.connection_stats.snapshot()
+    # Each pool thread counts results into its own RunStats; they are merged once the pool is done
+    thread_results = PerThread(ThreadResults)
+    run.begin(warm_connections)
+    schedule = run.schedule
+    control = run.control
     
     def send_request(i):
-        nonlocal success_count, error_count
+        results = thread_results.get()
+        with results.lock:
+            if results.closed:
+                return
+            schedule.mark_sent(i, results.stats)
+        sent_at = time.time()
+        request_start = time.perf_counter()
         try:
-            # Send POST request with form data
-            data = {
-                "product_id": f"prod{i:04d}",  # Format as prod0001, prod0002, etc.
-                "review": f"flood attack {i}",
-                "username": "attacker"
-            }
-            
-            response = requests.post(
-                url, 
-                data=data,  # Send as form data instead of JSON
+            response = session.post(
+                run.url, 
+                data=run.review_data(i),
                 headers=headers, 
                 timeout=5
             )
-            
-            if response.status_code == 200:
-                success_count += 1
-                print(f"Request {i}: Success")
-            else:
-                error_count += 1
-                print(f"Request {i}: Failed - {response.status_code} - {response.text}")
-            return f"Request {i}: Status {response.status_code}"
+            text = response.text
+        except Exception as e:
+            with results.lock:
+                if not results.closed:
+                    outcome = run.record_error(results.stats, i, e)
+                    run.record_request(sent_at, time.perf_counter() - request_start, 0, outcome)
+            return
+        seconds = time.perf_counter() - request_start
+        with results.lock:
+            if results.closed:
+                return
+            latency = run.record_latency(results.stats, i, seconds)
+            outcome = run.record_response(results.stats, i, response.status_code, text)
+            run.record_request(sent_at, latency, response.status_code, outcome, len(response.content))
+    
+    # The scheduler thread queues each burst at its time; this thread hands
+    # its indices to the pool through a bounded window, so a burst (or run)
+    # of millions of requests never queues millions of futures, and while
+    # the window is full, later bursts still queue on schedule
+    executor = ThreadPoolExecutor(max_workers=run.concurrent_requests)
+    window = SubmissionWindow(executor, run.concurrent_requests * SUBMIT_AHEAD)
+    released = queue.SimpleQueue()
+    releaser = threading.Thread(target=schedule.release, args=(released.put, control), daemon=True)
+    releaser.start()
+    try:
+        for burst in iter(released.get, None):
+            for i in burst:
+                if control.stopped():
+                    break
+                window.submit(send_request, i)
+    except KeyboardInterrupt:
+        control.stop("interrupted")
+    control.drain(window)
+    releaser.join()
+    # Requests still running after the grace period are abandoned, counted
+    # as unfinished by control.drain(); closing each thread's results before
+    # merging them keeps whatever those requests return out of the counters
+    executor.shutdown(wait=False)
+    
+    for results in thread_results.values():
+        with results.lock:
+            results.closed = True
+            run.stats.merge(results.stats)
+    connections, handshake_seconds = session.connection_stats.snapshot()
+    session.close()
+    return connections - connections_before, handshake_seconds - handshake_before, warm_connections
+
+def _take_back_interrupt(control):
+    # Ctrl+C cancels the main task; take the cancellation back, so the run
+    # drains and returns its counters (before Python 3.11, catching
+    # CancelledError is enough and uncancel() does not exist)
+    task = asyncio.current_task()
+    if hasattr(task, "uncancel"):
+        task.uncancel()
+    control.stop("interrupted")
+
+async def run_asyncio(run):
+    """
+    Send a FloodRun from one event loop over an asynchttp connection pool
+    
+    Returns:
+        As for run_threads
+    """
+    parts = urlsplit(run.url)
+    secure = parts.scheme == "https"
+    pool = asynchttp.ClientPool(parts.hostname, parts.port or (443 if secure else 80), run.concurrent_requests,
+                                ssl=ssl.create_default_context() if secure else None, server_hostname=parts.hostname)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    warm_connections = await pool.warm_up() if run.warm_up else 0
+    connections_before, handshake_before = pool.connections_opened, pool.handshake_seconds
+    slots = asyncio.Semaphore(run.concurrent_requests)
+    run.begin(warm_connections)
+    stats = run.stats
+    control = run.control
+    
+    async def send_request(i):
+        run.schedule.mark_sent(i, stats)
+        sent_at = time.time()
+        request_start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                pool.request("POST", target, run.headers, urlencode(run.review_data(i)).encode(), run.keep_alive),
+                timeout=5
+            )
+            latency = run.record_latency(stats, i, time.perf_counter() - request_start)
+            outcome = run.record_response(stats, i, response.status, response.body.decode("utf-8", errors="replace"))
+            run.record_request(sent_at, latency, response.status, outcome, len(response.body))
         except Exception as e:
-            error_count += 1
-            print(f"Request {i}: Error - {str(e)}")
-            return f"Request {i}: Error - {str(e)}"
-    
-    # Using ThreadPoolExecutor to manage concurrent requests
-    with ThreadPoolExecutor(max_workers=concurrent_requests) as executor:
-        futures = [executor.submit(send_request, i) for i in range(num_requests)]
-        
-        # Print progress
-        completed = 0
-        for future in futures:
-            result = future.result()
-            completed += 1
-            if completed % 50 == 0 or completed == num_requests:
-                print(f"Progress: {completed}/{num_requests} requests completed")
-    
-    # Print summary statistics
-    duration = time.time() - start_time
+            outcome = run.record_error(stats, i, e)
+            run.record_request(sent_at, time.perf_counter() - request_start, 0, outcome)
+    
+    running = set()
+    
+    def finish(task):
+        running.discard(task)
+        slots.release()
+    
+    # Same schedule as the thread engine, released by a task of its own. A
+    # request task is only created once a slot is free, so at most
+    # concurrent_requests of them exist at a time
+    released = asyncio.Queue()
+    releaser = asyncio.create_task(run.schedule.async_release(released.put_nowait, control))
+    try:
+        burst = await released.get()
+        while burst is not None:
+            for i in burst:
+                if control.stopped():
+                    break
+                await slots.acquire()
+                task = asyncio.create_task(send_request(i))
+                running.add(task)
+                task.add_done_callback(finish)
+            burst = await released.get()
+    except asyncio.CancelledError:
+        _take_back_interrupt(control)
+    releaser.cancel()
+    if running and not control.stopped():
+        try:
+            await asyncio.wait(set(running), timeout=control.remaining())
+        except asyncio.CancelledError:
+            _take_back_interrupt(control)
+        control.stopped()
+    if running:
+        await asyncio.wait(set(running), timeout=control.grace)
+        control.unfinished += len(running)
+        for task in list(running):
+            task.cancel()
+    await pool.close()
+    return (pool.connections_opened - connections_before, pool.handshake_seconds - handshake_before,
+            warm_connections)
+
+def run_flood(url, num_requests, concurrent_requests, burst_size, burst_delay, headers=None,
+              review_label="flood attack", username="attacker", warm_up=False, keep_alive=True, engine="thread",
+              first_index=0, verbosity=NORMAL, log_path=None, report_interval=1.0, name="", record_path=None,
+              duration=None, grace=GRACE_SECONDS):
+    """
+    Sends the flood from this process and returns its counters, without printing a summary.
+    At `duration` seconds or on Ctrl+C, no more requests are sent; those in
+    flight get `grace` seconds to finish, and the counters cover the partial run.
+    
+    Args:
+        url: Target endpoint URL
+        num_requests: Total number of requests to send
+        concurrent_requests: Number of concurrent requests
+        burst_size: Number of requests per burst
+        burst_delay: Delay in seconds between bursts
+        headers: Optional HTTP headers to include
+        review_label: Review text prefix (the request number is appended)
+        username: Username sent with each review
+        warm_up: Open the connection pool before the timed run starts
+        keep_alive: Reuse pooled connections (False sends Connection: close, a handshake per request)
+        engine: "thread" (thread pool + requests) or "asyncio" (one event loop, for thousands of requests in flight)
+        first_index: Number of the first request (workers number their share of requests from here)
+        verbosity: reporter.QUIET, NORMAL (a progress line every report_interval seconds) or VERBOSE (every request)
+        log_path: Write every request's result to this file
+        report_interval: Seconds between progress lines
+        name: Prefix of the progress line
+        record_path: Write a fixed-width record of every request to this file (see recorder.py)
+        duration: Stop after this many seconds, or None to send every request
+        grace: Seconds requests in flight get to finish once the run stops
+    
+    Returns:
+        (RunStats, BurstScheduler) for the run
+    """
+    run = FloodRun(url, num_requests, concurrent_requests, burst_size, burst_delay, headers, review_label, username,
+                   warm_up, keep_alive, engine, first_index, verbosity, log_path, report_interval, name, record_path,
+                   duration, grace)
+    if engine == "asyncio":
+        totals = asynchttp.run(run_asyncio(run))
+    else:
+        totals = run_threads(run)
+    return run.finish(*totals), run.schedule
+
+def _flood_worker(worker, **kwargs):
+    return run_flood(**kwargs)
+
+def print_summary(url, concurrent_requests, stats, schedule, warm_up=False):
+    """Print the results of one run, or of several workers' runs merged"""
+    duration = stats.elapsed
+    num_requests = stats.requests
     print("\n----- HTTP Flood Attack Simulation Results -----")
     print(f"Target URL: {url}")
     print(f"Total Requests: {num_requests}")
     print(f"Concurrent Connections: {concurrent_requests}")
+    if stats.workers > 1:
+        print(f"Worker processes: {stats.workers}")
     print(f"Total Duration: {duration:.2f} seconds")
+    stats.print_stopped()
+    if not num_requests:
+        return
     print(f"Requests per second: {num_requests/duration:.2f}")
-    print(f"Success rate: {success_count/num_requests*100:.2f}%")
-    print(f"Error rate: {error_count/num_requests*100:.2f}%")
+    print(f"Success rate: {stats.success/num_requests*100:.2f}%")
+    print(f"Blocked rate: {stats.outcomes['blocked']/num_requests*100:.2f}%")
+    print(f"Error rate: {stats.errors/num_requests*100:.2f}%")
+    stats.print_breakdown()
+    
+    # Handshakes happen inside request time, so report them separately
+    connections = stats.connections
+    print(f"Connections opened: {connections}" + (f" (plus {stats.warm_connections} during warm-up)" if warm_up else ""))
+    if connections:
+        print(f"Handshake time: {stats.handshake_seconds:.2f}s total, "
+              f"{stats.handshake_seconds/connections*1000:.1f} ms per connection")
+    latency = stats.latency
+    if latency.count:
+        print(f"Request time: {latency.mean()*1000:.1f} ms mean, "
+              f"{(latency.total - stats.handshake_seconds)/latency.count*1000:.1f} ms excluding handshakes")
+        print(f"Latency from send: {latency.summary()}")
+        print(f"Latency from intended send time: {stats.corrected_latency.summary()}")
+    schedule.print_summary(stats)
 
-if __name__ == "__main__":
+def http_flood(url, num_requests, concurrent_requests, burst_size, burst_delay, headers=None,
+               review_label="flood attack", username="attacker", warm_up=False, keep_alive=True, engine="thread",
+               workers=1, verbosity=NORMAL, log_path=None, report_interval=1.0, record_path=None, compare_url=None,
+               duration=None, grace=GRACE_SECONDS):
+    """
+    Executes an HTTP flooding attack simulation against the specified URL
+    
+    Args:
+        url, num_requests, concurrent_requests, burst_size, burst_delay, headers, review_label,
+        username, warm_up, keep_alive, engine, verbosity, report_interval, duration, grace: As for run_flood
+        workers: Split the requests, concurrency and burst size across this many processes
+        log_path: Write every request's result to this file (with workers, one file per worker: log_path.0, log_path.1, ...)
+        record_path: Write a record of every request to this file (with workers, one file per worker, as for log_path)
+        compare_url: A/B run: send the same requests on the same schedule to this URL as well, each
+            target from its own processes started at the same moment, and print one comparison.
+            Files get an A or B suffix (log_path.A, log_path.B.0, ...)
+    """
+    # Every worker sends whole bursts at the same times, so the aggregate burst size is kept
+    workers = max(1, min(workers, num_requests, burst_size))
+    options = dict(burst_delay=burst_delay, headers=headers, review_label=review_label, username=username,
+                   warm_up=warm_up, keep_alive=keep_alive, engine=engine, verbosity=verbosity,
+                   report_interval=report_interval, duration=duration, grace=grace)
+    if workers == 1 and not compare_url:
+        stats, schedule = run_flood(url=url, num_requests=num_requests, concurrent_requests=concurrent_requests,
+                                    burst_size=burst_size, log_path=log_path, record_path=record_path, **options)
+        print_summary(url, concurrent_requests, stats, schedule, warm_up)
+        return
+    
+    targets = [("A", url), ("B", compare_url)] if compare_url else [("", url)]
+    shares = split(num_requests, workers)
+    worker_kwargs = []
+    # A and B workers get the same shares, so both targets see the same request numbers at the same times
+    for label, target in targets:
+        for n, (share, bursts, concurrency) in enumerate(zip(shares, split(burst_size, workers),
+                                                             split(concurrent_requests, workers))):
+            name, suffix = run_name(label, n, workers)
+            worker_kwargs.append(dict(options, url=target, num_requests=share, first_index=sum(shares[:n]),
+                                      burst_size=bursts, concurrent_requests=max(1, concurrency), name=name,
+                                      log_path=f"{log_path}.{suffix}" if log_path else None,
+                                      record_path=f"{record_path}.{suffix}" if record_path else None))
+    results = run_workers(_flood_worker, worker_kwargs)
+    columns = []
+    for n, (label, target) in enumerate(targets):
+        target_results = results[n * workers:(n + 1) * workers]
+        stats = RunStats.merged(run_stats for run_stats, _ in target_results)
+        schedule = BurstScheduler.merged(run_schedule for _, run_schedule in target_results)
+        columns.append((label, target, stats))
+        if not compare_url:
+            print_summary(target, concurrent_requests, stats, schedule, warm_up)
+    if compare_url:
+        print_comparison(columns)
+
+def main(review_label="flood attack", username="attacker"):
+    """Command line entry point, shared with http_legitimate.py"""
     parser = argparse.ArgumentParser(description="HTTP Flooding Attack Simulation Tool with Bursts")
     parser.add_argument("--url", required=True, help="Target URL")
+    parser.add_argument("--compare-url",
+                        help="A/B run: send the same requests on the same schedule to this URL too (e.g. the "
+                             "protected API) and print one comparison")
     parser.add_argument("--requests", type=int, default=1000, help="Total number of requests to send")
     parser.add_argument("--concurrent", type=int, default=25, help="Number of concurrent requests within a burst")
     parser.add_argument("--burst-size", type=int, default=100, dest='requests_per_burst', help="Number of requests per burst")
-    parser.add_argument("--burst-delay", type=int, default=1, dest='burst_delay', help="Delay in seconds between bursts")
+    parser.add_argument("--burst-delay", type=float, default=1, dest='burst_delay', help="Delay in seconds between bursts")
+    parser.add_argument("--warm-up", action="store_true", help="Open one connection per concurrent sender before the timed run")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Open a new connection for every request")
+    parser.add_argument("--engine", choices=["thread", "asyncio"], default="thread",
+                        help="thread: thread pool (default); asyncio: one event loop, for thousands of concurrent requests")
+    parser.add_argument("--duration", type=float,
+                        help="Stop sending after this many seconds and report the partial run")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help="Seconds requests in flight get to finish once the run stops (at --duration or Ctrl+C)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the requests, concurrency and burst size (one per CPU core scales furthest)")
+    add_report_arguments(parser)
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record every request (time, latency, status, bytes) to FILE for recorder.py to analyse")
     parser.add_argument("--user-agent", default="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36", help="User-Agent string")
     
     args = parser.parse_args()
@@ -90,12 +460,20 @@ if __name__ == "__main__":
         "Accept": "application/json"
     }
     
-    print(f"Starting HTTP flood simulation against {args.url}")
+    print(f"Starting HTTP flood simulation against {args.url}" + (f" and {args.compare_url}" if args.compare_url else ""))
     print(f"Total requests: {args.requests}, Concurrent per burst: {args.concurrent}")
     print(f"Requests per burst: {args.requests_per_burst}, Delay between bursts: {args.burst_delay}s")
-    print("Press Ctrl+C to abort\n")
+    if args.duration:
+        print(f"Stopping after {args.duration:g}s")
+    print("Press Ctrl+C to stop early\n")
     
     try:
-        http_flood(args.url, args.requests, args.concurrent, args.requests_per_burst, args.burst_delay, headers)
+        http_flood(args.url, args.requests, args.concurrent, args.requests_per_burst, args.burst_delay, headers,
+                   review_label, username, args.warm_up, not args.no_keep_alive, args.engine, args.workers,
+                   args.verbosity, args.log_file, args.report_interval, args.record, args.compare_url,
+                   args.duration, args.grace)
     except KeyboardInterrupt:
-        print("\nSimulation aborted by user")
\ No newline at end of file
+        print("\nSimulation aborted by user")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionStats:
+    """Connections opened and time spent in TCP (and TLS) handshakes, across threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.handshake_seconds = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.handshake_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return self.connections, self.handshake_seconds
+
+
+def _timed_pool_classes(stats):
+    """urllib3 pool classes whose connections report their handshake time to stats"""
+
+    class TimedHTTPConnection(HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            stats.record(time.perf_counter() - start)
+
+    class TimedHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            stats.record(time.perf_counter() - start)
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    return {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session whose keep-alive pool holds one connection per
+    concurrent sender, so connections (and their TLS handshakes) are reused
+    across requests instead of opened per request
+
+    Args:
+        pool_size: Connections kept per host; callers beyond this wait for a free one
+    """
+
+    def __init__(self, pool_size):
+        super().__init__()
+        self.pool_size = pool_size
+        self.connection_stats = ConnectionStats()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        adapter.poolmanager.pool_classes_by_scheme = _timed_pool_classes(self.connection_stats)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def warm_up(self, url, connections=None, timeout=10):
+        """
+        Open the pool's connections before the timed part of a run by
+        sending concurrent OPTIONS requests (a CORS preflight, which the
+        reviews API answers without writing anything)
+
+        Returns:
+            Number of connections opened
+        """
+        connections = connections or self.pool_size
+        before, _ = self.connection_stats.snapshot()
+        barrier = threading.Barrier(connections, timeout=timeout)
+
+        def open_connection(_):
+            try:
+                response = self.options(url, timeout=timeout, stream=True)
+            except requests.RequestException as e:
+                print(f"Warm-up request failed: {e}")
+                barrier.abort()
+                return
+            # The connection stays checked out until the body is read; wait
+            # until every sender holds one so none is reused and the pool fills
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            finally:
+                # Reading the body to the end returns the connection to the pool
+                response.content
+                response.close()
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(open_connection, range(connections)))
+        after, _ = self.connection_stats.snapshot()
+        return after - before
@@ -0,0 +1,87 @@
+import argparse
+import random
+import statistics
+import time
+
+from local_lambda import load_handler, load_template, make_event
+
+
+def build_events(num_events, post_ratio, num_products):
+    """Generate a mix of GET and POST review events"""
+    events = []
+    for i in range(num_events):
+        product_id = f"prod{random.randrange(num_products):04d}"
+        if random.random() < post_ratio:
+            events.append(make_event("POST", body={
+                "product_id": product_id,
+                "review": f"harness review {i}",
+                "username": "harness"
+            }))
+        else:
+            events.append(make_event("GET", query={"product_id": product_id}))
+    return events
+
+
+def replay(function_name, events, invocations_per_container, environment=None):
+    """
+    Replay events through the handler, starting a new container every
+    invocations_per_container events
+
+    Returns:
+        (cold, warm) lists of (client_latency_ms, init_ms, handler_ms)
+    """
+    template = load_template()
+    cold = []
+    warm = []
+    handler = None
+    for i, event in enumerate(events):
+        start = time.perf_counter()
+        if i % invocations_per_container == 0:
+            handler = load_handler(function_name, template=template, environment=environment,
+                                   log=lambda *args, **kwargs: None)
+        response = handler.lambda_handler(event, None)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        headers = response["headers"]
+        sample = (latency_ms, float(headers["X-Init-Duration-Ms"]), float(headers["X-Handler-Duration-Ms"]))
+        if headers["X-Container-State"] == "cold":
+            cold.append(sample)
+        else:
+            warm.append(sample)
+    return cold, warm
+
+
+def describe(name, samples):
+    """Print latency distribution for a list of samples"""
+    if not samples:
+        print(f"{name}: no invocations")
+        return
+    latencies = sorted(sample[0] for sample in samples)
+    handler_times = [sample[2] for sample in samples]
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    print(f"{name}: {len(samples)} invocations")
+    print(f"  Latency (ms): p50 {quantiles[49]:.2f}, p90 {quantiles[89]:.2f}, p99 {quantiles[98]:.2f}, "
+          f"max {latencies[-1]:.2f}")
+    print(f"  Init (ms): mean {statistics.mean(sample[1] for sample in samples):.2f}")
+    print(f"  Handler (ms): mean {statistics.mean(handler_times):.2f}, max {max(handler_times):.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay events through the reviews Lambda handler locally")
+    parser.add_argument("--function", default="UnprotectedLambdaFunction",
+                        choices=["UnprotectedLambdaFunction", "ProtectedLambdaFunction"], help="Function to load from wafcf.yaml")
+    parser.add_argument("--events", type=int, default=1000, help="Number of events to replay")
+    parser.add_argument("--per-container", type=int, default=100, help="Invocations served by each container before a new cold start")
+    parser.add_argument("--post-ratio", type=float, default=0.5, help="Fraction of events that are POSTs")
+    parser.add_argument("--products", type=int, default=100, help="Number of distinct product IDs")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    events = build_events(args.events, args.post_ratio, args.products)
+    cold, warm = replay(args.function, events, args.per_container)
+
+    print(f"\n----- Lambda Handler Replay ({args.function}) -----")
+    describe("Cold starts", cold)
+    describe("Warm invocations", warm)
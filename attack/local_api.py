@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import json
+from urllib.parse import parse_qsl
+
+import asynchttp
+from local_dynamodb import LocalTable
+from local_lambda import load_handler, make_event
+
+# API Gateway answers unknown routes and methods with this 403
+MISSING_TOKEN_BODY = json.dumps({"message": "Missing Authentication Token"}).encode()
+
+
+class ReviewsService:
+    """
+    Local stand-in for the API Gateway /reviews resource with Lambda proxy
+    integration: turns HTTP requests into proxy events for the handler
+    code extracted from wafcf.yaml, backed by an in-memory review table
+    """
+
+    METHODS = ("GET", "POST", "OPTIONS")
+
+    def __init__(self, function_name="UnprotectedLambdaFunction", stage="demo", table=None, environment=None,
+                 handler_logs=False):
+        self.stage = stage
+        self.table = table if table is not None else LocalTable()
+        self.handler = load_handler(function_name, table=self.table, environment=environment,
+                                    log=print if handler_logs else (lambda *args, **kwargs: None))
+        self.routes = {f"/{stage}/reviews", "/reviews"}
+        self.invocations = 0
+
+    def to_event(self, request):
+        """Build the proxy integration event for a request"""
+        pairs = parse_qsl(request.query, keep_blank_values=True)
+        body = request.body.decode("utf-8", errors="replace") if request.body else None
+        event = make_event(request.method, query=dict(pairs), body=body, headers=request.headers,
+                           source_ip=request.client_ip, stage=self.stage)
+        if pairs:
+            multi = {}
+            for name, value in pairs:
+                multi.setdefault(name, []).append(value)
+            event["multiValueQueryStringParameters"] = multi
+        return event
+
+    def invoke(self, request):
+        """Handle a request synchronously, returning (status, headers, body bytes)"""
+        if request.path not in self.routes or request.method not in self.METHODS:
+            return 403, {"Content-Type": "application/json"}, MISSING_TOKEN_BODY
+
+        self.invocations += 1
+        response = self.handler.lambda_handler(self.to_event(request), None)
+        body = response.get("body") or ""
+        if response.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        else:
+            body = body.encode("utf-8")
+        return response.get("statusCode", 200), response.get("headers") or {}, body
+
+    async def __call__(self, request):
+        return self.invoke(request)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local API Gateway + reviews Lambda stand-in for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--function", default="UnprotectedLambdaFunction",
+                        choices=["UnprotectedLambdaFunction", "ProtectedLambdaFunction"], help="Function to load from wafcf.yaml")
+    parser.add_argument("--stage", default="demo", help="API Gateway stage name used in the path")
+    parser.add_argument("--handler-logs", action="store_true", help="Print the handler's per-invocation log lines")
+
+    args = parser.parse_args()
+
+    service = ReviewsService(args.function, args.stage, handler_logs=args.handler_logs)
+    print(f"Serving {args.function} at http://{args.host}:{args.port}/{args.stage}/reviews")
+    if not asynchttp.HAS_UVLOOP:
+        print("Note: uvloop not installed, using the default asyncio event loop (pip install uvloop)")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        asynchttp.run(asynchttp.serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\nStopped after {service.invocations} invocations")
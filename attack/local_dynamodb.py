@@ -0,0 +1,180 @@
+import bisect
+import math
+
+# DynamoDB stops reading a Scan or Query page once 1 MB of items has been read
+PAGE_SIZE_LIMIT = 1024 * 1024
+# Read capacity is charged per 4 KB of items read, rounded up
+READ_UNIT_SIZE = 4096
+
+
+def item_size(item):
+    """Approximate DynamoDB item size: attribute name plus value length in bytes"""
+    return sum(len(name.encode("utf-8")) + len(str(value).encode("utf-8")) for name, value in item.items())
+
+
+def _condition_terms(condition):
+    """
+    Flatten a boto3 condition (Key/Attr ... .eq(), combined with &) into
+    a list of (attribute_name, value) equality terms
+    """
+    expression = condition.get_expression()
+    operator = expression["operator"]
+    if operator == "AND":
+        terms = []
+        for value in expression["values"]:
+            terms.extend(_condition_terms(value))
+        return terms
+    if operator == "=":
+        attribute, value = expression["values"]
+        return [(attribute.name, value)]
+    raise ValueError(f"Unsupported condition operator for local table: {operator}")
+
+
+class LocalBatchWriter:
+    """Context manager mirroring boto3's batch_writer: buffers puts and flushes them 25 at a time"""
+
+    BATCH_SIZE = 25
+
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+        self.batches = 0
+
+    def put_item(self, Item, **kwargs):
+        self.pending.append(Item)
+        if len(self.pending) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            for item in self.pending:
+                self.table.put_item(Item=item)
+            self.pending = []
+            self.batches += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+class LocalTable:
+    """
+    In-memory stand-in for a boto3 DynamoDB Table resource with the
+    ProductReviewsTable key schema and its product_id index.
+
+    Scan and Query follow DynamoDB's paging rules (1 MB per page, Limit,
+    ExclusiveStartKey/LastEvaluatedKey) and report consumed read units, so
+    access patterns can be compared without an AWS account.
+    """
+
+    def __init__(self, name="waf-demo-product-reviews-local", hash_key="review_id", range_key="product_id",
+                 indexes=None):
+        self.name = name
+        self.table_name = name
+        self.key_names = (hash_key, range_key)
+        # index name -> (hash attribute, range attribute)
+        self.indexes = indexes if indexes is not None else {"ProductIdIndex": ("product_id", "review_id")}
+        self._items = []
+        self._sizes = []
+        self._positions = {}
+        # index name -> hash value -> sorted list of (range value, position)
+        self._index_entries = {name: {} for name in self.indexes}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _key_of(self, item, key_names):
+        return tuple(item[name] for name in key_names)
+
+    def put_item(self, Item, **kwargs):
+        item = dict(Item)
+        key = self._key_of(item, self.key_names)
+        position = self._positions.get(key)
+        if position is None:
+            position = len(self._items)
+            self._items.append(item)
+            self._sizes.append(item_size(item))
+            self._positions[key] = position
+            for index_name, (index_hash, index_range) in self.indexes.items():
+                if index_hash in item:
+                    entries = self._index_entries[index_name].setdefault(item[index_hash], [])
+                    bisect.insort(entries, (item.get(index_range, ""), position))
+        else:
+            self._items[position] = item
+            self._sizes[position] = item_size(item)
+        return {}
+
+    def batch_writer(self, **kwargs):
+        return LocalBatchWriter(self)
+
+    def get_item(self, Key, **kwargs):
+        position = self._positions.get(self._key_of(Key, self.key_names))
+        if position is None:
+            return {}
+        return {"Item": dict(self._items[position])}
+
+    def _project(self, item, kwargs):
+        projection = kwargs.get("ProjectionExpression")
+        if not projection:
+            return dict(item)
+        names = kwargs.get("ExpressionAttributeNames", {})
+        fields = [names.get(field.strip(), field.strip()) for field in projection.split(",")]
+        if len(set(fields)) != len(fields):
+            # DynamoDB fails the request with a ValidationException
+            raise ValueError("Invalid ProjectionExpression: Two document paths overlap with each other")
+        return {field: item[field] for field in fields if field in item}
+
+    def _page(self, positions, key_names, kwargs):
+        """Read positions in order, applying the Limit and 1 MB page rules"""
+        consistent = kwargs.get("ConsistentRead", False)
+        limit = kwargs.get("Limit")
+        filter_terms = _condition_terms(kwargs["FilterExpression"]) if kwargs.get("FilterExpression") else []
+
+        items = []
+        scanned = 0
+        bytes_read = 0
+        last_position = None
+        exhausted = True
+        for position in positions:
+            if (limit is not None and scanned >= limit) or bytes_read >= PAGE_SIZE_LIMIT:
+                exhausted = False
+                break
+            item = self._items[position]
+            scanned += 1
+            bytes_read += self._sizes[position]
+            last_position = position
+            if all(item.get(name) == value for name, value in filter_terms):
+                items.append(self._project(item, kwargs))
+
+        units = math.ceil(bytes_read / READ_UNIT_SIZE) * (1.0 if consistent else 0.5)
+        response = {"Items": items, "Count": len(items), "ScannedCount": scanned}
+        if kwargs.get("ReturnConsumedCapacity", "NONE") != "NONE":
+            response["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": units}
+        if not exhausted and last_position is not None:
+            last_item = self._items[last_position]
+            response["LastEvaluatedKey"] = {name: last_item[name] for name in key_names if name in last_item}
+        return response
+
+    def scan(self, **kwargs):
+        start = 0
+        if "ExclusiveStartKey" in kwargs:
+            start = self._positions[self._key_of(kwargs["ExclusiveStartKey"], self.key_names)] + 1
+        return self._page(range(start, len(self._items)), self.key_names, kwargs)
+
+    def query(self, **kwargs):
+        terms = dict(_condition_terms(kwargs["KeyConditionExpression"]))
+        index_name = kwargs.get("IndexName")
+        if index_name is None:
+            raise ValueError("LocalTable only supports queries against a secondary index")
+        index_hash, index_range = self.indexes[index_name]
+        entries = self._index_entries[index_name].get(terms[index_hash], [])
+
+        start = 0
+        if "ExclusiveStartKey" in kwargs:
+            start_key = kwargs["ExclusiveStartKey"]
+            start = bisect.bisect_right(entries, (start_key[index_range], float("inf")))
+        positions = (entries[i][1] for i in range(start, len(entries)))
+        key_names = tuple(dict.fromkeys(self.key_names + (index_hash, index_range)))
+        return self._page(positions, key_names, kwargs)
@@ -0,0 +1,191 @@
+import json
+import os
+import subprocess
+import time
+import types
+from urllib.parse import urlencode
+
+import yaml
+
+from local_dynamodb import LocalTable
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "wafcf.yaml")
+
+
+class CloudFormationTag:
+    """Placeholder for intrinsic functions such as !Ref, !Sub and !GetAtt"""
+
+    def __init__(self, tag, value):
+        self.tag = tag
+        self.value = value
+
+    def __repr__(self):
+        return f"{self.tag} {self.value!r}"
+
+
+class _TemplateLoader(yaml.SafeLoader):
+    pass
+
+
+def _construct_tag(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+    return CloudFormationTag("!" + tag_suffix, value)
+
+
+_TemplateLoader.add_multi_constructor("!", _construct_tag)
+
+
+class EchoShell:
+    """
+    Stand-in for the subprocess module of a loaded handler. The vulnerable
+    product check shells out to `echo`; this answers with the echoed text
+    in-process, so injection payloads sent to a local stand-in come back
+    as text instead of running on this machine (and no process is forked
+    per request). Any other command fails as if it were not found.
+    """
+
+    CalledProcessError = subprocess.CalledProcessError
+
+    @staticmethod
+    def check_output(args, shell=False, **kwargs):
+        command = args if isinstance(args, str) else " ".join(args)
+        program, _, text = command.partition(" ")
+        if program != "echo":
+            raise subprocess.CalledProcessError(127, args, output=b"")
+        return (text + "\n").encode("utf-8")
+
+
+def load_template(path=DEFAULT_TEMPLATE):
+    """Parse a CloudFormation template, keeping intrinsic functions as CloudFormationTag values"""
+    with open(path) as f:
+        return yaml.load(f, Loader=_TemplateLoader)
+
+
+def function_code(template, function_name, template_path=DEFAULT_TEMPLATE):
+    """
+    Return the source of a Lambda function resource's handler module: its
+    inline ZipFile code, or the module file in the local directory that
+    `aws cloudformation package` uploads (relative to the template)
+    """
+    properties = template["Resources"][function_name]["Properties"]
+    code = properties["Code"]
+    if isinstance(code, dict):
+        return code["ZipFile"]
+    module_name = properties["Handler"].rsplit(".", 1)[0]
+    path = os.path.join(os.path.dirname(os.path.abspath(template_path)), code, f"{module_name}.py")
+    with open(path) as f:
+        return f.read()
+
+
+def function_environment(template, function_name, table_name):
+    """
+    Return the function's environment variables with intrinsic functions
+    resolved for local use: the reviews table resolves to table_name and
+    anything else that only exists in AWS is left unset
+    """
+    properties = template["Resources"][function_name]["Properties"]
+    variables = properties.get("Environment", {}).get("Variables", {})
+    environment = {}
+    for name, value in variables.items():
+        if isinstance(value, CloudFormationTag):
+            if value.tag == "!Ref" and value.value == "ProductReviewsTable":
+                environment[name] = table_name
+            continue
+        environment[name] = str(value)
+    return environment
+
+
+def load_handler(function_name="UnprotectedLambdaFunction", table=None, template_path=DEFAULT_TEMPLATE,
+                 environment=None, template=None, log=print, real_shell=False):
+    """
+    Load a Lambda function's code from the template as a fresh module,
+    the way a new container would, backed by a local table
+
+    Args:
+        function_name: Logical ID of the AWS::Lambda::Function resource
+        table: Table stand-in to use instead of DynamoDB (a new LocalTable if None)
+        template_path: CloudFormation template to read the code from (its Code paths are relative to it)
+        environment: Extra environment variables overriding the template's
+        template: Already parsed template (skips reading template_path)
+        log: Replacement for print() in the handler's logging, e.g. a no-op
+        real_shell: Let the vulnerable product check run its command through
+            a real shell on this machine; by default EchoShell answers it
+
+    Returns:
+        The module, with lambda_handler ready to be called
+    """
+    if template is None:
+        template = load_template(template_path)
+    if table is None:
+        table = LocalTable()
+
+    variables = function_environment(template, function_name, table.name)
+    variables.update(environment or {})
+    variables.setdefault("AWS_DEFAULT_REGION", os.environ.get("AWS_DEFAULT_REGION", "us-east-1"))
+
+    # The handler reads its configuration at import time, so the variables
+    # only need to be set while the module code runs
+    saved = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        module = types.ModuleType("index")
+        module.__file__ = f"<{function_name}>"
+        exec(compile(function_code(template, function_name, template_path), module.__file__, "exec"), module.__dict__)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    module.table = table
+    if not real_shell:
+        module.subprocess = EchoShell
+    if log is not print:
+        module.print = log
+    return module
+
+
+def make_event(method, path="/reviews", query=None, body=None, headers=None, source_ip="127.0.0.1", stage="demo"):
+    """
+    Build an API Gateway REST (proxy integration) event
+
+    Args:
+        method: HTTP method
+        path: Resource path
+        query: Dict of query string parameters
+        body: Request body; dicts and lists are sent as JSON
+        headers: Dict of request headers
+        source_ip: Client IP reported in the request context
+        stage: API Gateway stage name
+    """
+    headers = dict(headers or {})
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body)
+        headers.setdefault("Content-Type", "application/json")
+    return {
+        "resource": "/reviews",
+        "path": path,
+        "httpMethod": method,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": dict(query) if query else None,
+        "multiValueQueryStringParameters": {name: [value] for name, value in query.items()} if query else None,
+        "pathParameters": None,
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": "/reviews",
+            "httpMethod": method,
+            "path": f"/{stage}{path}" + (f"?{urlencode(query)}" if query else ""),
+            "stage": stage,
+            "requestTimeEpoch": int(time.time() * 1000),
+            "identity": {"sourceIp": source_ip, "userAgent": headers.get("User-Agent", "")}
+        },
+        "body": body,
+        "isBase64Encoded": False
+    }
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+from urllib.parse import urlsplit
+
+import asynchttp
+from local_lambda import DEFAULT_TEMPLATE
+from webacl import compile_web_acl, load_web_acl_definition
+
+# API Gateway's response when an associated web ACL blocks a request
+BLOCK_BODY = json.dumps({"message": "Forbidden"}).encode()
+BLOCK_HEADERS = {"Content-Type": "application/json", "x-amzn-ErrorType": "ForbiddenException"}
+# Status codes WAF answers with for terminating actions other than Allow
+ACTION_STATUS = {"Block": 403, "CAPTCHA": 405, "Challenge": 202}
+
+
+class WafProxy:
+    """
+    Local stand-in for the web ACL in front of an app: requests a rule
+    blocks get WAF's response, everything else is passed to the upstream
+    app. GET /__waf/stats returns the counters as JSON.
+    """
+
+    STATS_PATH = "/__waf/stats"
+
+    def __init__(self, acl, upstream):
+        self.acl = acl
+        self.upstream = upstream
+        self.counters = {"requests": 0, "allowed": 0, "blocked": 0}
+        self.evaluation_seconds = 0.0
+
+    def stats(self):
+        requests = self.counters["requests"]
+        return dict(
+            self.counters,
+            mean_evaluation_us=round(self.evaluation_seconds / requests * 1e6, 3) if requests else 0.0,
+            **self.acl.stats()
+        )
+
+    async def __call__(self, request):
+        if request.path == self.STATS_PATH:
+            return 200, {"Content-Type": "application/json"}, json.dumps(self.stats()).encode()
+
+        self.counters["requests"] += 1
+        start = time.perf_counter()
+        action, _ = self.acl.evaluate(request)
+        self.evaluation_seconds += time.perf_counter() - start
+        if action in ACTION_STATUS:
+            self.counters["blocked"] += 1
+            return ACTION_STATUS[action], BLOCK_HEADERS, BLOCK_BODY
+        self.counters["allowed"] += 1
+        return await self.upstream(request)
+
+
+class HttpUpstream:
+    """Forwards requests to an upstream HTTP server over pooled keep-alive connections"""
+
+    def __init__(self, url, pool_size=100):
+        parts = urlsplit(url)
+        self.pool = asynchttp.ClientPool(parts.hostname, parts.port or 80, pool_size)
+
+    async def __call__(self, request):
+        headers = dict(request.headers)
+        headers["X-Forwarded-For"] = ", ".join(filter(None, [request.header("X-Forwarded-For"), request.client_ip]))
+        response = await self.pool.request(request.method, request.target, headers, request.body)
+        return response.status, response.headers, response.body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local WAF emulator applying the web ACL from wafcf.yaml")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--upstream", help="Forward allowed requests to this URL (e.g. http://127.0.0.1:8080); "
+                                           "by default the reviews service runs in-process")
+    parser.add_argument("--function", default="ProtectedLambdaFunction",
+                        choices=["UnprotectedLambdaFunction", "ProtectedLambdaFunction"], help="In-process function to protect")
+    parser.add_argument("--acl", default=DEFAULT_TEMPLATE, help="CloudFormation template or WAFv2 JSON with the web ACL")
+    parser.add_argument("--rules", nargs="+", help="Only apply these rules (e.g. RateBasedRule)")
+    parser.add_argument("--limit", type=int, help="Override the request limit of rate-based rules")
+    parser.add_argument("--window", type=int, help="Override the evaluation window of rate-based rules in seconds")
+    parser.add_argument("--max-keys", type=int, default=1_000_000, help="Maximum number of tracked client keys per rate-based rule")
+    parser.add_argument("--client-ip-header", help="Aggregate IP rate rules on the first IP in this header (e.g. X-Forwarded-For) "
+                                                   "instead of the socket address, as FORWARDED_IP rules do")
+
+    args = parser.parse_args()
+
+    acl = compile_web_acl(load_web_acl_definition(args.acl), rules=args.rules, max_keys=args.max_keys,
+                          client_ip_header=args.client_ip_header, rate_limit=args.limit, rate_window=args.window)
+
+    if args.upstream:
+        upstream = HttpUpstream(args.upstream)
+        target = args.upstream
+    else:
+        from local_api import ReviewsService
+        upstream = ReviewsService(args.function)
+        target = f"in-process {args.function}"
+
+    proxy = WafProxy(acl, upstream)
+    print(f"WAF emulator on http://{args.host}:{args.port} -> {target}")
+    for rule in acl.rules:
+        print(f"Rule {rule.priority}: {rule.name} ({rule.action})")
+    for name, reason in acl.skipped:
+        print(f"Skipping rule {name}: unsupported {reason}")
+    print(f"Counters: http://{args.host}:{args.port}{WafProxy.STATS_PATH}")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        asynchttp.run(asynchttp.serve(proxy, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\nStopped: {json.dumps(proxy.stats())}")
@@ -0,0 +1,272 @@
+import argparse
+import json
+import struct
+import sys
+import threading
+import time
+
+from stats import OUTCOMES, PerThread
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+MAGIC = b"WAFREC1\n"
+# The header is JSON padded to a fixed size, rewritten as new source names
+# appear and when the file is closed. Readers count the records from the
+# file size, so the file of a run that never closed is still readable.
+HEADER_SIZE = 4096
+# One fixed-width, little-endian record per request (24 bytes):
+# start (unix seconds), latency (seconds), response bytes, HTTP status
+# (0 when no response arrived), source id, result class id, padding
+RECORD = struct.Struct("<dfIHHB3x")
+FIELDS = [
+    ("start", "<f8"),
+    ("latency", "<f4"),
+    ("bytes", "<u4"),
+    ("status", "<u2"),
+    ("source", "<u2"),
+    ("outcome", "u1"),
+    ("_pad", "V3"),
+]
+OUTCOME_IDS = {outcome: n for n, outcome in enumerate(OUTCOMES)}
+# Latency of a request whose response time was modelled rather than measured (virtual runs)
+NOT_MEASURED = float("nan")
+# Records buffered per thread before one sequential write (6 KB)
+BUFFER_RECORDS = 256
+
+
+class Recorder:
+    """
+    Writes one fixed-width record per request to a file, for analysis after
+    the run (see load_records). Each thread packs records into its own
+    bytearray; a full buffer goes to the file in one write, under a lock
+    that is taken once per BUFFER_RECORDS requests, so a crash loses at
+    most that many records per thread.
+
+    Args:
+        path: File to write
+        metadata: Extra JSON-serialisable details stored in the header (tool, target, options)
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.records = 0
+        self.sources = []
+        self._source_ids = {}
+        self._header_sources = 0
+        # Unbuffered: records are already batched, and each flush then reaches the file
+        self._file = open(path, "wb", buffering=0)
+        self._file.write(self._header())
+        self._lock = threading.Lock()
+        self._buffers = PerThread(_Buffer)
+
+    def _header(self):
+        header = dict(self.metadata, records=self.records, sources=self.sources, outcomes=list(OUTCOMES),
+                      fields=[name for name, _ in FIELDS if not name.startswith("_")])
+        encoded = MAGIC + json.dumps(header).encode("utf-8")
+        if len(encoded) > HEADER_SIZE:
+            raise ValueError(f"Record file header is over {HEADER_SIZE} bytes; too many sources or too much metadata")
+        return encoded.ljust(HEADER_SIZE, b" ")
+
+    def source_id(self, name):
+        """Number stored for a source (bot type, worker, ...); new names are numbered as they appear"""
+        try:
+            return self._source_ids[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._source_ids:
+                    self._source_ids[name] = len(self.sources)
+                    self.sources.append(name)
+                return self._source_ids[name]
+
+    def record(self, start, latency, status, outcome, size=0, source=0):
+        """
+        Record one request; safe to call from any thread
+
+        Args:
+            start: When it was sent (time.time())
+            latency: Seconds until the response (or the error), or NOT_MEASURED
+            status: HTTP status, or 0 if no response arrived
+            outcome: Result class (a key of stats.OUTCOMES)
+            size: Response body bytes
+            source: Number from source_id()
+        """
+        buffer = self._buffers.get()
+        RECORD.pack_into(buffer.data, buffer.used * RECORD.size, start, latency, size, status, source,
+                         OUTCOME_IDS[outcome])
+        buffer.used += 1
+        if buffer.used == BUFFER_RECORDS:
+            self._flush(buffer)
+
+    def _flush(self, buffer):
+        if not buffer.used:
+            return
+        with self._lock:
+            self._file.write(memoryview(buffer.data)[:buffer.used * RECORD.size])
+            self.records += buffer.used
+            if len(self.sources) != self._header_sources:
+                self._rewrite_header()
+        buffer.used = 0
+
+    def _rewrite_header(self):
+        self._header_sources = len(self.sources)
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(0, 2)
+
+    def close(self):
+        """Write out every thread's remaining records and the final header"""
+        if self._file is None:
+            return
+        for buffer in self._buffers.values():
+            self._flush(buffer)
+        self._rewrite_header()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Buffer:
+    def __init__(self):
+        self.data = bytearray(BUFFER_RECORDS * RECORD.size)
+        self.used = 0
+
+
+def read_header(path):
+    """
+    Returns:
+        The header dict; its records count is taken from the file size,
+        which is current even if the writer never closed the file
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+        size = f.seek(0, 2)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a request record file")
+    header = json.loads(header[len(MAGIC):].decode("utf-8"))
+    # A record cut short by a crash mid-write is left out
+    header["records"] = max(size - HEADER_SIZE, 0) // RECORD.size
+    return header
+
+
+def load_records(path):
+    """
+    Memory-map a record file as a NumPy structured array, without reading
+    it into memory; columns are views (records["latency"], records["status"], ...)
+
+    Returns:
+        (records, header) where header has the source and result class names
+    """
+    if not HAS_NUMPY:
+        raise ImportError("Loading records needs NumPy: pip install numpy")
+    header = read_header(path)
+    dtype = np.dtype(FIELDS)
+    assert dtype.itemsize == RECORD.size
+    if not header["records"]:
+        return np.zeros(0, dtype=dtype), header
+    records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(header["records"],))
+    return records, header
+
+
+def load_runs(paths):
+    """
+    Load the record files of one run's workers as one array (copied, since
+    memory maps of several files cannot be joined); source names are
+    renumbered to a shared table
+    """
+    if len(paths) == 1:
+        return load_records(paths[0])
+    parts = []
+    sources = []
+    header = None
+    for path in paths:
+        records, header = load_records(path)
+        mapping = np.array([_index(sources, name) for name in header["sources"]] or [0], dtype="<u2")
+        records = np.array(records)
+        records["source"] = mapping[records["source"]]
+        parts.append(records)
+    merged = np.concatenate(parts)
+    merged.sort(order="start", kind="stable")
+    return merged, dict(header, records=len(merged), sources=sources)
+
+
+def _index(names, name):
+    if name not in names:
+        names.append(name)
+    return names.index(name)
+
+
+def _print_table(title, rows):
+    print(f"\n{title}")
+    for label, selected in rows:
+        if not len(selected):
+            continue
+        latency = selected["latency"][~np.isnan(selected["latency"])] * 1000
+        if not len(latency):
+            print(f"  {label:<24} {len(selected):>10} requests, latency not measured")
+            continue
+        print(f"  {label:<24} {len(selected):>10} requests, latency p50 {np.percentile(latency, 50):8.1f} ms, "
+              f"p99 {np.percentile(latency, 99):8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise request record files written with --record")
+    parser.add_argument("files", nargs="+", help="Record files (all worker files of one run are combined)")
+    parser.add_argument("--status", type=int, nargs="+", help="Only requests with these HTTP statuses")
+    parser.add_argument("--source", nargs="+", help="Only requests from these sources (bot types, workers)")
+    parser.add_argument("--over-time", type=float, metavar="SECONDS",
+                        help="Also print request count and latency for each interval of this length")
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        print("Error: NumPy is required: pip install numpy")
+        sys.exit(1)
+
+    load_start = time.perf_counter()
+    records, header = load_runs(args.files)
+    print(f"Loaded {len(records)} records in {time.perf_counter() - load_start:.2f}s")
+    outcomes = header["outcomes"]
+    sources = header["sources"]
+
+    selected = records
+    if args.status:
+        selected = selected[np.isin(selected["status"], args.status)]
+    if args.source:
+        wanted = [sources.index(name) for name in args.source if name in sources]
+        selected = selected[np.isin(selected["source"], wanted)]
+    if not len(selected):
+        print("No matching records")
+        sys.exit(0)
+
+    # Times are from the first request of the run, not of the selection
+    started = records["start"].min()
+    span = selected["start"].max() - selected["start"].min()
+    print(f"Selected {len(selected)} requests over {span:.1f}s")
+    _print_table("By result", [(OUTCOMES[name], selected[selected["outcome"] == n]) for n, name in enumerate(outcomes)])
+    _print_table("By status", [(str(status) if status else "No response", selected[selected["status"] == status])
+                               for status in np.unique(selected["status"])])
+    if len(sources) > 1:
+        _print_table("By source", [(name, selected[selected["source"] == n]) for n, name in enumerate(sources)])
+
+    if args.over_time:
+        slots = ((selected["start"] - started) // args.over_time).astype(np.int64)
+        counts = np.bincount(slots)
+        order = np.argsort(slots, kind="stable")
+        boundaries = np.cumsum(counts)[:-1]
+        print(f"\nOver time ({args.over_time:g}s intervals)")
+        for slot, latencies in enumerate(np.split(selected["latency"][order] * 1000, boundaries)):
+            measured = latencies[~np.isnan(latencies)]
+            if len(measured):
+                print(f"  {slot * args.over_time:8.1f}s {len(latencies):>10} requests, "
+                      f"latency p50 {np.median(measured):8.1f} ms, max {measured.max():8.1f} ms")
+            elif len(latencies):
+                print(f"  {slot * args.over_time:8.1f}s {len(latencies):>10} requests, latency not measured")
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from behaviors import Request
+from histogram import Histogram
+from http_pool import PooledSession
+from recorder import Recorder
+from reporter import NORMAL, Reporter, add_arguments as add_report_arguments
+from stats import PerThread, RunStats
+from workers import GRACE_SECONDS, RunControl, SubmissionWindow
+
+import bot_trace
+
+# Requests handed to the thread pool ahead of the ones in flight, per concurrent sender
+SUBMIT_AHEAD = 2
+# How long before the first request the schedule starts, so it is not late from the outset
+START_LEAD_SECONDS = 0.05
+
+# API Gateway's "CLF" access log format:
+# $context.identity.sourceIp $context.identity.caller $context.identity.user [$context.requestTime]
+# "$context.httpMethod $context.resourcePath $context.protocol" $context.status ...
+CLF_LINE = re.compile(r'(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<uri>\S+)[^"]*" (?P<status>\d{3})')
+REQUEST_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+
+def is_binary_trace(path):
+    with open(path, "rb") as f:
+        return f.read(len(bot_trace.MAGIC)) == bot_trace.MAGIC
+
+
+def read_trace(path):
+    """
+    Stream a trace file's requests in time order without reading it into
+    memory: a binary trace written by bot_trace.py, or JSON lines as read by
+    webacl.load_traffic (timestamp, ip, method, uri, headers, body), such as
+    a converted access log
+
+    Yields:
+        (seconds from the first request, source name, Request); paths
+        starting with / replace the target URL's path, others are appended
+        to the target URL
+    """
+    if is_binary_trace(path):
+        for offset, _, bot_type, request in bot_trace.iter_requests(path):
+            yield offset, bot_type, request
+        return
+
+    first = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            timestamp = float(record.get("timestamp", 0))
+            if first is None:
+                first = timestamp
+            method = record.get("method", "GET")
+            uri = record.get("uri", "/")
+            body = record.get("body") or None
+            yield timestamp - first, record.get("ip", "log"), Request(f"{method} {uri}", method, uri, body,
+                                                                       record.get("headers") or None, 10)
+
+
+def _log_field(record, *names):
+    for name in names:
+        if record.get(name) not in (None, "", "-"):
+            return record[name]
+    return None
+
+
+def parse_access_log_line(line):
+    """
+    One API Gateway access log line, in the JSON or CLF format (optionally
+    after a CloudWatch Logs timestamp), as a webacl traffic record
+
+    Returns:
+        dict with timestamp, ip, method, uri and optionally headers and status, or None if the line is not a request
+    """
+    start = line.find("{")
+    if start != -1:
+        record = json.loads(line[start:])
+        if isinstance(record.get("message"), str) and record["message"].lstrip().startswith("{"):
+            record = json.loads(record["message"])
+        epoch = _log_field(record, "requestTimeEpoch")
+        if epoch is not None:
+            timestamp = int(epoch) / 1000
+        else:
+            request_time = _log_field(record, "requestTime")
+            if request_time is None:
+                return None
+            timestamp = datetime.strptime(request_time, REQUEST_TIME_FORMAT).timestamp()
+        method = _log_field(record, "httpMethod", "method")
+        uri = _log_field(record, "path", "resourcePath")
+        route = _log_field(record, "routeKey")
+        if route and " " in route and (method is None or uri is None):
+            # HTTP APIs log "GET /reviews"
+            method, uri = route.split(" ", 1)
+        if method is None:
+            return None
+        traffic = dict(timestamp=timestamp, ip=_log_field(record, "ip", "sourceIp") or "127.0.0.1", method=method,
+                       uri=uri or "/")
+        user_agent = _log_field(record, "userAgent")
+        if user_agent:
+            traffic["headers"] = {"User-Agent": user_agent}
+        status = _log_field(record, "status")
+        if status is not None:
+            traffic["status"] = int(status)
+        return traffic
+
+    match = CLF_LINE.search(line)
+    if match is None:
+        return None
+    return dict(timestamp=datetime.strptime(match["time"], REQUEST_TIME_FORMAT).timestamp(), ip=match["ip"],
+                method=match["method"], uri=match["uri"], status=int(match["status"]))
+
+
+def convert_access_log(log_path, trace_path, prefix=""):
+    """
+    Convert an API Gateway access log into a JSON-lines trace, sorted by
+    request time (log lines from several streams are often out of order)
+
+    Args:
+        prefix: Prepended to each logged path, e.g. the stage ("/demo") when the log has $context.resourcePath
+
+    Returns:
+        (requests converted, lines skipped)
+    """
+    records = []
+    skipped = 0
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = parse_access_log_line(line)
+            except ValueError:
+                record = None
+            if record is None:
+                skipped += 1
+                continue
+            record["uri"] = prefix + record["uri"]
+            records.append(record)
+    records.sort(key=lambda record: record["timestamp"])
+    with open(trace_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return len(records), skipped
+
+
+def replay(trace_path, target_url, speed=1.0, concurrent_requests=50, verbosity=NORMAL, log_path=None,
+           report_interval=1.0, record_path=None, duration=None, grace=GRACE_SECONDS):
+    """
+    Send a trace's requests to target_url, each at its recorded offset
+    divided by `speed`. One scheduler thread reads the trace as it goes
+    and waits for each request's time with RunControl.wait_until (sleeping,
+    then spinning for the last moments); a pool of concurrent_requests
+    threads sends. Requests are handed over through a bounded window, so
+    memory stays flat for a trace of any length, and a pool that cannot
+    keep up shows as lag rather than as a growing queue.
+
+    At `duration` seconds or on Ctrl+C, no more requests are sent; those
+    in flight get `grace` seconds to finish, and the results cover the
+    part of the trace that was replayed.
+
+    Returns:
+        (RunStats, dispatch lag Histogram, seconds of the trace replayed)
+    """
+    target = urlsplit(target_url)
+    origin = f"{target.scheme}://{target.netloc}"
+    total = None
+    if is_binary_trace(trace_path):
+        total = bot_trace.read_header(trace_path)[0]["records"]
+
+    stats = RunStats()
+    # How late the scheduler handed each request over, measured on the scheduler thread
+    dispatch_lag = Histogram()
+    thread_stats = PerThread(RunStats)
+    reporter = Reporter("Replay", total, verbosity, log_path, report_interval)
+    recorder = None
+    if record_path:
+        recorder = Recorder(record_path, dict(tool="replay", trace=trace_path, url=target_url, speed=speed,
+                                              concurrent=concurrent_requests))
+    session = PooledSession(concurrent_requests)
+    start = None
+    replayed = 0.0
+
+    def send_request(deadline, source, request):
+        run_stats = thread_stats.get()
+        # Send lag: dispatch lag plus any wait for a free sender
+        run_stats.record_send(time.perf_counter() - start, time.perf_counter() - deadline)
+        url = origin + request.path if request.path.startswith("/") else target_url + request.path
+        body = {"json": request.data} if isinstance(request.data, dict) else {"data": request.data}
+        sent_at = time.time()
+        request_start = time.perf_counter()
+        try:
+            response = session.request(request.method, url, headers=request.headers, timeout=request.timeout, **body)
+        except Exception as e:
+            latency = time.perf_counter() - request_start
+            outcome = run_stats.record_exception(e)
+            reporter.record(outcome, f"{request.label} - Error: {str(e) or e.__class__.__name__}")
+            status, size = 0, 0
+        else:
+            latency = time.perf_counter() - request_start
+            run_stats.latency.record(latency)
+            # Measured from the request's place in the schedule, so lag and queueing are included
+            run_stats.corrected_latency.record(time.perf_counter() - deadline)
+            outcome = run_stats.record_status(response.status_code)
+            reporter.record(outcome, f"{request.label} - Status: {response.status_code}")
+            status, size = response.status_code, len(response.content)
+        if recorder is not None:
+            recorder.record(sent_at, latency, status, outcome, size, recorder.source_id(source))
+
+    reporter.start()
+    started_at = time.time()
+    control = RunControl(duration, grace)
+    start = time.perf_counter() + START_LEAD_SECONDS
+    executor = ThreadPoolExecutor(max_workers=concurrent_requests)
+    window = SubmissionWindow(executor, concurrent_requests * SUBMIT_AHEAD)
+    try:
+        for offset, source, request in read_trace(trace_path):
+            deadline = start + offset / speed
+            lag = control.wait_until(deadline)
+            if lag is None:
+                break
+            dispatch_lag.record(lag)
+            window.submit(send_request, deadline, source, request)
+            replayed = offset
+    except KeyboardInterrupt:
+        control.stop("interrupted")
+    control.drain(window)
+    executor.shutdown(wait=False)
+    session.close()
+
+    for local_stats in thread_stats.values():
+        stats.merge(local_stats)
+    stats.elapsed = time.time() - started_at
+    stats.requests = sum(stats.outcomes.values())
+    control.update(stats)
+    reporter.stop()
+    if recorder is not None:
+        recorder.close()
+    return stats, dispatch_lag, replayed
+
+
+def print_summary(trace_path, target_url, speed, stats, dispatch_lag, replayed):
+    num_requests = stats.requests
+    print("\n----- Trace Replay Results -----")
+    print(f"Trace: {trace_path} ({num_requests} requests over {replayed:.1f}s recorded)")
+    print(f"Target URL: {target_url}")
+    print(f"Speed: {speed:g}x ({replayed / speed:.1f}s scheduled)")
+    print(f"Total Duration: {stats.elapsed:.2f} seconds")
+    stats.print_stopped()
+    if not num_requests:
+        return
+    print(f"Requests per second: {num_requests / stats.elapsed:.2f}"
+          + (f" (scheduled {num_requests / (replayed / speed):.2f})" if replayed else ""))
+    print(f"Success rate: {stats.success / num_requests * 100:.2f}%")
+    print(f"Blocked rate: {stats.outcomes['blocked'] / num_requests * 100:.2f}%")
+    print(f"Error rate: {stats.errors / num_requests * 100:.2f}%")
+    stats.print_breakdown()
+    if stats.latency.count:
+        print(f"Latency from send: {stats.latency.summary()}")
+        print(f"Latency from scheduled time: {stats.corrected_latency.summary()}")
+    # How faithful the replay's timing was: dispatch lag is the scheduler
+    # waking late; send lag adds waiting for a free sender
+    print(f"Dispatch lag: {dispatch_lag.summary()}")
+    print(f"Send lag: {stats.send_delay.summary()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded request trace against a URL, keeping its timing")
+    parser.add_argument("trace", help="Trace to replay: a bot_trace.py file or JSON lines (timestamp, ip, method, uri, ...); "
+                                      "with --convert, the JSON-lines file to write")
+    parser.add_argument("--url", help="Target URL; trace paths starting with / replace its path, others are appended")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than recorded (e.g. 10)")
+    parser.add_argument("--concurrent", type=int, default=50, help="Requests in flight at once")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds and report the part replayed")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help="Seconds requests in flight get to finish once the replay stops (at --duration or Ctrl+C)")
+    parser.add_argument("--convert", metavar="ACCESS_LOG",
+                        help="Convert an API Gateway access log (JSON or CLF format) into the trace file, then exit")
+    parser.add_argument("--prefix", default="", help="--convert: prepend this to logged paths, e.g. /demo for the stage")
+    add_report_arguments(parser)
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record every request (time, latency, status, bytes, source) to FILE for recorder.py to analyse")
+    args = parser.parse_args()
+
+    if args.convert:
+        converted, skipped = convert_access_log(args.convert, args.trace, args.prefix)
+        print(f"Converted {converted} requests from {args.convert} to {args.trace}"
+              + (f" ({skipped} lines skipped)" if skipped else ""))
+        sys.exit(0)
+    if not args.url:
+        parser.error("--url is required to replay")
+    if args.speed <= 0:
+        parser.error("--speed must be above 0")
+
+    print(f"Replaying {args.trace} against {args.url} at {args.speed:g}x")
+    print("Press Ctrl+C to stop early\n")
+    try:
+        results = replay(args.trace, args.url, args.speed, args.concurrent, args.verbosity, args.log_file,
+                         args.report_interval, args.record, args.duration, args.grace)
+        print_summary(args.trace, args.url, args.speed, *results)
+    except KeyboardInterrupt:
+        print("\nReplay aborted by user")
@@ -0,0 +1,147 @@
+import collections
+import sys
+import threading
+import time
+
+from stats import FAILURES, OUTCOMES
+
+# Verbosity levels
+QUIET = 0    # Nothing until the final summary
+NORMAL = 1   # A one-line progress summary every interval
+VERBOSE = 2  # The summary line plus every per-request message
+
+# Result classes shown on the summary line, in short form
+SHORT_LABELS = {
+    "2xx": "2xx",
+    "blocked": "403",
+    "throttled": "429",
+    "other": "other",
+    "server_error": "5xx",
+    "timeout": "timeout",
+    "connection_error": "conn-err",
+    "error": "err",
+}
+
+
+class Reporter:
+    """
+    Prints progress from one background thread, so request threads never
+    write to the terminal themselves. Threads push (outcome, message)
+    events onto a deque, whose appends and pops are atomic, so recording
+    takes no lock. Every `interval` seconds the reporter thread drains the
+    deque and prints one summary line, and at VERBOSE every message too.
+    Messages can also go to a log file, written in large blocks.
+
+    Args:
+        name: Prefix of the summary line (e.g. "Botnet")
+        total: Expected number of requests, shown as done/total (optional)
+        verbosity: QUIET, NORMAL or VERBOSE
+        log_path: Also write every message to this file
+        interval: Seconds between summary lines
+        log_buffer: Bytes buffered before each write to the log file
+    """
+
+    def __init__(self, name="", total=None, verbosity=NORMAL, log_path=None, interval=1.0, log_buffer=1 << 20):
+        self.name = name
+        self.total = total
+        self.verbosity = verbosity
+        self.interval = interval
+        self.events = collections.deque()
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.done = 0
+        self._log = open(log_path, "w", buffering=log_buffer) if log_path else None
+        self._keep_messages = verbosity >= VERBOSE or self._log is not None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+        self._last = (0.0, 0)
+
+    def record(self, outcome, message=None):
+        """
+        Called from any thread for each finished request
+
+        Args:
+            outcome: Result class (a key of stats.OUTCOMES), or None for a message that is not a request
+            message: Line shown at VERBOSE and written to the log file
+        """
+        self.events.append((outcome, message))
+
+    def message(self, text):
+        """A line that is only shown at VERBOSE (and logged), e.g. 'Starting flood bot'"""
+        self.events.append((None, text))
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._last = (self._start, 0)
+        self._thread = threading.Thread(target=self._run, name="reporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Report what is left and print a final summary line"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._drain()
+            if self.verbosity >= NORMAL:
+                self._print_summary()
+        self._drain()
+        if self.verbosity >= NORMAL:
+            self._print_summary()
+
+    def _drain(self):
+        events = self.events
+        counts = self.counts
+        lines = []
+        for _ in range(len(events)):
+            outcome, message = events.popleft()
+            if outcome is not None:
+                counts[outcome] += 1
+                self.done += 1
+            if message is not None and self._keep_messages:
+                lines.append(message)
+        if not lines:
+            return
+        block = "\n".join(lines) + "\n"
+        if self.verbosity >= VERBOSE:
+            sys.stdout.write(block)
+        if self._log is not None:
+            self._log.write(block)
+
+    def _print_summary(self):
+        now = time.perf_counter()
+        last_time, last_done = self._last
+        self._last = (now, self.done)
+        rate = (self.done - last_done) / (now - last_time) if now > last_time else 0.0
+        done = f"{self.done}/{self.total}" if self.total else f"{self.done}"
+        errors = sum(self.counts[outcome] for outcome in FAILURES)
+        parts = [f"{SHORT_LABELS[outcome]} {count}" for outcome, count in self.counts.items() if count]
+        prefix = f"{self.name} " if self.name else ""
+        sys.stdout.write(f"{prefix}[{now - self._start:7.1f}s] {done} done, {rate:.0f} req/s"
+                         f" | {', '.join(parts) or 'no results'} | errors {errors}\n")
+        sys.stdout.flush()
+
+
+def add_arguments(parser):
+    """Add --quiet, --verbose, --log-file and --report-interval to an argparse parser"""
+    levels = parser.add_mutually_exclusive_group()
+    levels.add_argument("--quiet", action="store_const", dest="verbosity", const=QUIET, default=NORMAL,
+                        help="Print only the final summary")
+    levels.add_argument("--verbose", action="store_const", dest="verbosity", const=VERBOSE,
+                        help="Print every request's result as well as the progress line")
+    parser.add_argument("--log-file", help="Write every request's result to this file")
+    parser.add_argument("--report-interval", type=float, default=1.0, help="Seconds between progress lines")
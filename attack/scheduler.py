@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from stats import SENT_SLOT_SECONDS
+
+# time.sleep() can wake up a scheduler tick late, so sleep until this close
+# to a deadline and spin for the rest
+SPIN_SECONDS = 0.002
+
+
+def wait_until(deadline, clock=time.perf_counter):
+    """
+    Block until clock() reaches deadline
+
+    Returns:
+        How late the wait returned, in seconds
+    """
+    remaining = deadline - clock()
+    if remaining > SPIN_SECONDS:
+        time.sleep(remaining - SPIN_SECONDS)
+    while clock() < deadline:
+        # Release the GIL while spinning so worker threads keep running
+        time.sleep(0)
+    return clock() - deadline
+
+
+async def async_wait_until(deadline, clock=time.perf_counter):
+    """wait_until for event loops: spins by yielding to other tasks instead of blocking"""
+    remaining = deadline - clock()
+    if remaining > SPIN_SECONDS:
+        await asyncio.sleep(remaining - SPIN_SECONDS)
+    while clock() < deadline:
+        await asyncio.sleep(0)
+    return clock() - deadline
+
+
+def peak_in_window(counts, slot_seconds, window_seconds):
+    """
+    Most requests sent within any window_seconds-long run of slots
+
+    Args:
+        counts: Requests sent in each slot_seconds-long slot since the start
+    """
+    width = max(1, int(round(window_seconds / slot_seconds)))
+    peak = total = 0
+    for slot, count in enumerate(counts):
+        total += count
+        if slot >= width:
+            total -= counts[slot - width]
+        peak = max(peak, total)
+    return peak
+
+
+class BurstScheduler:
+    """
+    Releases `total` requests in bursts of `burst_size`, one burst every
+    `burst_delay` seconds. Burst deadlines are fixed offsets from the start
+    (start + n * burst_delay), so a late burst does not push back the ones
+    after it.
+
+    Senders run the schedule in a thread or task of its own (release(),
+    async_release()) that queues each burst's range of request indices at
+    its release time, so a sender held up by its concurrency limit does
+    not hold up the releases; the wait shows up as send delay.
+
+    Bursts are produced lazily, and send times are recorded into the
+    sender's RunStats (a histogram of delays and per-slot counts) rather
+    than per request, so memory stays flat however many requests a run
+    sends. This lets the rate a target actually saw be reported rather
+    than assumed.
+    """
+
+    def __init__(self, total, burst_size, burst_delay, clock=time.perf_counter):
+        self.total = total
+        self.burst_size = max(1, burst_size)
+        self.burst_delay = max(0.0, burst_delay)
+        self.clock = clock
+        self.start = None
+        # How late each burst was released: count, sum and worst
+        self.released = 0
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+        self.workers = 1
+
+    def _release(self, burst, first, lateness):
+        self.released += 1
+        self.lateness_total += lateness
+        self.lateness_max = max(self.lateness_max, lateness)
+        return range(first, min(first + self.burst_size, self.total))
+
+    def bursts(self, control=None):
+        """
+        Yield a range of request indices for each burst, at the burst's
+        release time, until the run is over or `control` (a
+        workers.RunControl) stops it
+        """
+        self.start = self.clock()
+        for burst, first in enumerate(range(0, self.total, self.burst_size)):
+            release_at = self.start + burst * self.burst_delay
+            if control is None:
+                lateness = wait_until(release_at, self.clock)
+            else:
+                lateness = control.wait_until(release_at, self.clock)
+                if lateness is None:
+                    return
+            yield self._release(burst, first, lateness)
+
+    async def async_bursts(self, control=None):
+        """bursts() for event loops"""
+        self.start = self.clock()
+        for burst, first in enumerate(range(0, self.total, self.burst_size)):
+            release_at = self.start + burst * self.burst_delay
+            if control is None:
+                lateness = await async_wait_until(release_at, self.clock)
+            else:
+                lateness = await control.async_wait_until(release_at, self.clock)
+                if lateness is None:
+                    return
+            yield self._release(burst, first, lateness)
+
+    def release(self, put, control=None):
+        """
+        Call put(burst) with each of bursts() at its release time, then
+        put(None); run it in a thread of its own, feeding an unbounded
+        queue (the queue holds one range per burst, not one item per request)
+        """
+        try:
+            for burst in self.bursts(control):
+                put(burst)
+        finally:
+            put(None)
+
+    async def async_release(self, put, control=None):
+        """release() for event loops, run as a task of its own"""
+        try:
+            async for burst in self.async_bursts(control):
+                put(burst)
+        finally:
+            put(None)
+
+    @classmethod
+    def merged(cls, schedules):
+        """
+        Combine the records of schedulers that ran side by side in worker
+        processes started at the same moment; each worker sent a share of
+        every burst
+        """
+        schedules = list(schedules)
+        first = schedules[0]
+        total = cls(sum(schedule.total for schedule in schedules), sum(schedule.burst_size for schedule in schedules),
+                    first.burst_delay, first.clock)
+        total.workers = len(schedules)
+        for schedule in schedules:
+            total.released += schedule.released
+            total.lateness_total += schedule.lateness_total
+            total.lateness_max = max(total.lateness_max, schedule.lateness_max)
+        return total
+
+    def intended(self, i):
+        """When request i is meant to go out, in seconds since the start"""
+        return (i // self.burst_size) * self.burst_delay
+
+    def mark_sent(self, i, run_stats):
+        """Record into the sender's RunStats that request i is going out now"""
+        elapsed = self.clock() - self.start
+        run_stats.record_send(elapsed, elapsed - self.intended(i))
+
+    def since_intended(self, i):
+        """Seconds since request i was meant to go out"""
+        return self.clock() - self.start - self.intended(i)
+
+    def print_summary(self, stats, rate_window=300):
+        """Print release drift, send delays and the send rate over a rate-based rule's window"""
+        if not self.released:
+            return
+        delays = stats.send_delay
+        span = stats.last_sent - stats.first_sent if delays.count > 1 else 0.0
+
+        print(f"Bursts: {self.released // self.workers} x {self.burst_size} requests every {self.burst_delay:g}s")
+        print(f"Burst release drift: mean {self.lateness_total / self.released * 1000:.2f} ms, "
+              f"max {self.lateness_max * 1000:.2f} ms")
+        if delays.count:
+            print(f"Send delay after intended time: p50 {delays.percentile(50) * 1000:.1f} ms, "
+                  f"p99 {delays.percentile(99) * 1000:.1f} ms, max {delays.max * 1000:.1f} ms")
+        if span:
+            print(f"Actual send rate: {(delays.count - 1) / span:.2f} requests/second over {span:.1f}s")
+        peak = peak_in_window(stats.sent_counts, SENT_SLOT_SECONDS, rate_window)
+        print(f"Peak requests in any {rate_window}s window: {peak} "
+              f"(what a rate-based rule with a {rate_window}s evaluation window counts)")
+
+
+class EventScheduler:
+    """
+    Discrete-event scheduler on a virtual clock. Callbacks wait in a heap
+    keyed by the virtual time they are due at (ties run in the order they
+    were scheduled); run() pops them in order, moving the clock to each
+    one's time before calling it, so a pause of any length costs nothing.
+    Calling the scheduler returns the virtual time, so it can be passed as
+    the clock of anything that reads time (such as a web ACL's rate-based
+    rules).
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.processed = 0
+        self._queue = []
+        self._order = itertools.count()
+
+    def __call__(self):
+        return self.now
+
+    def __len__(self):
+        return len(self._queue)
+
+    def at(self, when, callback, *args):
+        """Call callback(*args) at virtual time `when`"""
+        heapq.heappush(self._queue, (when, next(self._order), callback, args))
+
+    def after(self, delay, callback, *args):
+        """Call callback(*args) `delay` virtual seconds from now"""
+        self.at(self.now + delay, callback, *args)
+
+    def run(self, until=None):
+        """
+        Run events in time order until none are left, or until the next one
+        is due after `until`
+
+        Returns:
+            Number of events run
+        """
+        queue = self._queue
+        start = self.processed
+        while queue and (until is None or queue[0][0] <= until):
+            when, _, callback, args = heapq.heappop(queue)
+            self.now = when
+            callback(*args)
+            self.processed += 1
+        return self.processed - start
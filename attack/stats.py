@@ -0,0 +1,252 @@
+import asyncio
+import threading
+from array import array
+
+import requests
+
+from histogram import Histogram
+
+# Result classes, in report order. Only the last four are failures of the
+# load generator or target; a 403 (WAF block) or 429 (throttle) is the
+# defence answering, not an error.
+OUTCOMES = {
+    "2xx": "2xx",
+    "blocked": "403 WAF block",
+    "throttled": "429 throttled",
+    "other": "Other status",
+    "server_error": "5xx Lambda / throttle",
+    "timeout": "Timeout",
+    "connection_error": "Connection error",
+    "error": "Other error",
+}
+FAILURES = ("server_error", "timeout", "connection_error", "error")
+
+# Sent requests are counted per slot of this many seconds, so send-rate
+# records grow with a run's duration rather than its request count
+SENT_SLOT_SECONDS = 0.1
+
+
+def status_outcome(status):
+    """Result class of an HTTP status code"""
+    if 200 <= status < 300:
+        return "2xx"
+    if status == 403:
+        return "blocked"
+    if status == 429:
+        return "throttled"
+    if status >= 500:
+        return "server_error"
+    return "other"
+
+
+def exception_outcome(exception):
+    """Result class of an exception raised while sending a request"""
+    # requests' ConnectTimeout is also a ConnectionError, so test timeouts first.
+    # asyncio.wait_for raises asyncio.TimeoutError, which is only an alias of
+    # TimeoutError from Python 3.11
+    if isinstance(exception, (TimeoutError, asyncio.TimeoutError, requests.Timeout)):
+        return "timeout"
+    if isinstance(exception, (ConnectionError, requests.ConnectionError, EOFError)):
+        return "connection_error"
+    return "error"
+
+
+class RunStats:
+    """
+    Counters from one load-generation run. Plain attributes only, so a
+    worker process can send its RunStats back to the parent, which merges
+    them into one report.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.elapsed = 0.0
+        # Responses by status code, and results by class (see OUTCOMES)
+        self.statuses = {}
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        # Latency of completed requests, from when each was actually sent and,
+        # for rate-scheduled runs, from when it was meant to be sent (which
+        # includes any time spent queued behind slow requests)
+        self.latency = Histogram()
+        self.corrected_latency = Histogram()
+        # When requests went out (rate-scheduled runs): delay after the
+        # intended send time, requests sent per SENT_SLOT_SECONDS slot since
+        # the start, and the first and last send time
+        self.send_delay = Histogram()
+        self.sent_counts = array("q")
+        self.first_sent = None
+        self.last_sent = 0.0
+        # Connection reuse (http_flood)
+        self.connections = 0
+        self.warm_connections = 0
+        self.handshake_seconds = 0.0
+        self.workers = 1
+        # Why the run stopped before finishing its work (see workers.RunControl),
+        # or None, and how many requests were still in flight when it gave up on them
+        self.stopped = None
+        self.unfinished = 0
+
+    @property
+    def success(self):
+        return self.outcomes["2xx"]
+
+    @property
+    def errors(self):
+        return sum(self.outcomes[outcome] for outcome in FAILURES)
+
+    def record_status(self, status):
+        """Count a response; returns its result class"""
+        outcome = status_outcome(status)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.outcomes[outcome] += 1
+        return outcome
+
+    def record_send(self, elapsed, delay):
+        """Count a request going out `elapsed` seconds into the run, `delay` seconds after it was meant to"""
+        slot = int(elapsed / SENT_SLOT_SECONDS)
+        counts = self.sent_counts
+        if slot >= len(counts):
+            counts.extend([0] * (slot + 1 - len(counts)))
+        counts[slot] += 1
+        self.send_delay.record(delay)
+        if self.first_sent is None or elapsed < self.first_sent:
+            self.first_sent = elapsed
+        self.last_sent = max(self.last_sent, elapsed)
+
+    def record_exception(self, exception):
+        """Count a request that got no response; returns its result class"""
+        outcome = exception_outcome(exception)
+        self.outcomes[outcome] += 1
+        return outcome
+
+    def merge(self, other):
+        """Add another run's counters to this one; runs are assumed to overlap in time"""
+        for name in ("requests", "connections", "warm_connections", "handshake_seconds", "unfinished"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] += count
+        self.latency.merge(other.latency)
+        self.corrected_latency.merge(other.corrected_latency)
+        self.send_delay.merge(other.send_delay)
+        if len(other.sent_counts) > len(self.sent_counts):
+            self.sent_counts.extend([0] * (len(other.sent_counts) - len(self.sent_counts)))
+        for slot, count in enumerate(other.sent_counts):
+            self.sent_counts[slot] += count
+        if other.first_sent is not None and (self.first_sent is None or other.first_sent < self.first_sent):
+            self.first_sent = other.first_sent
+        self.last_sent = max(self.last_sent, other.last_sent)
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.stopped = self.stopped or other.stopped
+        return self
+
+    @classmethod
+    def merged(cls, runs):
+        """Merge the RunStats of worker processes"""
+        total = cls()
+        total.workers = 0
+        for run in runs:
+            total.merge(run)
+            total.workers += run.workers
+        return total
+
+    def print_stopped(self):
+        """Say if the run stopped early, so its results are read as those of a partial run"""
+        if self.stopped is None:
+            return
+        print(f"Stopped early ({self.stopped}); results are for the partial run"
+              + (f", without {self.unfinished} requests still in flight" if self.unfinished else ""))
+
+    def print_breakdown(self):
+        """Print result classes and status codes, each with its share of requests"""
+        total = sum(self.outcomes.values())
+        if not total:
+            return
+        print("Results:")
+        for outcome, label in OUTCOMES.items():
+            count = self.outcomes[outcome]
+            if count:
+                print(f"  {label}: {count} ({count/total*100:.2f}%)")
+        if self.statuses:
+            print("Status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(self.statuses.items())))
+
+
+class PerThread:
+    """
+    One instance of factory() per thread, so threads record without
+    sharing (or locking) anything; values() returns them all for merging
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._values = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.value
+        except AttributeError:
+            value = self._local.value = self._factory()
+            with self._lock:
+                self._values.append(value)
+            return value
+
+    def values(self):
+        with self._lock:
+            return list(self._values)
+
+
+def print_comparison(columns, title="A/B Comparison"):
+    """
+    Print runs against different targets side by side (an A/B run), with
+    the difference of the last column from the first
+
+    Args:
+        columns: (label, url, RunStats) per target, baseline first
+        title: Heading of the report
+    """
+    labels = [label for label, _, _ in columns]
+    runs = [stats for _, _, stats in columns]
+    width = max(14, *(len(label) for label in labels))
+
+    def row(name, values, delta=None):
+        cells = "".join(f"{value:>{width}}" for value in values)
+        print(f"{name:<40}{cells}" + (f"{delta:>{width}}" if delta is not None else ""))
+
+    def rate(count, stats):
+        return count / stats.requests * 100 if stats.requests else 0.0
+
+    def difference(values, unit, digits=1):
+        return f"{values[-1] - values[0]:+.{digits}f}{unit}"
+
+    print(f"\n----- {title} -----")
+    for label, url, _ in columns:
+        print(f"{label}: {url}")
+    print()
+    row("", labels, f"{labels[-1]} - {labels[0]}")
+    row("Requests", [stats.requests for stats in runs])
+    row("Duration (s)", [f"{stats.elapsed:.2f}" for stats in runs])
+    throughput = [stats.requests / stats.elapsed if stats.elapsed else 0.0 for stats in runs]
+    row("Requests per second", [f"{value:.1f}" for value in throughput], difference(throughput, ""))
+    rates = {
+        "Success rate": [rate(stats.success, stats) for stats in runs],
+        "Blocked rate (403)": [rate(stats.outcomes["blocked"], stats) for stats in runs],
+        "Error rate": [rate(stats.errors, stats) for stats in runs],
+    }
+    for name, values in rates.items():
+        row(name, [f"{value:.2f}%" for value in values], difference(values, " pts", 2))
+    for outcome, label in OUTCOMES.items():
+        counts = [stats.outcomes[outcome] for stats in runs]
+        if any(counts):
+            row(f"  {label}", counts)
+    for name, attribute in (("Latency", "latency"), ("Latency from intended send", "corrected_latency")):
+        histograms = [getattr(stats, attribute) for stats in runs]
+        if not any(histogram.count for histogram in histograms):
+            continue
+        for percent in (50, 90, 99, 99.9):
+            values = [histogram.percentile(percent) * 1000 for histogram in histograms]
+            row(f"{name} p{percent:g} (ms)", [f"{value:.1f}" for value in values], difference(values, " ms"))
+        values = [histogram.max * 1000 for histogram in histograms]
+        row(f"{name} max (ms)", [f"{value:.1f}" for value in values], difference(values, " ms"))
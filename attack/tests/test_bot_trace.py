@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bot_trace import TraceRequests, generate_trace, iter_requests, load_trace, path_label, write_trace
+
+
+def test_write_and_iter_requests_round_trip(tmp_path):
+    path = str(tmp_path / "bots.trace")
+    records, header = generate_trace(["simple", "scraper", "browser"], 30, bots_per_type=2, seed=7)
+    write_trace(path, records, header)
+
+    loaded, loaded_header = load_trace(path)
+    assert loaded_header["records"] == len(records) == 3 * 2 * 30
+    assert np.array_equal(np.asarray(loaded), records)
+
+    rebuilt = TraceRequests(header)
+    requests = list(iter_requests(path, chunk=17))
+    assert len(requests) == len(records)
+    times = [offset for offset, _, _, _ in requests]
+    assert times == sorted(times)
+    for (offset, bot, bot_type, request), record in zip(requests, records):
+        assert offset == record["time"]
+        assert bot == record["bot"]
+        assert bot_type == header["bot_types"][record["type"]]
+        expected = rebuilt.request(int(record["type"]), int(record["state"]), int(record["index"]),
+                                   int(record["user_agent"]))
+        assert (request.method, request.path, request.data, request.headers) == \
+            (expected.method, expected.path, expected.data, expected.headers)
+        assert "{" not in request.path
+
+
+def test_same_seed_same_trace():
+    first, _ = generate_trace(["rotating"], 20, seed=3)
+    second, _ = generate_trace(["rotating"], 20, seed=3)
+    assert np.array_equal(first, second)
+
+
+def test_path_label():
+    assert path_label("?product_id=prod{cycle:04d}") == "?product_id=prod<cycle>"
+    assert path_label("") == "/"
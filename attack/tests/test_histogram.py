@@ -0,0 +1,52 @@
+import pytest
+
+from histogram import Histogram
+
+
+def test_percentiles_within_bucket_precision():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    for percent in (50, 90, 99):
+        # Buckets are at most 1/64 wide
+        assert histogram.percentile(percent) == pytest.approx(percent / 100, rel=1 / 64)
+    assert histogram.percentile(100) == histogram.max == 1.0
+    assert histogram.min == 0.001
+    assert histogram.mean() == pytest.approx(0.5005)
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    for micros in (5, 10, 20, 40):
+        histogram.record(micros / 1_000_000)
+    assert histogram.percentile(50) == pytest.approx(10e-6)
+    assert histogram.percentile(75) == pytest.approx(20e-6)
+
+
+def test_percentile_never_exceeds_the_maximum():
+    histogram = Histogram()
+    histogram.record(0.123457)
+    assert histogram.percentile(99.9) == 0.123457
+
+
+def test_merge_matches_recording_into_one():
+    left, right, both = Histogram(), Histogram(), Histogram()
+    for n in range(500):
+        left.record(n / 1000)
+        both.record(n / 1000)
+    for n in range(500, 2000, 3):
+        right.record(n / 1000)
+        both.record(n / 1000)
+    left.merge(right)
+    assert left.count == both.count
+    assert left.min == both.min and left.max == both.max
+    for percent in (1, 50, 90, 99, 99.9):
+        assert left.percentile(percent) == both.percentile(percent)
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.0
+    assert histogram.mean() == 0.0
+    assert histogram.summary() == "no samples"
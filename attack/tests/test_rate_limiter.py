@@ -0,0 +1,58 @@
+from webacl import RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_blocks_once_the_limit_is_exceeded():
+    clock = FakeClock()
+    limiter = RateLimiter(3, window_seconds=60, clock=clock)
+    assert [limiter.hit("a") for _ in range(4)] == [False, False, False, True]
+    # Other keys have their own count
+    assert not limiter.hit("b")
+
+
+def test_previous_window_is_weighted_by_its_overlap():
+    clock = FakeClock()
+    limiter = RateLimiter(10, window_seconds=60, clock=clock)
+    for _ in range(10):
+        limiter.hit("a")
+    # Halfway through the next window, the previous 10 still count as 5
+    clock.now = 90.0
+    assert [limiter.hit("a") for _ in range(6)] == [False] * 5 + [True]
+
+
+def test_counts_older_than_one_window_are_dropped():
+    clock = FakeClock()
+    limiter = RateLimiter(2, window_seconds=60, clock=clock)
+    for _ in range(5):
+        limiter.hit("a")
+    clock.now = 150.0
+    assert not limiter.hit("a")
+
+
+def test_evicts_the_least_recently_seen_key():
+    clock = FakeClock()
+    limiter = RateLimiter(100, window_seconds=60, max_keys=2, clock=clock)
+    limiter.hit("a")
+    limiter.hit("b")
+    # A hit in the same window refreshes "a", so "b" is the one evicted
+    limiter.hit("a")
+    limiter.hit("c")
+    assert limiter.evictions == 1
+    assert list(limiter._slots) == ["a", "c"]
+    assert len(limiter) == 2
+
+
+def test_an_evicted_key_starts_from_zero():
+    clock = FakeClock()
+    limiter = RateLimiter(2, window_seconds=60, max_keys=1, clock=clock)
+    limiter.hit("a")
+    limiter.hit("a")
+    limiter.hit("b")
+    assert not limiter.hit("a")
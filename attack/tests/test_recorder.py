@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from recorder import BUFFER_RECORDS, NOT_MEASURED, Recorder, load_records, read_header
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "run.rec")
+    with Recorder(path, dict(tool="test")) as recorder:
+        bot = recorder.source_id("bot")
+        human = recorder.source_id("human")
+        recorder.record(1000.5, 0.25, 200, "2xx", 17, bot)
+        recorder.record(1001.0, 0.5, 403, "blocked", 3, human)
+        recorder.record(1002.0, 5.0, 0, "timeout")
+
+    records, header = load_records(path)
+    assert header["tool"] == "test"
+    assert header["records"] == 3
+    assert header["sources"] == ["bot", "human"]
+    assert records["start"].tolist() == [1000.5, 1001.0, 1002.0]
+    assert records["latency"].tolist() == [0.25, 0.5, 5.0]
+    assert records["status"].tolist() == [200, 403, 0]
+    assert records["bytes"].tolist() == [17, 3, 0]
+    assert records["source"].tolist() == [0, 1, 0]
+    assert [header["outcomes"][n] for n in records["outcome"]] == ["2xx", "blocked", "timeout"]
+
+
+def test_records_from_many_threads(tmp_path):
+    path = str(tmp_path / "run.rec")
+    recorder = Recorder(path)
+    per_thread = BUFFER_RECORDS * 2 + 10
+
+    def send(n):
+        source = recorder.source_id(f"thread {n}")
+        for i in range(per_thread):
+            recorder.record(float(i), 0.001, 200, "2xx", 0, source)
+
+    threads = [threading.Thread(target=send, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Full buffers are already in the file, with the source names, before close()
+    header = read_header(path)
+    assert header["records"] == 4 * BUFFER_RECORDS * 2
+    assert sorted(header["sources"]) == [f"thread {n}" for n in range(4)]
+
+    recorder.close()
+    records, header = load_records(path)
+    assert len(records) == 4 * per_thread
+    assert np.bincount(records["source"]).tolist() == [per_thread] * 4
+
+
+def test_latency_not_measured(tmp_path):
+    path = str(tmp_path / "run.rec")
+    with Recorder(path, dict(virtual=True)) as recorder:
+        recorder.record(0.0, NOT_MEASURED, 200, "2xx")
+        recorder.record(0.1, NOT_MEASURED, 403, "blocked")
+
+    records, header = load_records(path)
+    assert np.isnan(records["latency"]).all()
+    assert records["status"].tolist() == [200, 403]
+
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / "run.rec")
+    Recorder(path).close()
+    records, header = load_records(path)
+    assert len(records) == 0 and header["records"] == 0
@@ -0,0 +1,142 @@
+import base64
+import json
+
+import pytest
+
+from local_lambda import load_handler, make_event
+
+
+@pytest.fixture
+def handler():
+    return load_handler("ProtectedLambdaFunction", environment={"REVIEW_PAGE_SIZE": "2"}, log=lambda *args: None)
+
+
+def call(handler, method, query=None, body=None):
+    response = handler.lambda_handler(make_event(method, query=query, body=body), None)
+    return response["statusCode"], response["headers"], json.loads(response["body"])
+
+
+def post(handler, product_id, review):
+    status, _, body = call(handler, "POST", body={"product_id": product_id, "review": review, "username": "tester"})
+    assert status == 200, body
+    return body["review_id"]
+
+
+def cursor(start_key):
+    return base64.urlsafe_b64encode(json.dumps(start_key).encode("utf-8")).decode("ascii")
+
+
+def test_pages_follow_the_cursor(handler):
+    posted = {post(handler, "prod1", f"review {n}") for n in range(5)}
+    post(handler, "prod2", "other product")
+
+    seen = []
+    query = {"product_id": "prod1"}
+    while True:
+        status, _, body = call(handler, "GET", query)
+        assert status == 200
+        assert len(body["reviews"]) <= 2
+        seen += [review["review_id"] for review in body["reviews"]]
+        if not body.get("next_cursor"):
+            break
+        query = {"product_id": "prod1", "cursor": body["next_cursor"]}
+    assert len(seen) == len(posted) and set(seen) == posted
+
+
+@pytest.mark.parametrize("start_key", [
+    "not base64 json",
+    {"product_id": "prod1"},
+    {"product_id": "prod1", "review_id": "r1", "extra": "x"},
+    {"product_id": "prod1", "review_id": 5},
+    {"product_id": "prod2", "review_id": "r1"},
+    ["prod1", "r1"],
+])
+def test_invalid_cursors_are_rejected(handler, start_key):
+    value = start_key if isinstance(start_key, str) else cursor(start_key)
+    status, _, body = call(handler, "GET", {"product_id": "prod1", "cursor": value})
+    assert status == 400
+    assert body["message"] == "Invalid cursor"
+
+
+def test_cache_hits_until_a_write_invalidates(handler):
+    post(handler, "prod1", "first")
+    _, headers, first = call(handler, "GET", {"product_id": "prod1"})
+    assert headers["X-Cache"] == "MISS"
+    _, headers, second = call(handler, "GET", {"product_id": "prod1"})
+    assert headers["X-Cache"] == "HIT"
+    assert second == first
+
+    post(handler, "prod1", "second")
+    _, headers, third = call(handler, "GET", {"product_id": "prod1"})
+    assert headers["X-Cache"] == "MISS"
+    assert len(third["reviews"]) == 2
+    assert handler.cache_stats["invalidations"] >= 1
+
+
+def test_bulk_submit_stores_every_review(handler):
+    reviews = [{"product_id": "prod1", "review": "good"}, {"product_id": "prod3", "review": "also good"}]
+    status, _, body = call(handler, "POST", body=reviews)
+    assert status == 200
+    assert body["message"] == "2 of 2 reviews submitted successfully"
+    assert all("review_id" in result for result in body["results"])
+
+    _, _, page = call(handler, "GET", {"product_id": "prod3"})
+    assert [review["review_text"] for review in page["reviews"]] == ["also good"]
+
+
+def test_bulk_submit_rejects_invalid_reviews(handler):
+    reviews = [
+        {"product_id": "prod1", "review": "good"},
+        {"product_id": "bad id; ls", "review": "injected"},
+        "not an object",
+        {"product_id": 123, "review": "number"},
+        {"product_id": ["prod1"], "review": "list"},
+    ]
+    status, _, body = call(handler, "POST", body=reviews)
+    assert status == 400
+    assert body["message"] == "No reviews submitted: 4 of 5 reviews are invalid"
+    assert [error["index"] for error in body["errors"]] == [1, 2, 3, 4]
+    assert body["errors"][1]["error"] == "Review must be a JSON object"
+    assert {error["error"] for error in body["errors"][2:]} == {"Invalid product_id format"}
+
+    _, _, page = call(handler, "GET", {"product_id": "prod1"})
+    assert page["reviews"] == []
+
+
+def test_bulk_submit_is_capped(handler):
+    status, _, body = call(handler, "POST", body=[{"product_id": "prod1"}] * (handler.BULK_MAX_REVIEWS + 1))
+    assert status == 400
+    assert "Too many reviews" in body["message"]
+
+
+def test_vulnerable_check_does_not_reach_a_shell(tmp_path):
+    handler = load_handler("UnprotectedLambdaFunction", log=lambda *args: None)
+    marker = tmp_path / "injected"
+    product_id = f"prod1; touch {marker}"
+    status, _, body = call(handler, "POST", body={"product_id": product_id, "review": "payload"})
+    assert status == 200
+    assert body["product_check"] == f"Checking product ID: {product_id}"
+    assert not marker.exists()
+
+
+def test_cache_key_ignores_field_order_and_pages_are_capped(handler):
+    post(handler, "prod1", "first")
+    _, headers, _ = call(handler, "GET", {"product_id": "prod1", "fields": "review_id,username"})
+    assert headers["X-Cache"] == "MISS"
+    _, headers, _ = call(handler, "GET", {"product_id": "prod1", "fields": "username, review_id"})
+    assert headers["X-Cache"] == "HIT"
+
+    for limit in range(1, handler.REVIEW_CACHE_PAGES + 5):
+        call(handler, "GET", {"product_id": "prod1", "limit": str(limit)})
+    _, pages = handler.review_cache["prod1"]
+    assert len(pages) == handler.REVIEW_CACHE_PAGES
+
+
+def test_fields_are_deduplicated_and_validated(handler):
+    post(handler, "prod1", "first")
+    status, _, body = call(handler, "GET", {"product_id": "prod1", "fields": "review_id,review_id, username"})
+    assert status == 200
+    assert set(body["reviews"][0]) == {"review_id", "username"}
+    for fields in ("", " , ", "review_id,password"):
+        status, _, _ = call(handler, "GET", {"product_id": "prod1", "fields": fields})
+        assert status == 400
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from scheduler import SPIN_SECONDS, async_wait_until, wait_until
+
+# How far ahead of now workers are told to start, so they all begin together
+# once every process is up
+START_DELAY_SECONDS = 1.0
+# Seconds requests in flight get to finish once a run stops, by default
+GRACE_SECONDS = 5.0
+
+
+def split(total, parts):
+    """Split total into `parts` integers that differ by at most one"""
+    share, remainder = divmod(total, parts)
+    return [share + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_to_cpu(worker):
+    """
+    Pin the calling process to one CPU, round-robin by worker number
+
+    Returns:
+        The CPU number, or None where affinity cannot be set (macOS, Windows)
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    cpus = available_cpus()
+    cpu = cpus[worker % len(cpus)]
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except OSError:
+        return None
+    return cpu
+
+
+class SubmissionWindow:
+    """
+    Submits calls to an executor with at most `size` of them queued or
+    running; submit() blocks while the window is full. Work is handed over
+    as it is produced instead of all up front, so memory stays flat however
+    many calls a run makes.
+    """
+
+    def __init__(self, executor, size):
+        self.executor = executor
+        self._slots = threading.BoundedSemaphore(size)
+        # Futures queued or running (at most `size`)
+        self._pending = set()
+
+    def submit(self, function, *args):
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._pending.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future):
+        self._pending.discard(future)
+        self._slots.release()
+
+    def drain(self, timeout=None, cancel=False):
+        """
+        Wait for the submitted calls to finish, for at most `timeout` seconds
+
+        Args:
+            cancel: First drop the calls that have not started yet
+
+        Returns:
+            Number of calls still running when the wait ended
+        """
+        pending = list(self._pending)
+        if cancel:
+            pending = [future for future in pending if not future.cancel()]
+        _, running = wait(pending, timeout)
+        return len(running)
+
+
+class RunControl:
+    """
+    Cooperative cancellation of a run. Whatever hands out work (a
+    scheduler loop, a bot waking from a pause) asks stopped() or waits
+    through wait() or wait_until() first, so at the deadline, or on stop()
+    (Ctrl+C), no new requests are started; those already in flight get
+    `grace` seconds to finish (drain()), and the run reports what it did.
+
+    Args:
+        duration: Seconds from now to stop at, or None to run to completion
+        grace: Seconds to wait for requests in flight once stopped
+    """
+
+    def __init__(self, duration=None, grace=GRACE_SECONDS, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = None if duration is None else clock() + duration
+        self.grace = grace
+        # Why the run stopped early, or None; requests still in flight after the grace period
+        self.reason = None
+        self.unfinished = 0
+        self._stopped = threading.Event()
+
+    def stop(self, reason="stopped"):
+        """Stop handing out work; safe to call from any thread"""
+        if not self._stopped.is_set():
+            self.reason = reason
+            self._stopped.set()
+
+    def stopped(self):
+        if not self._stopped.is_set() and self.deadline is not None and self.clock() >= self.deadline:
+            self.stop("deadline reached")
+        return self._stopped.is_set()
+
+    def remaining(self):
+        """Seconds to the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    def wait(self, seconds):
+        """
+        Sleep for `seconds`, waking early if the run stops
+
+        Returns:
+            True if the run has stopped
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0 and self._stopped.wait(seconds):
+            return True
+        return self.stopped()
+
+    def wait_until(self, deadline, clock=time.perf_counter):
+        """
+        scheduler.wait_until, giving up if the run stops first
+
+        Returns:
+            How late the wait returned, in seconds, or None if the run stopped
+        """
+        if self.wait(deadline - clock() - SPIN_SECONDS):
+            return None
+        return wait_until(deadline, clock)
+
+    async def async_wait_until(self, deadline, clock=time.perf_counter):
+        """wait_until for event loops; the deadline is checked, stop() is seen once the wait ends"""
+        remaining = self.remaining()
+        if remaining is not None and deadline - clock() > remaining:
+            await async_wait_until(clock() + remaining, clock)
+            self.stopped()
+            return None
+        lateness = await async_wait_until(deadline, clock)
+        return None if self.stopped() else lateness
+
+    def drain(self, window):
+        """
+        Wait for a SubmissionWindow's calls: all of them if the run is
+        still going (until the deadline, if there is one), or once it has
+        stopped, only those already running and for at most `grace` seconds
+
+        Returns:
+            Number of the window's calls abandoned still running (also added to `unfinished`)
+        """
+        if not self.stopped():
+            try:
+                if not window.drain(self.remaining()):
+                    return 0
+            except KeyboardInterrupt:
+                self.stop("interrupted")
+            self.stopped()
+        unfinished = window.drain(self.grace, cancel=True)
+        self.unfinished += unfinished
+        return unfinished
+
+    def update(self, stats):
+        """Note in a run's RunStats whether, and why, it stopped early"""
+        stats.stopped = self.reason
+        stats.unfinished = self.unfinished
+        return stats
+
+
+def run_name(label, worker, workers):
+    """
+    Progress line prefix and file suffix of one worker process of a run,
+    where label names the target in an A/B run ("A", "B") or is empty
+
+    Returns:
+        (name, suffix), e.g. ("B Worker 1", "B.1")
+    """
+    labels = [label] if label else []
+    if workers == 1:
+        return " ".join(labels), ".".join(labels)
+    return " ".join(labels + [f"Worker {worker}"]), ".".join(labels + [str(worker)])
+
+
+def _run_worker(function, worker, start_at, kwargs):
+    pin_to_cpu(worker)
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    return function(worker=worker, **kwargs)
+
+
+def run_workers(function, worker_kwargs):
+    """
+    Run function(worker=n, **kwargs) in one process per kwargs dict, each
+    pinned to a CPU where possible, all starting at the same moment
+
+    Args:
+        function: Module-level function (it is pickled to the workers)
+        worker_kwargs: One dict of keyword arguments per worker
+
+    Returns:
+        The return values, in worker order
+    """
+    start_at = time.time() + START_DELAY_SECONDS
+    with ProcessPoolExecutor(max_workers=len(worker_kwargs)) as executor:
+        futures = [executor.submit(_run_worker, function, worker, start_at, kwargs)
+                   for worker, kwargs in enumerate(worker_kwargs)]
+        try:
+            return [future.result() for future in futures]
+        except KeyboardInterrupt:
+            # Ctrl+C reaches the workers too; each stops, drains and returns
+            # what it has. A second Ctrl+C gives up on them.
+            print("\nStopping workers...")
+            return [future.result() for future in futures]
@@ -0,0 +1,407 @@
+import time
+INIT_START = time.perf_counter()
+
+import json
+import base64
+import subprocess
+import os
+import re
+import boto3
+from urllib.parse import parse_qs
+import uuid
+from collections import OrderedDict
+from boto3.dynamodb.conditions import Key
+
+# Configuration and clients are set up once per container and reused by
+# every warm invocation
+TABLE_NAME = os.environ.get('TABLE_NAME')
+PRODUCT_INDEX_NAME = os.environ.get('PRODUCT_INDEX_NAME', 'ProductIdIndex')
+ENVIRONMENT = os.environ.get('ENVIRONMENT', 'unknown')
+CLOUDFRONT_DOMAIN = os.environ.get('CLOUDFRONT_DOMAIN', '*')
+# 'vulnerable' keeps the shell-based product check for the demo, 'hardened'
+# validates the ID and builds the check message in-process
+HANDLER_MODE = os.environ.get('HANDLER_MODE', 'vulnerable')
+PRODUCT_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+REVIEW_CACHE_SIZE = int(os.environ.get('REVIEW_CACHE_SIZE', '256'))
+REVIEW_CACHE_TTL_SECONDS = float(os.environ.get('REVIEW_CACHE_TTL_SECONDS', '30'))
+# Pages (limit, cursor, fields combinations) kept per cached product
+REVIEW_CACHE_PAGES = int(os.environ.get('REVIEW_CACHE_PAGES', '16'))
+BULK_MAX_REVIEWS = int(os.environ.get('BULK_MAX_REVIEWS', '25'))
+REVIEW_PAGE_SIZE = int(os.environ.get('REVIEW_PAGE_SIZE', '20'))
+REVIEW_PAGE_MAX = int(os.environ.get('REVIEW_PAGE_MAX', '100'))
+REVIEW_FIELDS = ('review_id', 'product_id', 'username', 'review_text', 'environment')
+# Key attributes of ProductIdIndex, the only keys a page cursor may carry
+CURSOR_KEYS = {'product_id', 'review_id'}
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME) if TABLE_NAME else None
+
+# Read-through cache of GET response bodies:
+# product_id -> (expires_at, {(limit, cursor, fields): body}), least recently used first;
+# each product keeps its REVIEW_CACHE_PAGES most recently stored pages
+review_cache = OrderedDict()
+cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+INIT_DURATION_MS = (time.perf_counter() - INIT_START) * 1000
+cold_start = True
+
+def lambda_handler(event, context):
+    global cold_start
+    handler_start = time.perf_counter()
+    container_state = 'cold' if cold_start else 'warm'
+    cold_start = False
+
+    response = handle_request(event, context)
+
+    # Report container state and timings on every response and in the logs
+    handler_duration_ms = (time.perf_counter() - handler_start) * 1000
+    response['headers'] = dict(response.get('headers') or {}, **{
+        'X-Container-State': container_state,
+        'X-Init-Duration-Ms': f'{INIT_DURATION_MS:.2f}',
+        'X-Handler-Duration-Ms': f'{handler_duration_ms:.2f}'
+    })
+    print(json.dumps({
+        'container_state': container_state,
+        'init_duration_ms': round(INIT_DURATION_MS, 2),
+        'handler_duration_ms': round(handler_duration_ms, 2),
+        'method': event.get('httpMethod'),
+        'status_code': response.get('statusCode'),
+        'cache': dict(cache_stats, size=len(review_cache))
+    }))
+    return response
+
+def cache_get(product_id, page_key):
+    """Return the cached GET body for a product page, or None on a miss"""
+    entry = review_cache.get(product_id)
+    if entry is not None and entry[0] <= time.monotonic():
+        del review_cache[product_id]
+        entry = None
+    if entry is not None and page_key in entry[1]:
+        review_cache.move_to_end(product_id)
+        cache_stats['hits'] += 1
+        return entry[1][page_key]
+    cache_stats['misses'] += 1
+    return None
+
+def cache_put(product_id, page_key, body):
+    """Cache a GET body, evicting the least recently used products over the size limit"""
+    if REVIEW_CACHE_SIZE <= 0:
+        return
+    entry = review_cache.get(product_id)
+    if entry is None or entry[0] <= time.monotonic():
+        entry = (time.monotonic() + REVIEW_CACHE_TTL_SECONDS, {})
+        review_cache[product_id] = entry
+    pages = entry[1]
+    pages.pop(page_key, None)
+    pages[page_key] = body
+    while len(pages) > REVIEW_CACHE_PAGES:
+        del pages[next(iter(pages))]
+    review_cache.move_to_end(product_id)
+    while len(review_cache) > REVIEW_CACHE_SIZE:
+        review_cache.popitem(last=False)
+
+def cache_invalidate(product_id):
+    """Drop a product's cached reviews after a write in this container"""
+    if review_cache.pop(product_id, None) is not None:
+        cache_stats['invalidations'] += 1
+
+def check_product_id(product_id):
+    """Return the product_check message, or None if the ID is rejected"""
+    if HANDLER_MODE == 'hardened':
+        # JSON bodies can carry any type; only strings are product IDs
+        if not isinstance(product_id, str) or not PRODUCT_ID_PATTERN.fullmatch(product_id):
+            return None
+        return f'Checking product ID: {product_id}'
+
+    # VULNERABLE CODE: Directly using user input in system commands without sanitization
+    cmd = f"echo Checking product ID: {product_id}"
+    return subprocess.check_output(cmd, shell=True).decode('utf-8').strip()
+
+def encode_cursor(last_evaluated_key):
+    """Turn a LastEvaluatedKey into an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+def parse_page_request(params, product_id):
+    """
+    Validate the limit, cursor and fields query parameters
+
+    Returns (limit, exclusive_start_key, fields); raises ValueError with a
+    client-facing message for invalid input
+    """
+    try:
+        limit = int(params.get('limit') or REVIEW_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= REVIEW_PAGE_MAX:
+        raise ValueError(f'limit must be between 1 and {REVIEW_PAGE_MAX}')
+
+    start_key = None
+    if params.get('cursor'):
+        try:
+            start_key = json.loads(base64.urlsafe_b64decode(params['cursor'].encode('ascii')))
+        except Exception:
+            raise ValueError('Invalid cursor')
+        # Only a key this handler issued goes to DynamoDB as ExclusiveStartKey:
+        # the index's key attributes, as strings, for the requested product
+        if (not isinstance(start_key, dict) or set(start_key) != CURSOR_KEYS
+                or not all(isinstance(value, str) for value in start_key.values())
+                or start_key['product_id'] != product_id):
+            raise ValueError('Invalid cursor')
+
+    fields = ()
+    if params.get('fields') is not None:
+        # Repeated names would make overlapping ProjectionExpression paths, which DynamoDB rejects
+        fields = tuple(dict.fromkeys(field.strip() for field in params['fields'].split(',') if field.strip()))
+        if not fields:
+            raise ValueError('fields must name at least one field')
+        unknown = [field for field in fields if field not in REVIEW_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return limit, start_key, fields
+
+def submit_reviews(reviews, headers):
+    """
+    Store a JSON array of reviews through one batch writer, returning
+    per-item results; if any review is invalid, none are stored and the
+    response is a 400 listing the errors
+    """
+    if len(reviews) > BULK_MAX_REVIEWS:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({
+                'message': f'Too many reviews in one request (max {BULK_MAX_REVIEWS})'
+            })
+        }
+
+    results = []
+    items = []
+    errors = []
+    for index, data in enumerate(reviews):
+        if not isinstance(data, dict):
+            errors.append({'index': index, 'error': 'Review must be a JSON object'})
+            continue
+        # Checked as sent, like a single review: hardened mode rejects non-string IDs
+        product_id = data.get('product_id', '')
+        output = check_product_id(product_id)
+        if output is None:
+            errors.append({'index': index, 'product_id': product_id, 'error': 'Invalid product_id format'})
+            continue
+        product_id = str(product_id)
+
+        review_id = str(uuid.uuid4())
+        items.append({
+            'review_id': review_id,
+            'product_id': product_id,
+            'username': str(data.get('username', 'anonymous')),
+            'review_text': str(data.get('review', '')),
+            'environment': ENVIRONMENT
+        })
+        results.append({'product_id': product_id, 'review_id': review_id, 'product_check': output})
+
+    if errors:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({
+                'message': f'No reviews submitted: {len(errors)} of {len(reviews)} reviews are invalid',
+                'errors': errors
+            })
+        }
+
+    if table is not None and items:
+        # The batch writer groups puts into BatchWriteItem calls of up to 25
+        # and resubmits any UnprocessedItems until every write is accepted
+        with table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+        for item in items:
+            cache_invalidate(item['product_id'])
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': json.dumps({
+            'message': f'{len(items)} of {len(reviews)} reviews submitted successfully',
+            'results': results
+        })
+    }
+
+def handle_request(event, context):
+    try:
+        # Add CORS headers
+        headers = {
+            'Access-Control-Allow-Origin': CLOUDFRONT_DOMAIN,
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,Origin,Accept',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS',
+            'Access-Control-Expose-Headers': 'X-Container-State,X-Init-Duration-Ms,X-Handler-Duration-Ms,X-Cache',
+            'Content-Type': 'application/json'
+        }
+
+        # Handle OPTIONS request for CORS preflight
+        if event['httpMethod'] == 'OPTIONS':
+            return {
+                'statusCode': 200,
+                'headers': headers,
+                'body': ''
+            }
+
+        # Get request data
+        if event['httpMethod'] == 'POST':
+            if 'body' in event:
+                # Parse request body
+                if event.get('isBase64Encoded', False):
+                    body = base64.b64decode(event['body']).decode('utf-8')
+                else:
+                    body = event['body']
+
+                # Parse as form data or JSON depending on content type
+                request_headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+                content_type = request_headers.get('content-type', '')
+                if 'application/json' in content_type:
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        if HANDLER_MODE != 'hardened':
+                            raise
+                        data = None
+                    if isinstance(data, list):
+                        return submit_reviews(data, headers)
+                    if not isinstance(data, dict) and HANDLER_MODE == 'hardened':
+                        return {
+                            'statusCode': 400,
+                            'headers': headers,
+                            'body': json.dumps({
+                                'message': 'Request body must be a JSON object or array of reviews'
+                            })
+                        }
+                    product_id = data.get('product_id', '')
+                    review_text = data.get('review', '')
+                    username = data.get('username', 'anonymous')
+                else:
+                    # Parse as form data
+                    form_data = parse_qs(body)
+                    product_id = form_data.get('product_id', [''])[0]
+                    review_text = form_data.get('review', [''])[0]
+                    username = form_data.get('username', ['anonymous'])[0]
+
+                output = check_product_id(product_id)
+                if output is None:
+                    return {
+                        'statusCode': 400,
+                        'headers': headers,
+                        'body': json.dumps({
+                            'message': 'Invalid product_id format'
+                        })
+                    }
+
+                # Store the review (simplified for demo)
+                review_id = str(uuid.uuid4())
+                if table is not None:
+                    table.put_item(
+                        Item={
+                            'review_id': review_id,
+                            'product_id': product_id,
+                            'username': username,
+                            'review_text': review_text,
+                            'environment': ENVIRONMENT
+                        }
+                    )
+                    cache_invalidate(product_id)
+
+                # Return success response
+                return {
+                    'statusCode': 200,
+                    'headers': headers,
+                    'body': json.dumps({
+                        'message': 'Review submitted successfully',
+                        'product_check': output,
+                        'review_id': review_id
+                    })
+                }
+
+        # Handle GET requests
+        if event['httpMethod'] == 'GET':
+            # Get one page of reviews for a product ID
+            params = event.get('queryStringParameters', {}) or {}
+            product_id = params.get('product_id', '')
+
+            if product_id:
+                try:
+                    limit, start_key, fields = parse_page_request(params, product_id)
+                except ValueError as e:
+                    return {
+                        'statusCode': 400,
+                        'headers': headers,
+                        'body': json.dumps({
+                            'message': str(e)
+                        })
+                    }
+
+                # Field order and repeats do not change the page, so they share an entry
+                page_key = (limit, params.get('cursor'), tuple(sorted(set(fields))))
+                cached_body = cache_get(product_id, page_key)
+                if cached_body is not None:
+                    return {
+                        'statusCode': 200,
+                        'headers': dict(headers, **{'X-Cache': 'HIT'}),
+                        'body': cached_body
+                    }
+
+                if table is not None:
+                    # Query one page of the product_id index; the client follows
+                    # next_cursor (the encoded LastEvaluatedKey) for more
+                    query_args = {
+                        'IndexName': PRODUCT_INDEX_NAME,
+                        'KeyConditionExpression': Key('product_id').eq(product_id),
+                        'Limit': limit
+                    }
+                    if start_key:
+                        query_args['ExclusiveStartKey'] = start_key
+                    if fields:
+                        query_args['ProjectionExpression'] = ', '.join(f'#f{i}' for i in range(len(fields)))
+                        query_args['ExpressionAttributeNames'] = {f'#f{i}': field for i, field in enumerate(fields)}
+                    response = table.query(**query_args)
+                    last_key = response.get('LastEvaluatedKey')
+
+                    body = json.dumps({
+                        'reviews': response.get('Items', []),
+                        'next_cursor': encode_cursor(last_key) if last_key else None
+                    })
+                    cache_put(product_id, page_key, body)
+
+                    return {
+                        'statusCode': 200,
+                        'headers': dict(headers, **{'X-Cache': 'MISS'}),
+                        'body': body
+                    }
+
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'message': 'Missing product_id parameter'
+                })
+            }
+
+        # Handle other cases
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({
+                'message': 'Invalid request method or format'
+            })
+        }
+
+    except Exception as e:
+        # VULNERABLE ERROR HANDLING: Returning detailed error information
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({
+                'message': 'Server error occurred',
+                'error': str(e),
+                'error_type': str(type(e).__name__)
+            })
+        }